@@ -0,0 +1,281 @@
+# benchmarks/bench.py
+"""
+Latency / throughput benchmark for BretonTraducteur.translate().
+
+Zilliz and Ollama are replaced by in-process stand-ins (see benchmarks/fakes.py), so runs
+are reproducible and need no credentials. The seq2seq models are the real ones.
+
+    python -m benchmarks.bench run --out bench.json
+    python -m benchmarks.bench run --models nllb "nllb finetuned" --concurrency 1 8 --out new.json
+    python -m benchmarks.bench compare bench.json new.json --threshold 0.10
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+DEFAULT_MODELS = ["nllb", "helsinki", "llama", "nllb finetuned"]
+DEFAULT_MODES = ["Défaut", "Few-shot learning", "RAG"]
+
+
+def _percentile(values: list[float], q: float) -> float:
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    index = min(len(ordered) - 1, max(0, round(q / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def _current_rss_bytes():
+    """Current resident set size from /proc (Linux), or None elsewhere."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+class RssSampler:
+    """
+    Peak RSS while a cell runs, sampled every interval seconds. (ru_maxrss is the peak of the
+    whole process lifetime: every cell after the largest model would report that model's peak.)
+    """
+
+    def __init__(self, interval: float = 0.05):
+        self.interval = interval
+        self.peak = _current_rss_bytes()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="rss-sampler", daemon=True)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self._sample()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self._sample()
+
+    def _sample(self):
+        rss = _current_rss_bytes()
+        if rss is not None and (self.peak is None or rss > self.peak):
+            self.peak = rss
+
+    @property
+    def peak_mb(self):
+        return None if self.peak is None else round(self.peak / (1024 * 1024), 1)
+
+
+def _git_commit() -> str:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], text=True, stderr=subprocess.DEVNULL).strip()
+    except Exception:
+        return "unknown"
+
+
+def setup_environment(args):
+    """Starts the fakes and wires them into src.utils before the translator is created."""
+    from .fakes import FakeEncoder, FakeMilvusCollection, FakeOllamaServer
+
+    ollama_server = FakeOllamaServer(token_latency_ms=args.ollama_token_ms, prompt_latency_ms=args.ollama_prompt_ms,
+                                     load_latency_ms=args.ollama_load_ms).start()
+    # Read by src.config (OLLAMA_HOST), which must not be imported before this.
+    os.environ["OLLAMA_HOST"] = ollama_server.host
+
+    from src import config, utils
+    from src.fewshot import FewShotSampler
+
+    if args.fake_encoder:
+        encoder = FakeEncoder()
+    else:
+        from sentence_transformers import SentenceTransformer
+        encoder = SentenceTransformer(config.MODEL_NAME_RAG_ENCODER, cache_folder=config.TRANSFORMERS_CACHE_PATH)
+    collection = FakeMilvusCollection(
+        n_rows=args.corpus_rows,
+        dimension=encoder.get_sentence_embedding_dimension(),
+        search_latency_ms=args.search_latency_ms,
+        slow_rate=args.search_slow_rate,
+        slow_latency_ms=args.search_slow_ms,
+        error_rate=args.search_error_rate,
+    )
+    utils.RAG_ENCODER = encoder
+    utils.RAG_ENCODER_DIMENSION = encoder.get_sentence_embedding_dimension()
+    utils.QUERY_EMBEDDER = utils.QueryEmbedder(encoder)
+    utils.ZILLIZ_COLLECTION = collection
+    utils.RETRIEVAL_CLIENT = utils._new_retrieval_client(collection, connect=lambda: collection)
+    utils.FEW_SHOT_SAMPLER = FewShotSampler(utils._iter_collection_rows, reservoir_size=config.FEW_SHOT_POOL_SIZE).start()
+    utils.FEW_SHOT_SAMPLER.wait_ready(timeout=60)
+    utils.UTILS_INITIALIZED = True
+
+    from src.translator import BretonTraducteur
+    translator = BretonTraducteur()
+    if not args.with_cache:
+        translator.cache = None
+    if config.OLLAMA_WARMUP:
+        # As at app startup, so the model load is not counted in the first llama cell.
+        translator.ollama_backend.warm_up()
+    return translator, ollama_server
+
+
+def run_cell(translator, model_name: str, mode: str, k: int, n_words: int, concurrency: int, requests: int) -> dict:
+    from src.translator import assistance_params
+    from .fakes import french_text
+
+    use_rag, use_prompt = assistance_params(mode, k)
+    # Distinct inputs so neither the embedding cache nor the result cache short-circuits the run.
+    texts = [french_text(n_words, seed=1000 + i) for i in range(requests)]
+
+    def one(text):
+        start = time.perf_counter()
+        _, translation = translator.translate(text, model_name, use_rag=use_rag, use_prompt=use_prompt)
+        return time.perf_counter() - start, translation.startswith("Error")
+
+    with RssSampler() as rss:
+        # Warm-up (model load) on a text outside the measured set, which would otherwise hit the embedding cache.
+        translator.translate(french_text(n_words, seed=999), model_name, use_rag=use_rag, use_prompt=use_prompt)
+        wall_start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            outcomes = list(executor.map(one, texts))
+        wall = time.perf_counter() - wall_start
+    latencies_ms = [1000 * latency for latency, _ in outcomes]
+    return {
+        "model": model_name,
+        "mode": mode,
+        "k": k if use_rag or use_prompt else 0,
+        "input_words": n_words,
+        "concurrency": concurrency,
+        "requests": requests,
+        "errors": sum(1 for _, failed in outcomes if failed),
+        "p50_ms": round(_percentile(latencies_ms, 50), 1),
+        "p95_ms": round(_percentile(latencies_ms, 95), 1),
+        "p99_ms": round(_percentile(latencies_ms, 99), 1),
+        "mean_ms": round(statistics.mean(latencies_ms), 1),
+        "rps": round(requests / wall, 2) if wall else None,
+        "peak_rss_mb": rss.peak_mb,
+    }
+
+
+def run(args) -> dict:
+    translator, ollama_server = setup_environment(args)
+    results = []
+    try:
+        for model_name in args.models:
+            for mode in args.modes:
+                # k is irrelevant in the default mode: run it once.
+                for k in (args.k if mode != "Défaut" else [0]):
+                    for n_words in args.input_words:
+                        for concurrency in args.concurrency:
+                            row = run_cell(translator, model_name, mode, k, n_words, concurrency, args.requests)
+                            print(json.dumps(row, ensure_ascii=False))
+                            results.append(row)
+    finally:
+        ollama_server.stop()
+    from src import utils
+    print(json.dumps({"retrieval": utils.RETRIEVAL_CLIENT.stats(), "ollama_model_loads": ollama_server.loads}))
+
+    import torch
+    return {
+        "meta": {
+            "commit": _git_commit(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "torch_threads": torch.get_num_threads(),
+            "fake_encoder": args.fake_encoder,
+            "search_latency_ms": args.search_latency_ms,
+            "search_slow_rate": args.search_slow_rate,
+            "search_error_rate": args.search_error_rate,
+            "ollama_token_ms": args.ollama_token_ms,
+            "ollama_load_ms": args.ollama_load_ms,
+        },
+        "results": results,
+    }
+
+
+def _cell_key(row: dict) -> tuple:
+    return row["model"], row["mode"], row["k"], row["input_words"], row["concurrency"]
+
+
+def compare(base: dict, new: dict, threshold: float) -> list[dict]:
+    """Returns per-cell deltas; a cell regresses if p95 grows or rps drops by more than `threshold`."""
+    base_rows = {_cell_key(row): row for row in base["results"]}
+    report = []
+    for row in new["results"]:
+        previous = base_rows.get(_cell_key(row))
+        if previous is None:
+            continue
+        p95_delta = (row["p95_ms"] - previous["p95_ms"]) / previous["p95_ms"] if previous["p95_ms"] else 0.0
+        rps_delta = (row["rps"] - previous["rps"]) / previous["rps"] if previous["rps"] else 0.0
+        report.append({
+            "cell": _cell_key(row),
+            "p95_ms": (previous["p95_ms"], row["p95_ms"]),
+            "p95_delta": round(p95_delta, 3),
+            "rps": (previous["rps"], row["rps"]),
+            "rps_delta": round(rps_delta, 3),
+            "regression": p95_delta > threshold or rps_delta < -threshold,
+        })
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark BretonTraducteur.translate().")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = subparsers.add_parser("run", help="Run the benchmark matrix.")
+    run_parser.add_argument("--out", required=True, help="JSON output file.")
+    run_parser.add_argument("--models", nargs="+", default=DEFAULT_MODELS)
+    run_parser.add_argument("--modes", nargs="+", default=DEFAULT_MODES, choices=DEFAULT_MODES)
+    run_parser.add_argument("--k", nargs="+", type=int, default=[5, 15])
+    run_parser.add_argument("--input-words", nargs="+", type=int, default=[5, 20, 60])
+    run_parser.add_argument("--concurrency", nargs="+", type=int, default=[1, 4, 16])
+    run_parser.add_argument("--requests", type=int, default=32, help="Requests per cell.")
+    run_parser.add_argument("--corpus-rows", type=int, default=20000, help="Rows in the fake collection.")
+    run_parser.add_argument("--search-latency-ms", type=float, default=30.0, help="Simulated Zilliz round trip.")
+    run_parser.add_argument("--search-slow-rate", type=float, default=0.0, help="Share of searches that are slow.")
+    run_parser.add_argument("--search-slow-ms", type=float, default=1000.0, help="Latency of a slow search.")
+    run_parser.add_argument("--search-error-rate", type=float, default=0.0, help="Share of searches that fail.")
+    run_parser.add_argument("--ollama-token-ms", type=float, default=5.0)
+    run_parser.add_argument("--ollama-prompt-ms", type=float, default=20.0)
+    run_parser.add_argument("--ollama-load-ms", type=float, default=0.0, help="Simulated model load on a cold Ollama.")
+    run_parser.add_argument("--fake-encoder", action="store_true", help="Hash-based encoder instead of mpnet.")
+    run_parser.add_argument("--with-cache", action="store_true", help="Keep the translation result cache on.")
+
+    compare_parser = subparsers.add_parser("compare", help="Compare two runs and flag regressions.")
+    compare_parser.add_argument("base")
+    compare_parser.add_argument("new")
+    compare_parser.add_argument("--threshold", type=float, default=0.10, help="Relative change counted as a regression.")
+    args = parser.parse_args(argv)
+
+    if args.command == "run":
+        report = run(args)
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"Results written to {args.out}")
+        return 0
+
+    with open(args.base, encoding="utf-8") as f:
+        base = json.load(f)
+    with open(args.new, encoding="utf-8") as f:
+        new = json.load(f)
+    report = compare(base, new, args.threshold)
+    print(f"base: {base['meta'].get('commit')}  new: {new['meta'].get('commit')}")
+    for entry in report:
+        flag = "REGRESSION" if entry["regression"] else "ok"
+        print(f"{flag:10} {entry['cell']}  p95 {entry['p95_ms'][0]} -> {entry['p95_ms'][1]} ms ({entry['p95_delta']:+.1%})"
+              f"  rps {entry['rps'][0]} -> {entry['rps'][1]} ({entry['rps_delta']:+.1%})")
+    return 1 if any(entry["regression"] for entry in report) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
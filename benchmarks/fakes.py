@@ -0,0 +1,196 @@
+# benchmarks/fakes.py
+import hashlib
+import json
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+
+from src.vector_index import LocalCollection, write_index
+
+FRENCH_WORDS = (
+    "le conseil municipal a décidé de rénover la salle des fêtes avant la fin de l'année "
+    "les habitants sont invités à participer à la réunion publique qui aura lieu mardi soir "
+    "la bibliothèque sera fermée pendant les vacances scolaires pour des travaux d'entretien "
+    "merci de bien vouloir remplir le formulaire et de le renvoyer à la mairie"
+).split()
+
+
+def french_text(n_words: int, seed: int = 0) -> str:
+    """Deterministic pseudo-French text of n_words words."""
+    rng = np.random.default_rng(seed)
+    words = [FRENCH_WORDS[i] for i in rng.integers(0, len(FRENCH_WORDS), size=n_words)]
+    return " ".join(words).capitalize() + "."
+
+
+class FakeEncoder:
+    """Stand-in for the SentenceTransformer RAG encoder: deterministic hash-seeded unit vectors."""
+
+    def __init__(self, dimension: int = 768):
+        self.dimension = dimension
+
+    def get_sentence_embedding_dimension(self) -> int:
+        return self.dimension
+
+    def encode(self, texts, convert_to_numpy=True, **kwargs):
+        vectors = []
+        for text in texts:
+            seed = int.from_bytes(hashlib.sha256(text.encode("utf-8")).digest()[:8], "little")
+            vector = np.random.default_rng(seed).normal(size=self.dimension).astype(np.float32)
+            vectors.append(vector / np.linalg.norm(vector))
+        return np.stack(vectors)
+
+
+class _FakeQueryIterator:
+    def __init__(self, rows, batch_size):
+        self._rows = rows
+        self._batch_size = batch_size
+        self._position = 0
+
+    def next(self):
+        batch = self._rows[self._position:self._position + self._batch_size]
+        self._position += len(batch)
+        return batch
+
+    def close(self):
+        pass
+
+
+class FakeMilvusCollection(LocalCollection):
+    """
+    In-process stand-in for the Zilliz collection: random French/Breton pairs in a local
+    index, with an optional simulated network latency per search call. A degraded endpoint
+    is simulated with `slow_rate` (share of searches taking slow_latency_ms instead) and
+    `error_rate` (share of searches failing). Like pymilvus, a search given a `timeout`
+    raises once it is exceeded.
+    """
+
+    def __init__(self, n_rows: int = 20000, dimension: int = 768, search_latency_ms: float = 0.0, seed: int = 0,
+                 slow_rate: float = 0.0, slow_latency_ms: float = 1000.0, error_rate: float = 0.0):
+        self._tmp_dir = tempfile.TemporaryDirectory(prefix="fake-milvus-")
+        rng = np.random.default_rng(seed)
+        texts = [
+            {"francais": french_text(int(rng.integers(3, 30)), seed=i), "breton": f"testenn brezhonek {i}"}
+            for i in range(n_rows)
+        ]
+        write_index(self._tmp_dir.name, rng.normal(size=(n_rows, dimension)).astype(np.float32), texts)
+        super().__init__(self._tmp_dir.name, default_nprobe=0)
+        self.search_latency_ms = search_latency_ms
+        self.slow_rate = slow_rate
+        self.slow_latency_ms = slow_latency_ms
+        self.error_rate = error_rate
+        self.search_calls = 0
+        self._rng = np.random.default_rng(seed)
+        self._rng_lock = threading.Lock()
+
+    def search(self, *args, timeout: float = None, **kwargs):
+        self.search_calls += 1
+        with self._rng_lock:
+            draw_slow, draw_error = self._rng.random(2)
+        latency_ms = self.slow_latency_ms if draw_slow < self.slow_rate else self.search_latency_ms
+        if timeout is not None and latency_ms / 1000.0 > timeout:
+            time.sleep(timeout)
+            raise TimeoutError(f"Fake search timed out after {timeout}s.")
+        if latency_ms:
+            time.sleep(latency_ms / 1000.0)
+        if draw_error < self.error_rate:
+            raise RuntimeError("Fake search failed.")
+        return super().search(*args, **kwargs)
+
+    def query_iterator(self, batch_size=1000, output_fields=None, **kwargs):
+        return _FakeQueryIterator(self.index.texts, batch_size)
+
+
+class FakeOllamaServer:
+    """
+    Minimal HTTP server implementing Ollama's /api/chat (streaming and not) on localhost.
+    The reply is a fixed Breton sentence; each output token costs token_latency_ms.
+    The first request, and any request after the model was unloaded (keep_alive 0), also
+    costs load_latency_ms.
+    """
+
+    REPLY_TOKENS = "Demat , setu un droidigezh faos evit ar muzuliadennoù .".split()
+
+    def __init__(self, token_latency_ms: float = 5.0, prompt_latency_ms: float = 20.0, load_latency_ms: float = 0.0):
+        self.token_latency_ms = token_latency_ms
+        self.prompt_latency_ms = prompt_latency_ms
+        self.load_latency_ms = load_latency_ms
+        self.loads = 0
+        self._loaded = False
+        self._load_lock = threading.Lock()
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length") or 0)
+                body = json.loads(self.rfile.read(length) or b"{}")
+                if self.path == "/api/chat":
+                    server._chat(self, body)
+                elif self.path == "/api/generate":
+                    server._reply_json(self, {"model": body.get("model"), "response": "", "done": True})
+                else:
+                    self.send_error(404)
+
+        self._httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self._thread = threading.Thread(target=self._httpd.serve_forever, name="fake-ollama", daemon=True)
+
+    @property
+    def host(self) -> str:
+        return f"http://127.0.0.1:{self._httpd.server_address[1]}"
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    @staticmethod
+    def _reply_json(handler, payload):
+        data = json.dumps(payload).encode("utf-8")
+        handler.send_response(200)
+        handler.send_header("Content-Type", "application/json")
+        handler.send_header("Content-Length", str(len(data)))
+        handler.end_headers()
+        handler.wfile.write(data)
+
+    def _load(self, keep_alive):
+        with self._load_lock:
+            if not self._loaded:
+                time.sleep(self.load_latency_ms / 1000.0)
+                self.loads += 1
+            self._loaded = keep_alive not in (0, "0", "0s")
+
+    def _chat(self, handler, body):
+        self._load(body.get("keep_alive"))
+        time.sleep(self.prompt_latency_ms / 1000.0)
+        model = body.get("model")
+        options = body.get("options") or {}
+        tokens = self.REPLY_TOKENS[:options.get("num_predict") or len(self.REPLY_TOKENS)]
+        if not body.get("stream", True):
+            time.sleep(len(tokens) * self.token_latency_ms / 1000.0)
+            self._reply_json(handler, {
+                "model": model, "message": {"role": "assistant", "content": " ".join(tokens)}, "done": True,
+            })
+            return
+        handler.send_response(200)
+        handler.send_header("Content-Type", "application/x-ndjson")
+        handler.send_header("Transfer-Encoding", "chunked")
+        handler.end_headers()
+        for i, token in enumerate(tokens + [None]):
+            if token is not None:
+                time.sleep(self.token_latency_ms / 1000.0)
+                chunk = {"model": model, "message": {"role": "assistant", "content": (" " if i else "") + token}, "done": False}
+            else:
+                chunk = {"model": model, "message": {"role": "assistant", "content": ""}, "done": True}
+            line = (json.dumps(chunk) + "\n").encode("utf-8")
+            handler.wfile.write(f"{len(line):x}\r\n".encode("ascii") + line + b"\r\n")
+        handler.wfile.write(b"0\r\n\r\n")
@@ -1,86 +1,158 @@
 # src/app.py
 import gradio as gr
+import json
+import logging
 import sys
 import os
 
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
 # ... (Initial imports and setup remain the same) ...
+logger = logging.getLogger("src.app")
 try:
     from src import config
+    logging.basicConfig(level=config.LOG_LEVEL, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
     config.setup_cache()
 except ImportError as e:
     print(f"CRITICAL ERROR: Could not import configuration from src.config. Check path. Error: {e}")
     sys.exit(1)
 except Exception as e:
-    print(f"CRITICAL ERROR during cache setup: {e}")
+    logger.critical(f"Error during cache setup: {e}")
     sys.exit(1)
+workers = None
+workers_error = None
+if config.SERVING_WORKERS > 0:
+    # Forked before this process starts any thread (RAG init, micro-batcher, Gradio): see src/serving.py.
+    # The shared models are loaded first, so startup waits for them in this mode.
+    try:
+        from src.serving import WorkerPool
+        from src.translator import new_model_registry
+        workers = WorkerPool(
+            new_model_registry(),
+            num_workers=config.SERVING_WORKERS,
+            model_names=config.PRELOAD_MODELS,
+            threads_per_worker=config.SERVING_THREADS_PER_WORKER,
+        ).start()
+    except Exception as e:
+        workers, workers_error = None, f"{type(e).__name__}: {e}"
+        logger.critical(f"Translation workers could not be started, generating in this process instead: {e}")
 try:
     from src import utils
-    print("--- Initializing Utils ---")
-    if not utils.initialize_utils():
-         print("WARNING: Utils initialization failed. RAG/Prompt features might be unavailable.")
+    # The RAG encoder and the Zilliz connection load in the background: the UI starts right away.
+    logger.info("--- Initializing Utils (background) ---")
+    utils.start_background_initialization()
 except ImportError as e:
-    print(f"CRITICAL ERROR: Could not import utils from src. Check path. Error: {e}")
+    logger.critical(f"Could not import utils from src. Check path. Error: {e}")
 except Exception as e:
-    print(f"CRITICAL ERROR during utils initialization: {e}")
+    logger.critical(f"Error during utils initialization: {e}")
 try:
-    from src.translator import BretonTraducteur
+    from src.translator import BretonTraducteur, assistance_params
+    from src.prompting import describe as describe_prompt
 except ImportError as e:
-     print(f"CRITICAL ERROR: Could not import BretonTraducteur. Error: {e}")
+     logger.critical(f"Could not import BretonTraducteur. Error: {e}")
      sys.exit(1)
 translator_global = None
 try:
-    print("--- Initializing Global Translator Instance ---")
-    translator_global = BretonTraducteur()
-    print("--- Global Translator Ready ---")
+    logger.info("--- Initializing Global Translator Instance ---")
+    translator_global = BretonTraducteur(registry=workers.registry if workers is not None else None)
+    translator_global.workers = workers
+    preload_futures = translator_global.preload_models(config.PRELOAD_MODELS, max_workers=config.STARTUP_LOAD_WORKERS)
+    if config.OLLAMA_WARMUP:
+        # Loads llama in Ollama and evaluates its prompt prefix while the seq2seq models load.
+        translator_global.ollama_backend.start_warm_up()
+    logger.info(f"--- Global Translator Ready (loading {', '.join(config.PRELOAD_MODELS) or 'no models'} in the background) ---")
 except Exception as e:
-    print(f"CRITICAL ERROR DURING GLOBAL TRANSLATOR INITIALIZATION: {e}")
+    logger.critical(f"Error during global translator initialization: {e}")
     sys.exit(1)
+
+
+def readiness_report() -> dict:
+    """Which models and RAG components are available. Ready once every preloaded model is loaded."""
+    models = translator_global.model_status() if translator_global is not None else {}
+    ready = all(models.get(name) == "loaded" for name in config.PRELOAD_MODELS)
+    # Informational: without Zilliz or a local index, the Défaut mode is still served.
+    report = {"ready": ready, "models": models, "rag": utils.readiness()}
+    if translator_global is not None:
+        report["ollama"] = translator_global.ollama_backend.status()  # Informational: llama is not preloaded.
+    if workers_error is not None:
+        report["workers_start_error"] = workers_error
+    if workers is not None:
+        report["workers"] = workers.status()
+        report["workers_preload_failures"] = workers.preload_failures
+        report["ready"] = ready and workers.ready and all(worker["alive"] for worker in report["workers"])
+    return report
+
+
+def _health_route():
+    return 200, "application/json", json.dumps({"status": "ok"})
+
+
+def _readiness_route():
+    report = readiness_report()
+    return (200 if report["ready"] else 503), "application/json", json.dumps(report)
 # ... (gradio_translate_interface function remains the same) ...
-def gradio_translate_interface(text_input, selected_model_short_name, mode, k_value_str):
-    """Wrapper function called by the Gradio interface."""
+async def gradio_translate_interface(text_input, selected_model_short_name, mode, k_value_str, document_mode=False,
+                                     profile=None):
+    """
+    Wrapper function called by the Gradio interface.
+    Async generator: the translation box is updated as tokens are produced.
+    """
     if translator_global is None:
-         return text_input or "", "Translator failed to initialize.", "Please check server logs."
+         yield text_input or "", "Translator failed to initialize.", "Please check server logs."
+         return
     if (mode in ["RAG", "Prompt prédéfini"] and (utils.ZILLIZ_COLLECTION is None or utils.RAG_ENCODER is None)):
          gr.Warning(f"{mode} assistance is unavailable due to initialization issues. Check logs.")
     if not text_input:
-        return "", "", "Please enter text to translate."
+        yield "", "", "Please enter text to translate."
+        return
     try:
         k = int(k_value_str) if k_value_str is not None else 0
         k = max(0, k)
     except (ValueError, TypeError):
-         print(f"Warning: Invalid k value '{k_value_str}'. Using k=0.")
+         logger.warning(f"Invalid k value '{k_value_str}'. Using k=0.")
          k = 0
-    use_rag_param = 0
-    use_prompt_param = 0
-    if mode == "RAG" and k > 0:
-        use_rag_param = k
-    elif mode == "Few-shot learning" and k > 0:
-        use_prompt_param = k
-    print(f"--- Gradio Request ---")
-    print(f"Input Text: '{text_input[:100]}...'")
-    print(f"Selected Model: {selected_model_short_name}")
-    print(f"Assistance Mode: {mode}, k: {k}")
-    print(f"Params for translate(): use_rag={use_rag_param}, use_prompt={use_prompt_param}")
+    use_rag_param, use_prompt_param = assistance_params(mode, k)
+    logger.debug(f"--- Gradio Request ---")
+    logger.debug(f"Input Text: '{text_input[:100]}...'")
+    logger.debug(f"Selected Model: {selected_model_short_name}")
+    logger.debug(f"Assistance Mode: {mode}, k: {k}")
+    logger.debug(f"Params for translate(): use_rag={use_rag_param}, use_prompt={use_prompt_param}, document_mode={document_mode}, profile={profile}")
     try:
-        question_sent, translation_result = translator_global.translate( # _prompt_ret, _rag_ret, 
-            text=text_input,
-            model_name=selected_model_short_name,
-            use_rag=use_rag_param,
-            use_prompt=use_prompt_param
-        )
-        print(f"Translation Result: '{translation_result[:100]}...'")
-        return text_input, question_sent, translation_result
+        if document_mode:
+            # Document mode translates sentences as a batch: no token streaming.
+            question_sent, translation_result = await translator_global.translate_document_async(
+                text=text_input,
+                model_name=selected_model_short_name,
+                use_rag=use_rag_param,
+                use_prompt=use_prompt_param,
+                profile=profile
+            )
+            yield text_input, question_sent, translation_result
+        else:
+            translation_result = ""
+            prompt_info = {}
+            async for question_sent, translation_result in translator_global.translate_stream_async(
+                text=text_input,
+                model_name=selected_model_short_name,
+                use_rag=use_rag_param,
+                use_prompt=use_prompt_param,
+                prompt_info=prompt_info,
+                profile=profile
+            ):
+                # Examples / tokens actually used, once the prompt has been built.
+                summary = describe_prompt(prompt_info)
+                yield text_input, f"{question_sent}\n\n[{summary}]" if summary else question_sent, translation_result
+        logger.debug(f"Translation Result: '{translation_result[:100]}...'")
     except Exception as e:
-        print(f"ERROR processing translation request in Gradio interface: {e}")
-        return text_input, "Error before/during prompt generation", f"An error occurred: {e}"
+        logger.exception(f"Error processing translation request in Gradio interface: {e}")
+        yield text_input, "Error before/during prompt generation", f"An error occurred: {e}"
 
 # --- Gradio Interface Definition ---
 desc_nllb = f"`nllb`: Multi-lingual ({config.MODEL_NAME_NLLB}). Targets **Breton**."
 desc_helsinki = f"`helsinki`: French to English ({config.MODEL_NAME_HELSINKI}). Targets **English**."
 desc_llama = f"`Llama`: Multi-lingual ({config.MODEL_NAME_LLAMA}). Targets **Breton**. "
 desc_nllb_ft = f"`nllb finetuned`: Multi-lingual ({config.MODEL_NAME_NLLB}). Targets **Breton**. Training Corpus french-breton."
+desc_auto = f"`auto`: choisit le modèle et le mode d'assistance qui tiennent en {config.AUTO_LATENCY_BUDGET_SECONDS:g} s (repli : `{config.AUTO_FALLBACK}`). Targets **Breton**."
 desc_rag_model = f"RAG uses `{config.MODEL_NAME_RAG_ENCODER}` via Zilliz."
 
 with gr.Blocks(theme=gr.themes.Soft()) as iface:
@@ -92,21 +164,28 @@ with gr.Blocks(theme=gr.themes.Soft()) as iface:
     - **{desc_helsinki}**
     - **{desc_llama}**
     - **{desc_nllb_ft}**
+    - **{desc_auto}**
 
     *Assistance Prompt (Optionnel):* {desc_rag_model}
     - **RAG**: Récupère **k** exemples **similaires** au texte d'entrée depuis Zilliz (collection: `{config.RAG_COLLECTION_NAME}`) pour enrichir le prompt (ajuster 'k' avec le curseur ci-dessous). Nécessite une configuration Zilliz correcte.
     - **Prompt prédéfini**: Récupère **k** exemples **aléatoires** depuis Zilliz (via une recherche sur vecteur aléatoire) pour fournir un contexte varié (ajuster 'k' avec le curseur ci-dessous). Nécessite une configuration Zilliz correcte.
     - **Défaut**: Envoie un prompt simple au modèle.
+
+    *Profil de décodage:* **fast** (glouton, le plus rapide) ou **quality** (beam search, plus lent, sans affichage progressif). La longueur générée suit celle du texte source.
+
+    *Mode document:* découpe le texte en phrases, les traduit en parallèle puis les réassemble dans l'ordre (évite la troncature des textes longs).
     """)
     # ... (Rest of gr.Blocks definition remains the same) ...
     with gr.Row():
         with gr.Column(scale=2):
             input_text = gr.Textbox(label="Texte à traduire (Français)", lines=4, placeholder="Entrez votre texte ici...")
             model_choice = gr.Radio(
-                ["nllb", "helsinki", "llama", "nllb finetuned"], label="Choisir le modèle de traduction", value="nllb"
+                ["nllb", "helsinki", "llama", "nllb finetuned", "auto"], label="Choisir le modèle de traduction", value="nllb"
             )
             mode_selection = gr.Radio(["Défaut", "Few-shot learning", "RAG"], label="Mode d'assistance Prompt", value="Défaut")
             k_slider = gr.Slider(minimum=0, maximum=30, value=5, step=1, label="Nombre d'exemples (k)", info="Utilisé si RAG ou Prompt prédéfini est sélectionné et k > 0")
+            profile_selection = gr.Radio(["fast", "quality"], label="Profil de décodage", value=config.GENERATION_PROFILE)
+            document_checkbox = gr.Checkbox(label="Mode document", value=False, info="Découpe le texte en phrases traduites séparément (textes longs)")
             submit_button = gr.Button("Traduire", variant="primary")
         with gr.Column(scale=3):
             output_original = gr.Textbox(label="1. Texte Français Initial", interactive=False, lines=2)
@@ -114,25 +193,25 @@ with gr.Blocks(theme=gr.themes.Soft()) as iface:
             output_translation = gr.Textbox(label="3. Résultat de la Traduction", interactive=False, lines=4)
     submit_button.click(
         fn=gradio_translate_interface,
-        inputs=[input_text, model_choice, mode_selection, k_slider],
-        outputs=[output_original, output_prompt, output_translation]
+        inputs=[input_text, model_choice, mode_selection, k_slider, document_checkbox, profile_selection],
+        outputs=[output_original, output_prompt, output_translation],
+        concurrency_limit=config.GRADIO_CONCURRENCY_LIMIT,
     )
+iface.queue(default_concurrency_limit=config.GRADIO_CONCURRENCY_LIMIT, max_size=config.GRADIO_QUEUE_MAX_SIZE or None)
 
 # --- Application Entry Point ---
 # ... (remains the same) ...
 # http://127.0.0.1:7860
 if __name__ == "__main__":
+    if config.METRICS_PORT:
+        from src.metrics import start_metrics_server, add_route
+        add_route("/healthz", _health_route)
+        add_route("/readyz", _readiness_route)
+        start_metrics_server(config.METRICS_PORT)
     if translator_global is None:
-         print("CRITICAL: Translator failed to initialize. Aborting launch.")
-    elif utils.UTILS_INITIALIZED and (utils.ZILLIZ_COLLECTION is None or utils.RAG_ENCODER is None):
-         print("WARNING: RAG/Prompt features will be unavailable due to Zilliz/Encoder issues.")
-         print("--- Launching Gradio Interface (RAG/Prompt Disabled) ---")
-         iface.launch(server_name="0.0.0.0")
-    elif not utils.UTILS_INITIALIZED:
-         print("WARNING: Utils failed to initialize properly. RAG/Prompt may not work.")
-         print("--- Launching Gradio Interface (Utils Issues) ---")
-         iface.launch(server_name="0.0.0.0")
+         logger.critical("Translator failed to initialize. Aborting launch.")
     else:
-         print("--- Launching Gradio Interface (All components initialized) ---")
+         # Models and the RAG backend keep loading in the background; /readyz reports their state.
+         logger.info("--- Launching Gradio Interface ---")
          iface.launch(server_name="0.0.0.0")
-    print("--- Gradio Interface Stopped ---")
\ No newline at end of file
+    logger.info("--- Gradio Interface Stopped ---")
\ No newline at end of file
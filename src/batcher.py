@@ -0,0 +1,89 @@
+# src/batcher.py
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+
+
+class MicroBatcher:
+    """
+    Collects items submitted concurrently and runs them in batches on a background thread.
+
+    Items are grouped by key (e.g. the model and its generation args): a batch only ever
+    contains items with the same key. A batch is dispatched as soon as it reaches
+    max_batch_size, or once its oldest item has waited max_wait_ms, so the added
+    latency per request is bounded by the window.
+
+    batch_fn(key, items) must return one result per item, in the same order.
+    """
+
+    def __init__(self, batch_fn, max_batch_size: int = 8, max_wait_ms: float = 10.0, name: str = "micro-batcher"):
+        self._batch_fn = batch_fn
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max(0.0, max_wait_ms) / 1000.0
+        self._queues = {}  # key -> deque[(enqueued_at, item, future)]
+        self._cond = threading.Condition()
+        self._stopped = False
+        self._thread = threading.Thread(target=self._run, name=name, daemon=True)
+        self._thread.start()
+
+    def submit(self, key, item) -> Future:
+        """Queues an item and returns a Future resolved with its result."""
+        future = Future()
+        with self._cond:
+            if self._stopped:
+                raise RuntimeError("MicroBatcher is stopped.")
+            self._queues.setdefault(key, deque()).append((time.monotonic(), item, future))
+            self._cond.notify()
+        return future
+
+    def pending(self) -> int:
+        with self._cond:
+            return sum(len(queue) for queue in self._queues.values())
+
+    def stop(self):
+        """Stops the worker after the queued items have been processed."""
+        with self._cond:
+            self._stopped = True
+            self._cond.notify_all()
+        self._thread.join()
+
+    def _next_batch(self):
+        with self._cond:
+            while True:
+                # Serve the key whose oldest item has waited the longest.
+                ready_key, oldest = None, None
+                for key, queue in self._queues.items():
+                    if queue and (oldest is None or queue[0][0] < oldest):
+                        ready_key, oldest = key, queue[0][0]
+                if ready_key is None:
+                    if self._stopped:
+                        return None, None
+                    self._cond.wait()
+                    continue
+                queue = self._queues[ready_key]
+                remaining = oldest + self.max_wait - time.monotonic()
+                if len(queue) >= self.max_batch_size or remaining <= 0 or self._stopped:
+                    batch = [queue.popleft() for _ in range(min(len(queue), self.max_batch_size))]
+                    if not queue:
+                        del self._queues[ready_key]
+                    return ready_key, batch
+                self._cond.wait(timeout=remaining)
+
+    def _run(self):
+        while True:
+            key, batch = self._next_batch()
+            if batch is None:
+                return
+            batch = [entry for entry in batch if entry[2].set_running_or_notify_cancel()]
+            if not batch:
+                continue
+            try:
+                results = list(self._batch_fn(key, [item for _, item, _ in batch]))
+                if len(results) != len(batch):
+                    raise RuntimeError(f"Batch function returned {len(results)} results for {len(batch)} items.")
+                for (_, _, future), result in zip(batch, results):
+                    future.set_result(result)
+            except Exception as e:
+                for _, _, future in batch:
+                    future.set_exception(e)
@@ -0,0 +1,292 @@
+# src/bulk.py
+"""
+Offline translation of large CSV / JSONL corpora.
+
+    python -m src.bulk corpus.csv out.jsonl --model "nllb finetuned" --text-column francais
+    python -m src.bulk corpus.jsonl out.csv --model nllb --mode rag --k 5 --workers 2
+
+Rows are streamed in chunks (pandas `chunksize`), so memory stays bounded whatever the
+corpus size. Inside a chunk, rows are sorted by length and cut into batches of similar
+length (little padding), and batches run on parallel worker threads through
+BretonTraducteur.translate_batch(), which also retrieves the RAG / few-shot examples in
+batches.
+
+Results are appended to the output as soon as a batch finishes, one record per row:
+{"row": <index in the input>, [id column], "source": ..., "translation": ...}. Output
+order follows completion, not input order; use "row" to restore it. Progress is
+checkpointed next to the output (<output>.checkpoint.json). Running the same command
+again after a crash skips every row already in the output. Rows whose translation failed
+are not written, so they are retried on the next run.
+"""
+import argparse
+import csv
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+MODES = {"default": "Défaut", "few-shot": "Few-shot learning", "rag": "RAG"}
+
+
+def read_chunks(path: str, chunk_size: int):
+    """Yields DataFrames of at most chunk_size rows from a CSV or JSONL file."""
+    if path.endswith((".jsonl", ".json")):
+        return pd.read_json(path, lines=True, chunksize=chunk_size, dtype=False)
+    return pd.read_csv(path, chunksize=chunk_size, dtype=str, keep_default_na=False)
+
+
+def _truncate_partial_line(path: str):
+    """Drops a last line left incomplete by a crash in the middle of a write."""
+    with open(path, "rb+") as f:
+        f.seek(0, os.SEEK_END)
+        size = f.tell()
+        if size == 0:
+            return
+        f.seek(size - 1)
+        if f.read(1) == b"\n":
+            return
+        position = size
+        while position > 0:
+            step = min(65536, position)
+            position -= step
+            f.seek(position)
+            block = f.read(step)
+            newline = block.rfind(b"\n")
+            if newline != -1:
+                f.truncate(position + newline + 1)
+                return
+        f.truncate(0)
+
+
+def load_done_rows(path: str) -> set:
+    """Row indices already present in an existing output file."""
+    if not os.path.exists(path) or os.path.getsize(path) == 0:
+        return set()
+    _truncate_partial_line(path)
+    done = set()
+    if path.endswith(".csv"):
+        for chunk in pd.read_csv(path, usecols=["row"], chunksize=100000):
+            done.update(int(row) for row in chunk["row"])
+        return done
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                done.add(int(json.loads(line)["row"]))
+    return done
+
+
+class OutputWriter:
+    """Appends result records to a JSONL or CSV file, flushing each batch to disk."""
+
+    def __init__(self, path: str, fieldnames: list[str]):
+        self.path = path
+        self._csv = path.endswith(".csv")
+        new_file = not os.path.exists(path) or os.path.getsize(path) == 0
+        self._file = open(path, "a", encoding="utf-8", newline="")
+        self._writer = None
+        if self._csv:
+            self._writer = csv.DictWriter(self._file, fieldnames=fieldnames, extrasaction="ignore")
+            if new_file:
+                self._writer.writeheader()
+        self._lock = threading.Lock()
+
+    def write(self, records: list[dict]):
+        with self._lock:
+            for record in records:
+                if self._csv:
+                    self._writer.writerow(record)
+                else:
+                    self._file.write(json.dumps(record, ensure_ascii=False) + "\n")
+            self._file.flush()
+            os.fsync(self._file.fileno())
+
+    def close(self):
+        self._file.close()
+
+
+class Checkpoint:
+    """Run settings and progress, stored next to the output and rewritten atomically."""
+
+    def __init__(self, output_path: str, settings: dict):
+        self.path = output_path + ".checkpoint.json"
+        self.settings = settings
+        self.rows_done = 0
+        self.rows_failed = 0
+        self._lock = threading.Lock()
+
+    def check_resumable(self):
+        """Refuses to resume an output produced with different settings (model, mode, k...)."""
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, encoding="utf-8") as f:
+            previous = json.load(f).get("settings", {})
+        if previous != self.settings:
+            raise SystemExit(
+                f"{self.path} was written with different settings ({previous}). "
+                "Use another output file or delete the old output and its checkpoint."
+            )
+
+    def update(self, done: int, failed: int):
+        with self._lock:
+            self.rows_done += done
+            self.rows_failed += failed
+            state = {
+                "settings": self.settings,
+                "rows_done": self.rows_done,
+                "rows_failed": self.rows_failed,
+                "updated_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            }
+            tmp_path = self.path + ".tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(state, f, ensure_ascii=False, indent=2)
+            os.replace(tmp_path, self.path)
+
+
+def length_buckets(rows: list[tuple], batch_size: int) -> list[list[tuple]]:
+    """Sorts (row, id, text) tuples by text length and cuts them into batches of similar length."""
+    ordered = sorted(rows, key=lambda row: len(row[2]))
+    return [ordered[start:start + batch_size] for start in range(0, len(ordered), batch_size)]
+
+
+def translate_corpus(translator, args) -> dict:
+    use_rag, use_prompt = args.assistance
+    settings = {"input": os.path.abspath(args.input), "model": args.model, "mode": args.mode,
+                "k": args.k, "text_column": args.text_column, "profile": args.profile}
+    checkpoint = Checkpoint(args.output, settings)
+    checkpoint.check_resumable()
+    done_rows = load_done_rows(args.output)
+    checkpoint.rows_done = len(done_rows)
+    if done_rows:
+        logger.info(f"Bulk: resuming, {len(done_rows)} rows already translated in {args.output}.")
+
+    fieldnames = ["row"] + ([args.id_column] if args.id_column else []) + ["source", "translation"]
+    if args.with_prompt:
+        fieldnames.append("prompt")
+    writer = OutputWriter(args.output, fieldnames)
+
+    def run_batch(batch):
+        texts = [text for _, _, text in batch]
+        try:
+            results = translator.translate_batch(texts, args.model, use_rag=use_rag, use_prompt=use_prompt,
+                                                 profile=args.profile)
+        except Exception as e:
+            # A failed batch is retried on the next run (its rows are not written), the others go on.
+            logger.error(f"Bulk: batch of {len(batch)} rows failed: {e}")
+            checkpoint.update(0, len(batch))
+            return 0, len(batch)
+        records, failed = [], 0
+        for (row, row_id, text), (prompt, translation) in zip(batch, results):
+            if translation.startswith("Error"):
+                failed += 1
+                logger.warning(f"Bulk: row {row} failed: {translation}")
+                continue
+            record = {"row": row}
+            if args.id_column:
+                record[args.id_column] = row_id
+            record["source"] = text
+            record["translation"] = translation.strip()
+            if args.with_prompt:
+                record["prompt"] = prompt
+            records.append(record)
+        writer.write(records)
+        checkpoint.update(len(records), failed)
+        return len(records), failed
+
+    start = time.perf_counter()
+    translated = failed = skipped = 0
+    row_offset = 0
+    try:
+        with ThreadPoolExecutor(max_workers=args.workers, thread_name_prefix="bulk") as executor:
+            for chunk in read_chunks(args.input, args.chunk_size):
+                if args.text_column not in chunk.columns:
+                    raise SystemExit(f"Column '{args.text_column}' not found in {args.input} (columns: {list(chunk.columns)}).")
+                texts = chunk[args.text_column].tolist()
+                ids = chunk[args.id_column].tolist() if args.id_column else [None] * len(texts)
+                pending = []
+                empty_records = []
+                for offset, (row_id, text) in enumerate(zip(ids, texts)):
+                    row = row_offset + offset
+                    if row in done_rows:
+                        skipped += 1
+                        continue
+                    text = "" if text is None or (isinstance(text, float) and pd.isna(text)) else str(text)
+                    if not text.strip():
+                        record = {"row": row, "source": text, "translation": ""}
+                        if args.id_column:
+                            record[args.id_column] = row_id
+                        empty_records.append(record)
+                        continue
+                    pending.append((row, row_id, text))
+                row_offset += len(texts)
+                if empty_records:
+                    writer.write(empty_records)
+                    checkpoint.update(len(empty_records), 0)
+                    translated += len(empty_records)
+
+                # One chunk in flight at a time keeps memory bounded by chunk_size rows.
+                for batch_done, batch_failed in executor.map(run_batch, length_buckets(pending, args.batch_size)):
+                    translated += batch_done
+                    failed += batch_failed
+                elapsed = time.perf_counter() - start
+                logger.info(f"Bulk: {row_offset} rows read, {translated} translated, {failed} failed, "
+                            f"{skipped} skipped ({translated / elapsed:.1f} rows/s).")
+    finally:
+        writer.close()
+
+    return {"rows_read": row_offset, "translated": translated, "failed": failed, "skipped": skipped,
+            "seconds": round(time.perf_counter() - start, 1)}
+
+
+def main(argv=None):
+    from . import config
+
+    parser = argparse.ArgumentParser(description="Translate a CSV / JSONL corpus with BretonTraducteur.")
+    parser.add_argument("input", help="Input .csv or .jsonl file.")
+    parser.add_argument("output", help="Output .jsonl or .csv file (appended to when resuming).")
+    parser.add_argument("--model", default="nllb finetuned", choices=["nllb", "helsinki", "llama", "nllb finetuned"])
+    parser.add_argument("--mode", default="default", choices=list(MODES))
+    parser.add_argument("--k", type=int, default=5, help="Examples per prompt in rag / few-shot mode.")
+    parser.add_argument("--profile", default=config.GENERATION_PROFILE, choices=["fast", "quality"],
+                        help="Decoding profile: greedy (fast) or beam search (quality).")
+    parser.add_argument("--text-column", default="francais", help="Column holding the French text.")
+    parser.add_argument("--id-column", default=None, help="Optional column copied to the output.")
+    parser.add_argument("--chunk-size", type=int, default=2000, help="Rows read from the input at a time.")
+    parser.add_argument("--batch-size", type=int, default=config.BATCH_MAX_SIZE, help="Rows per translate_batch() call.")
+    parser.add_argument("--workers", type=int, default=2, help="Batches translated in parallel.")
+    parser.add_argument("--with-prompt", action="store_true", help="Also write the prompt sent to the model.")
+    parser.add_argument("--use-cache", action="store_true", help="Read and fill the translation cache.")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=config.LOG_LEVEL, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    config.setup_cache()
+
+    from . import utils
+    from .translator import BretonTraducteur, assistance_params
+
+    args.assistance = assistance_params(MODES[args.mode], args.k)
+    if any(args.assistance) and not utils.initialize_utils():
+        logger.error("RAG / few-shot examples are unavailable: check the Zilliz or local index configuration.")
+        return 1
+    translator = BretonTraducteur(cache_enabled=args.use_cache and config.TRANSLATION_CACHE_ENABLED)
+    if translator.registry.is_registered(args.model):
+        # Loaded once before the batch threads start: racing for the load, all but one would time out.
+        try:
+            translator.registry.get(args.model)
+        except Exception as e:
+            logger.error(f"Could not load model '{args.model}': {e}")
+            return 1
+
+    summary = translate_corpus(translator, args)
+    print(json.dumps(summary))
+    return 1 if summary["failed"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,4 +1,5 @@
 # src/config.py
+import hashlib
 import os
 from dotenv import load_dotenv
 
@@ -37,16 +38,197 @@ MODEL_NAME_LLAMA = "llama3.2:1b"
 MODEL_NAME_NLLB_FT = "Mouette34/nllb-finetuned-fr-br"
 MODEL_NAME_TRANSLATOR_SENTENCE_TRANSFORMER = 'distiluse-base-multilingual-cased-v1'
 
+# --- Ollama (llama) ---
+# Server URL (None: the ollama client's default, or OLLAMA_HOST) and pooled keep-alive HTTP connections.
+OLLAMA_HOST = os.environ.get("OLLAMA_HOST") or None
+OLLAMA_MAX_CONNECTIONS = int(os.environ.get("OLLAMA_MAX_CONNECTIONS", "16"))
+OLLAMA_TIMEOUT_SECONDS = float(os.environ.get("OLLAMA_TIMEOUT_SECONDS", "120"))
+# How long Ollama keeps the model (and its prompt cache) loaded after a request ("30m", "-1" = forever).
+OLLAMA_KEEP_ALIVE = os.environ.get("OLLAMA_KEEP_ALIVE", "30m")
+# Pinned on every request: a request with another num_ctx makes Ollama reload the model.
+# It must hold PROMPT_TOKEN_BUDGET_LLAMA plus the answer, or Ollama truncates the start of the prompt.
+OLLAMA_NUM_CTX = int(os.environ.get("OLLAMA_NUM_CTX", "4096"))
+OLLAMA_NUM_THREAD = int(os.environ.get("OLLAMA_NUM_THREAD", "0"))  # 0: Ollama's default.
+# Optional static system message sent first with every llama request, extending the prompt prefix
+# Ollama reuses from one request to the next (the prompt's own header is always first). It changes
+# llama's answers, so it is part of llama's cache version. Empty (default): the prompt is sent alone.
+OLLAMA_SYSTEM_PROMPT = os.environ.get("OLLAMA_SYSTEM_PROMPT", "")
+# Load the Ollama model at startup instead of on the first request.
+OLLAMA_WARMUP = os.environ.get("OLLAMA_WARMUP", "1") == "1"
+
+# --- Model Versions ---
+# Hugging Face revision (branch, tag or commit) loaded for each seq2seq model, and the
+# Ollama tag for llama. Changing a version invalidates its cached translations.
+MODEL_REVISION_NLLB = os.environ.get("MODEL_REVISION_NLLB", "main")
+MODEL_REVISION_HELSINKI = os.environ.get("MODEL_REVISION_HELSINKI", "main")
+MODEL_REVISION_NLLB_FT = os.environ.get("MODEL_REVISION_NLLB_FT", "main")
+
+# --- CPU inference precision / backend per seq2seq model ---
+# "fp32" (default), "bf16", "int8" (dynamic quantization) or "onnx" (ONNX Runtime via optimum).
+# See src/quantization.py to measure the speed / memory / quality delta of each option.
+MODEL_PRECISION_NLLB = os.environ.get("MODEL_PRECISION_NLLB", "fp32")
+MODEL_PRECISION_HELSINKI = os.environ.get("MODEL_PRECISION_HELSINKI", "fp32")
+MODEL_PRECISION_NLLB_FT = os.environ.get("MODEL_PRECISION_NLLB_FT", "fp32")
+
+# Precision changes the outputs, so it is part of the version used by the translation cache.
+MODEL_VERSIONS = {
+    "nllb": f"{MODEL_NAME_NLLB}@{MODEL_REVISION_NLLB}/{MODEL_PRECISION_NLLB}",
+    "helsinki": f"{MODEL_NAME_HELSINKI}@{MODEL_REVISION_HELSINKI}/{MODEL_PRECISION_HELSINKI}",
+    "nllb finetuned": f"{MODEL_NAME_NLLB_FT}@{MODEL_REVISION_NLLB_FT}/{MODEL_PRECISION_NLLB_FT}",
+    # The system prompt changes llama's answers too.
+    "llama": MODEL_NAME_LLAMA + (
+        f"/system-{hashlib.sha256(OLLAMA_SYSTEM_PROMPT.encode('utf-8')).hexdigest()[:8]}" if OLLAMA_SYSTEM_PROMPT else ""
+    ),
+}
+
+# --- Model Registry (lazy loading, LRU eviction) ---
+# Models are loaded the first time translate() needs them. When one of these budgets
+# is exceeded, the least recently used model is unloaded. 0 disables the limit.
+MODEL_REGISTRY_MAX_MODELS = int(os.environ.get("MODEL_REGISTRY_MAX_MODELS", "0"))
+MODEL_REGISTRY_MAX_MEMORY_MB = int(os.environ.get("MODEL_REGISTRY_MAX_MEMORY_MB", "0"))
+
+# --- Micro-batching of concurrent translate() calls ---
+# Requests for the same seq2seq model arriving within BATCH_MAX_WAIT_MS are run
+# as one padded generate() of at most BATCH_MAX_SIZE prompts.
+BATCHING_ENABLED = os.environ.get("BATCHING_ENABLED", "1") == "1"
+BATCH_MAX_SIZE = int(os.environ.get("BATCH_MAX_SIZE", "8"))
+BATCH_MAX_WAIT_MS = float(os.environ.get("BATCH_MAX_WAIT_MS", "10"))
+
+# --- Generation settings (src/generation.py) ---
+# Default decoding profile: "fast" (greedy, also for Helsinki whose own config uses beams) or "quality" (beam search).
+GENERATION_PROFILE = os.environ.get("GENERATION_PROFILE", "fast")
+# Expected output/input token ratio per model ("<model>:<ratio>,..."); max_new_tokens = ratio x source tokens + margin.
+GENERATION_LENGTH_RATIOS = {
+    name.strip(): float(ratio)
+    for name, _, ratio in (
+        item.rpartition(":")
+        for item in os.environ.get("GENERATION_LENGTH_RATIOS", "nllb:1.5,helsinki:1.3,nllb finetuned:1.5,llama:2.0").split(",")
+        if item.strip()
+    )
+}
+GENERATION_LENGTH_MARGIN = int(os.environ.get("GENERATION_LENGTH_MARGIN", "10"))
+GENERATION_MIN_NEW_TOKENS = int(os.environ.get("GENERATION_MIN_NEW_TOKENS", "16"))
+GENERATION_MAX_NEW_TOKENS = int(os.environ.get("GENERATION_MAX_NEW_TOKENS", "400"))
+GENERATION_QUALITY_BEAMS = int(os.environ.get("GENERATION_QUALITY_BEAMS", "4"))
+
+# --- Async request pipeline ---
+# Threads for blocking retrieval calls (Zilliz searches) and for torch inference
+# when micro-batching is disabled or for document mode.
+ASYNC_IO_WORKERS = int(os.environ.get("ASYNC_IO_WORKERS", "16"))
+ASYNC_INFERENCE_WORKERS = int(os.environ.get("ASYNC_INFERENCE_WORKERS", "2"))
+# Gradio: concurrent translation requests handled at once, and queued requests beyond that
+# (0 = unbounded queue).
+GRADIO_CONCURRENCY_LIMIT = int(os.environ.get("GRADIO_CONCURRENCY_LIMIT", "16"))
+GRADIO_QUEUE_MAX_SIZE = int(os.environ.get("GRADIO_QUEUE_MAX_SIZE", "0"))
+
+# --- Document mode (sentence-segmented translation) ---
+# Sentences longer than this many characters are cut further at clause boundaries.
+DOCUMENT_MAX_CHUNK_CHARS = int(os.environ.get("DOCUMENT_MAX_CHUNK_CHARS", "300"))
+# Worker threads used to translate chunks in parallel (llama / Ollama).
+DOCUMENT_MAX_WORKERS = int(os.environ.get("DOCUMENT_MAX_WORKERS", "4"))
+
+# --- Translation result cache (in-memory LRU + SQLite) ---
+TRANSLATION_CACHE_ENABLED = os.environ.get("TRANSLATION_CACHE_ENABLED", "1") == "1"
+TRANSLATION_CACHE_DB_PATH = os.environ.get("TRANSLATION_CACHE_DB_PATH", os.path.join(CACHE_DIR, "translations.sqlite3"))
+TRANSLATION_CACHE_MEMORY_ENTRIES = int(os.environ.get("TRANSLATION_CACHE_MEMORY_ENTRIES", "2048"))
+TRANSLATION_CACHE_DISK_ENTRIES = int(os.environ.get("TRANSLATION_CACHE_DISK_ENTRIES", "200000"))
+TRANSLATION_CACHE_TTL_SECONDS = float(os.environ.get("TRANSLATION_CACHE_TTL_SECONDS", str(7 * 24 * 3600))) # 0 = no expiry
+# Few-shot prompts use random examples, so their results are not cached unless enabled here.
+TRANSLATION_CACHE_FEW_SHOT = os.environ.get("TRANSLATION_CACHE_FEW_SHOT", "0") == "1"
+
 # --- RAG / Utils Configuration ---
 ZILLIZ_URI = os.environ.get("ZILLIZ_URI")
 ZILLIZ_TOKEN = os.environ.get("ZILLIZ_TOKEN") 
 RAG_COLLECTION_NAME = "traductions_francais_breton"
 MODEL_NAME_RAG_ENCODER = 'paraphrase-multilingual-mpnet-base-v2'
+# Vector search backend: "zilliz" (Zilliz Cloud collection) or "local" (embedded index
+# built with `python -m src.vector_index build ...`, see src/vector_index.py).
+RAG_BACKEND = os.environ.get("RAG_BACKEND", "zilliz")
+LOCAL_INDEX_DIR = os.environ.get("LOCAL_INDEX_DIR", os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "rag_index"))
+# IVF lists probed per query when the local index has an approximate index (0 = exact search).
+LOCAL_INDEX_NPROBE = int(os.environ.get("LOCAL_INDEX_NPROBE", "8"))
+# Query embeddings: LRU cache size (entries) and coalescing of concurrent encode() calls.
+EMBEDDING_CACHE_SIZE = int(os.environ.get("EMBEDDING_CACHE_SIZE", "4096"))
+EMBEDDING_BATCH_MAX_SIZE = int(os.environ.get("EMBEDDING_BATCH_MAX_SIZE", "32"))
+EMBEDDING_BATCH_MAX_WAIT_MS = float(os.environ.get("EMBEDDING_BATCH_MAX_WAIT_MS", "5"))
+# Few-shot pool: number of pairs kept in memory (0 = always use random-vector searches),
+# refresh period in seconds (0 = load once) and stratified sampling by sentence length.
+FEW_SHOT_POOL_SIZE = int(os.environ.get("FEW_SHOT_POOL_SIZE", "5000"))
+FEW_SHOT_REFRESH_SECONDS = float(os.environ.get("FEW_SHOT_REFRESH_SECONDS", "0"))
+FEW_SHOT_STRATIFY = os.environ.get("FEW_SHOT_STRATIFY", "0") == "1"
+# Vector searches (src/retrieval.py): Zilliz search `level` (higher = better recall, slower), deadline per
+# search, delay before a duplicate (hedged) search is sent (0 = no hedging) and searches run at once.
+RAG_SEARCH_LEVEL = int(os.environ.get("RAG_SEARCH_LEVEL", "2"))
+RAG_SEARCH_TIMEOUT_SECONDS = float(os.environ.get("RAG_SEARCH_TIMEOUT_SECONDS", "1.0"))
+RAG_SEARCH_HEDGE_AFTER_MS = float(os.environ.get("RAG_SEARCH_HEDGE_AFTER_MS", "150"))
+RAG_SEARCH_WORKERS = int(os.environ.get("RAG_SEARCH_WORKERS", "8"))
+# Circuit breaker: consecutive failed searches before RAG fails fast, and seconds before it is probed again.
+RAG_BREAKER_FAILURES = int(os.environ.get("RAG_BREAKER_FAILURES", "5"))
+RAG_BREAKER_RESET_SECONDS = float(os.environ.get("RAG_BREAKER_RESET_SECONDS", "30"))
+# Seconds between background reconnection attempts when the collection is unavailable.
+RAG_RECONNECT_SECONDS = float(os.environ.get("RAG_RECONNECT_SECONDS", "15"))
+
+# --- Prompt assembly (src/prompting.py) ---
+# Token budget of a whole prompt: the seq2seq models truncate their input at 512 tokens;
+# for llama (approximate count) it must leave room for the answer in Ollama's context.
+PROMPT_TOKEN_BUDGET = int(os.environ.get("PROMPT_TOKEN_BUDGET", "512"))
+PROMPT_TOKEN_BUDGET_LLAMA = int(os.environ.get("PROMPT_TOKEN_BUDGET_LLAMA", "1536"))
+# RAG examples whose cosine similarity to the source is below this are not used (0 keeps all).
+PROMPT_MIN_SIMILARITY = float(os.environ.get("PROMPT_MIN_SIMILARITY", "0.3"))
+# Examples whose French words overlap an already selected one this much (Jaccard) are dropped (1 = exact duplicates only).
+PROMPT_DEDUP_THRESHOLD = float(os.environ.get("PROMPT_DEDUP_THRESHOLD", "0.8"))
+
+# --- Translation memory ---
+# Requests whose French text is in the RAG corpus (same normalized text, or best RAG hit with a
+# cosine similarity >= TRANSLATION_MEMORY_THRESHOLD and the same numbers) get the stored Breton
+# without any generation.
+TRANSLATION_MEMORY_ENABLED = os.environ.get("TRANSLATION_MEMORY_ENABLED", "1") == "1"
+TRANSLATION_MEMORY_THRESHOLD = float(os.environ.get("TRANSLATION_MEMORY_THRESHOLD", "0.97"))
+
+# --- "auto" model: latency-budgeted routing (src/routing.py) ---
+# Paths tried in order of preference ("<model>:<default|few-shot|rag>"); the first whose moving-average
+# latency fits in the budget serves the request, and AUTO_FALLBACK takes over when it runs late.
+AUTO_ROUTE_CASCADE = os.environ.get("AUTO_ROUTE_CASCADE", "llama:rag,nllb finetuned:rag,nllb:rag,nllb finetuned:default")
+AUTO_FALLBACK = os.environ.get("AUTO_FALLBACK", "nllb finetuned:default")
+AUTO_LATENCY_BUDGET_SECONDS = float(os.environ.get("AUTO_LATENCY_BUDGET_SECONDS", "3.0"))
+AUTO_K = int(os.environ.get("AUTO_K", "5"))  # Examples per prompt when the caller did not give k.
+AUTO_EWMA_ALPHA = float(os.environ.get("AUTO_EWMA_ALPHA", "0.2"))
+AUTO_EXPLORE_SECONDS = float(os.environ.get("AUTO_EXPLORE_SECONDS", "60"))  # Re-probe paths with older stats.
+AUTO_FALLBACK_RESERVE_SECONDS = float(os.environ.get("AUTO_FALLBACK_RESERVE_SECONDS", "0.5"))  # Until the fallback is measured.
+
+# --- Startup ---
+# Models loaded on background threads at startup (comma-separated short names; empty = load on first use)
+# and how many load concurrently. The UI starts serving right away.
+PRELOAD_MODELS = [name.strip() for name in os.environ.get("PRELOAD_MODELS", "nllb,helsinki,nllb finetuned").split(",") if name.strip()]
+STARTUP_LOAD_WORKERS = int(os.environ.get("STARTUP_LOAD_WORKERS", "3"))
+# Seconds a request waits for a model or the RAG backend that is still loading before failing
+# (RAG / few-shot requests then fall back to no examples). 0 fails immediately.
+STARTUP_WAIT_SECONDS = float(os.environ.get("STARTUP_WAIT_SECONDS", "30"))
+
+# --- Multi-process serving (src/serving.py) ---
+# Worker processes running seq2seq generation (0 = generate in the app process). Linux only (fork).
+SERVING_WORKERS = int(os.environ.get("SERVING_WORKERS", "0"))
+# torch threads per worker (0 = one per core of the worker's core slice).
+SERVING_THREADS_PER_WORKER = int(os.environ.get("SERVING_THREADS_PER_WORKER", "0"))
+
+# --- Observability ---
+# Per-request / per-stage logs are emitted at DEBUG; INFO keeps startup and warnings only.
+LOG_LEVEL = os.environ.get("LOG_LEVEL", "INFO").upper()
+# Port of the Prometheus /metrics endpoint (0 disables it).
+METRICS_PORT = int(os.environ.get("METRICS_PORT", "9100"))
 
 # --- Sanity Checks ---
 def check_config():
     """Checks if essential configuration (like Zilliz creds) is set."""
     config_ok = True
+    if RAG_BACKEND == "local":
+        if not os.path.isdir(LOCAL_INDEX_DIR):
+            print(f"ERROR: Local RAG index directory not found: {LOCAL_INDEX_DIR}")
+            config_ok = False
+        return config_ok
+    if RAG_BACKEND != "zilliz":
+        print(f"ERROR: Unknown RAG_BACKEND '{RAG_BACKEND}' (expected 'zilliz' or 'local').")
+        return False
     if not ZILLIZ_URI:
         print("ERROR: ZILLIZ_URI environment variable not set.")
         config_ok = False
@@ -0,0 +1,124 @@
+# src/fewshot.py
+import logging
+import random
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# Upper bounds (in characters of the French side) of the length strata; the last one is open.
+LENGTH_BUCKETS = (40, 120)
+
+
+def _bucket_of(example: dict) -> int:
+    length = len(example["french"])
+    for i, upper in enumerate(LENGTH_BUCKETS):
+        if length < upper:
+            return i
+    return len(LENGTH_BUCKETS)
+
+
+class FewShotSampler:
+    """
+    In-memory pool of French/Breton pairs for the few-shot mode.
+
+    A background thread streams rows from `row_source` (an iterable factory yielding
+    {'francais': ..., 'breton': ...} dicts) and keeps a uniform reservoir sample of
+    `reservoir_size` pairs (Algorithm R). sample() then serves k random pairs from
+    memory, optionally stratified by sentence length. The pool is rebuilt every
+    `refresh_seconds` (0 disables refreshing).
+    """
+
+    def __init__(self, row_source, reservoir_size: int = 5000, refresh_seconds: float = 0, seed: int = None):
+        self._row_source = row_source
+        self.reservoir_size = reservoir_size
+        self.refresh_seconds = refresh_seconds
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._pool = []
+        self._buckets = []
+        self._ready = threading.Event()
+        self._stopped = threading.Event()
+        self._thread = None
+        self.rows_scanned = 0
+        self.loaded_at = None
+
+    @property
+    def ready(self) -> bool:
+        return self._ready.is_set()
+
+    def start(self):
+        """Starts loading the pool in the background. Returns immediately."""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="few-shot-sampler", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stopped.set()
+
+    def wait_ready(self, timeout: float = None) -> bool:
+        return self._ready.wait(timeout)
+
+    def refresh(self):
+        """Rebuilds the reservoir from the row source (blocking)."""
+        reservoir = []
+        scanned = 0
+        for row in self._row_source():
+            french, breton = row.get("francais"), row.get("breton")
+            if not french or not breton:
+                continue
+            example = {"french": french, "breton": breton}
+            scanned += 1
+            if len(reservoir) < self.reservoir_size:
+                reservoir.append(example)
+            else:
+                slot = self._random.randrange(scanned)
+                if slot < self.reservoir_size:
+                    reservoir[slot] = example
+        buckets = [[] for _ in range(len(LENGTH_BUCKETS) + 1)]
+        for example in reservoir:
+            buckets[_bucket_of(example)].append(example)
+        with self._lock:
+            self._pool = reservoir
+            self._buckets = buckets
+            self.rows_scanned = scanned
+            self.loaded_at = time.time()
+        if reservoir:
+            self._ready.set()
+        logger.info(f"Few-shot: pool loaded with {len(reservoir)} pairs (scanned {scanned} rows).")
+
+    def sample(self, k: int, stratify: bool = False) -> list[dict]:
+        """Returns up to k distinct random pairs [{'french': ..., 'breton': ...}] from the pool."""
+        with self._lock:
+            pool, buckets = self._pool, self._buckets
+        if k <= 0 or not pool:
+            return []
+        if not stratify:
+            return self._random.sample(pool, min(k, len(pool)))
+
+        # Spread k over the non-empty length strata as evenly as possible.
+        non_empty = [bucket for bucket in buckets if bucket]
+        quotas = [k // len(non_empty)] * len(non_empty)
+        for i in self._random.sample(range(len(non_empty)), k % len(non_empty)):
+            quotas[i] += 1
+        examples = []
+        for bucket, quota in zip(non_empty, quotas):
+            examples.extend(self._random.sample(bucket, min(quota, len(bucket))))
+        if len(examples) < k:
+            # Small strata could not fill their quota: top up from the rest of the pool.
+            taken = {id(example) for example in examples}
+            rest = [example for example in pool if id(example) not in taken]
+            examples.extend(self._random.sample(rest, min(k - len(examples), len(rest))))
+        self._random.shuffle(examples)
+        return examples
+
+    def _run(self):
+        while not self._stopped.is_set():
+            try:
+                self.refresh()
+            except Exception as e:
+                logger.error(f"Few-shot pool loading failed: {e}")
+            if not self.refresh_seconds:
+                return
+            self._stopped.wait(self.refresh_seconds)
@@ -0,0 +1,55 @@
+# src/generation.py
+"""
+Per-request generation settings.
+
+The decode budget follows the source: max_new_tokens is the source token count times the
+model's output/input length ratio (GENERATION_LENGTH_RATIOS) plus a margin, clamped to
+[GENERATION_MIN_NEW_TOKENS, GENERATION_MAX_NEW_TOKENS]. Short phrases no longer reserve a
+150-token decode, and long sentences are no longer cut at 150 tokens.
+
+Decoding profiles:
+- "fast": greedy search, for every model. This overrides Helsinki's generation config,
+  which asks for beam search (opus-mt: 4 beams); use "quality" to get beams back.
+- "quality": beam search (GENERATION_QUALITY_BEAMS beams) with early stopping.
+Ollama has no beam search: num_predict carries the decode budget, "fast" decodes greedily
+(temperature 0) and "quality" keeps the model's own sampling settings. Sampled output is
+not reproducible, so it is not cached.
+"""
+import math
+
+PROFILES = ("fast", "quality")
+# Part of every cached translation's model version: bump it when decoding changes for all
+# models, so translations produced the old way are dropped from the cache.
+# 2: per-request max_new_tokens and decoding profiles (was max_length=150 with each model's defaults).
+CACHE_VERSION = "gen2"
+
+
+def is_deterministic(model_name: str, profile: str) -> bool:
+    """Whether a profile always gives the same output for the same prompt (Ollama "quality" samples)."""
+    return model_name != "llama" or profile == "fast"
+
+
+def check_profile(profile: str) -> str:
+    if profile not in PROFILES:
+        raise ValueError(f"Unknown generation profile '{profile}' (expected one of {', '.join(PROFILES)}).")
+    return profile
+
+
+def max_new_tokens(source_tokens: int, ratio: float, margin: int = 10, minimum: int = 16, maximum: int = 400) -> int:
+    """Decode budget of a source of `source_tokens` tokens."""
+    return max(minimum, min(maximum, math.ceil(source_tokens * ratio) + margin))
+
+
+def hf_generation_args(profile: str, new_tokens: int, beams: int = 4) -> dict:
+    """generate() arguments of a profile."""
+    if profile == "quality":
+        return {"max_new_tokens": new_tokens, "num_beams": beams, "early_stopping": True}
+    return {"max_new_tokens": new_tokens, "num_beams": 1, "do_sample": False}
+
+
+def ollama_options(profile: str, num_predict: int) -> dict:
+    """Ollama `options` of a profile."""
+    options = {"num_predict": num_predict}
+    if profile == "fast":
+        options["temperature"] = 0
+    return options
@@ -0,0 +1,201 @@
+# src/metrics.py
+import contextvars
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+logger = logging.getLogger(__name__)
+
+# Seconds; covers cached lookups up to long llama generations.
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+TOKEN_BUCKETS = (8, 16, 32, 64, 128, 256, 512, 1024)
+
+
+class Histogram:
+    """Prometheus-style cumulative histogram with labels."""
+
+    def __init__(self, name: str, documentation: str, label_names: tuple, buckets: tuple = DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = label_names
+        self.buckets = tuple(sorted(buckets))
+        self._series = {}  # label values -> [bucket counts..., count, sum]
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels):
+        key = tuple(str(labels.get(name, "")) for name in self.label_names)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [0] * (len(self.buckets) + 2)
+            for i, upper in enumerate(self.buckets):
+                if value <= upper:
+                    series[i] += 1
+            series[-2] += 1
+            series[-1] += value
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            items = sorted(self._series.items())
+        for key, series in items:
+            base = ",".join(f'{name}="{_escape(value)}"' for name, value in zip(self.label_names, key))
+            sep = "," if base else ""
+            for upper, count in zip(self.buckets, series):
+                lines.append(f'{self.name}_bucket{{{base}{sep}le="{upper:g}"}} {count}')
+            lines.append(f'{self.name}_bucket{{{base}{sep}le="+Inf"}} {series[-2]}')
+            lines.append(f"{self.name}_count{{{base}}} {series[-2]}")
+            lines.append(f"{self.name}_sum{{{base}}} {series[-1]:.6f}")
+        return lines
+
+
+class Counter:
+    """Prometheus-style counter with labels."""
+
+    def __init__(self, name: str, documentation: str, label_names: tuple):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = label_names
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1, **labels):
+        key = tuple(str(labels.get(name, "")) for name in self.label_names)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            items = sorted(self._values.items())
+        for key, value in items:
+            base = ",".join(f'{name}="{_escape(v)}"' for name, v in zip(self.label_names, key))
+            lines.append(f"{self.name}{{{base}}} {value:g}")
+        return lines
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+STAGE_SECONDS = Histogram(
+    "translation_stage_seconds", "Time spent per request stage.", ("stage", "model", "mode", "k")
+)
+STAGE_TOKENS = Histogram(
+    "translation_stage_tokens", "Token counts seen by a stage.", ("stage", "model", "direction"), TOKEN_BUCKETS
+)
+REQUESTS_TOTAL = Counter("translation_requests_total", "Translation requests by outcome.", ("model", "mode", "outcome"))
+AUTO_ROUTES_TOTAL = Counter(
+    "translation_auto_routes_total", "Requests of the \"auto\" model by the path that served them.",
+    ("model", "mode", "fallback")
+)
+METRICS = [STAGE_SECONDS, STAGE_TOKENS, REQUESTS_TOTAL, AUTO_ROUTES_TOTAL]
+
+# Model / mode / k of the request being served by the current thread or task.
+_REQUEST_CONTEXT = contextvars.ContextVar("translation_request_context", default={})
+
+
+def mode_label(use_rag: int, use_prompt: int) -> str:
+    if use_rag > 0:
+        return "rag"
+    if use_prompt > 0:
+        return "few-shot"
+    return "default"
+
+
+@contextmanager
+def request_context(model: str, mode: str, k: int):
+    """Sets the labels inherited by every span opened while serving this request."""
+    token = _REQUEST_CONTEXT.set({"model": model, "mode": mode, "k": k})
+    try:
+        yield
+    finally:
+        _REQUEST_CONTEXT.reset(token)
+
+
+class Span:
+    def __init__(self, stage: str, labels: dict):
+        self.stage = stage
+        self.labels = labels
+        self.attributes = {}
+
+    def set(self, **attributes):
+        """Attaches attributes (e.g. tokens_in=..., tokens_out=..., batch_size=...) to the span."""
+        self.attributes.update(attributes)
+
+
+@contextmanager
+def span(stage: str, **labels):
+    """
+    Times a stage of the request path and records it in STAGE_SECONDS.
+    Labels default to the current request_context(); token counts set on the span
+    (tokens_in / tokens_out) are recorded in STAGE_TOKENS.
+    """
+    merged = dict(_REQUEST_CONTEXT.get())
+    merged.update(labels)
+    current = Span(stage, merged)
+    start = time.perf_counter()
+    try:
+        yield current
+    finally:
+        duration = time.perf_counter() - start
+        STAGE_SECONDS.observe(duration, stage=stage, **merged)
+        for direction in ("tokens_in", "tokens_out"):
+            if direction in current.attributes:
+                STAGE_TOKENS.observe(current.attributes[direction], stage=stage,
+                                     model=merged.get("model", ""), direction=direction[len("tokens_"):])
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("span stage=%s duration_ms=%.1f labels=%s attributes=%s",
+                         stage, 1000 * duration, merged, current.attributes)
+
+
+def render_prometheus() -> str:
+    lines = []
+    for metric in METRICS:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+# --- HTTP endpoint ---
+
+# path -> callable returning (status_code, content_type, body)
+_ROUTES = {
+    "/metrics": lambda: (200, "text/plain; version=0.0.4; charset=utf-8", render_prometheus()),
+}
+
+
+def add_route(path: str, handler):
+    """Registers an extra endpoint on the metrics server (e.g. health checks)."""
+    _ROUTES[path] = handler
+
+
+class _Handler(BaseHTTPRequestHandler):
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        handler = _ROUTES.get(self.path.split("?", 1)[0])
+        if handler is None:
+            self.send_error(404)
+            return
+        try:
+            status, content_type, body = handler()
+        except Exception as e:
+            logger.exception("Metrics endpoint %s failed", self.path)
+            status, content_type, body = 500, "text/plain; charset=utf-8", f"error: {e}\n"
+        data = body.encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+
+def start_metrics_server(port: int, host: str = "0.0.0.0"):
+    """Serves /metrics (and routes added with add_route) on a background thread."""
+    server = ThreadingHTTPServer((host, port), _Handler)
+    threading.Thread(target=server.serve_forever, name="metrics-server", daemon=True).start()
+    logger.info("Metrics endpoint listening on http://%s:%d/metrics", host, port)
+    return server
@@ -0,0 +1,233 @@
+# src/model_registry.py
+import logging
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+
+def estimate_size_bytes(obj) -> int:
+    """
+    Estimates the memory footprint of a loaded model (or a tuple of tokenizer/model).
+    Only torch modules (anything exposing parameters()/buffers()) and ONNX Runtime models
+    are counted; tokenizers are small compared to the weights and are ignored.
+    """
+    if isinstance(obj, (tuple, list)):
+        return sum(estimate_size_bytes(item) for item in obj)
+    if getattr(obj, "model_save_dir", None) is not None:
+        # ONNX Runtime model (optimum): its sessions hold the weights of the .onnx files it was loaded from.
+        return _onnx_files_size(obj.model_save_dir)
+    total = 0
+    if hasattr(obj, "parameters"):
+        try:
+            total += sum(p.numel() * p.element_size() for p in obj.parameters())
+        except Exception:
+            pass
+    if hasattr(obj, "buffers"):
+        try:
+            total += sum(b.numel() * b.element_size() for b in obj.buffers())
+        except Exception:
+            pass
+    if hasattr(obj, "state_dict"):
+        # Dynamically quantized (int8) Linear layers keep their packed weights outside parameters().
+        try:
+            total += sum(
+                t.numel() * t.element_size()
+                for t in obj.state_dict().values()
+                if getattr(t, "is_quantized", False)
+            )
+        except Exception:
+            pass
+    return total
+
+
+def _onnx_files_size(path) -> int:
+    total = 0
+    for root, _, files in os.walk(path):
+        total += sum(os.path.getsize(os.path.join(root, name)) for name in files if ".onnx" in name)
+    return total
+
+
+class ModelNotReadyError(TimeoutError):
+    """Raised by ModelRegistry.get() when a model is still loading after the allowed wait."""
+
+
+class ModelRegistry:
+    """
+    Loads models on first use and keeps them in memory under a budget.
+
+    Each model is registered with a loader callable. get() loads it on demand and
+    marks it as most recently used. When the number of resident models or their
+    estimated size exceeds the budget, the least recently used ones are evicted.
+    A budget of 0 (or None) disables the corresponding limit.
+    preload() loads models on background threads so the application can start
+    serving before they are all resident.
+    """
+
+    def __init__(self, max_models: int = 0, max_memory_mb: int = 0):
+        self.max_models = max_models or 0
+        self.max_memory_bytes = (max_memory_mb or 0) * 1024 * 1024
+        self._loaders = {}
+        self._resident = OrderedDict()  # name -> (value, size_bytes)
+        self._lock = threading.RLock()
+        self._load_locks = {}
+        self._loading = set()
+        self._errors = {}  # name -> message of the last failed load
+
+    def register(self, name: str, loader):
+        """Registers a loader callable returning the object to keep resident for `name`."""
+        with self._lock:
+            self._loaders[name] = loader
+            self._load_locks.setdefault(name, threading.Lock())
+
+    def is_registered(self, name: str) -> bool:
+        return name in self._loaders
+
+    def is_loaded(self, name: str) -> bool:
+        with self._lock:
+            return name in self._resident
+
+    def get(self, name: str, timeout: float = None):
+        """
+        Returns the resident object for `name`, loading it first if needed.
+        If another thread is already loading it, waits at most `timeout` seconds
+        (None waits indefinitely) before raising ModelNotReadyError.
+        """
+        with self._lock:
+            if name in self._resident:
+                self._resident.move_to_end(name)
+                return self._resident[name][0]
+            if name not in self._loaders:
+                raise KeyError(f"Model '{name}' is not registered.")
+            load_lock = self._load_locks[name]
+
+        # Load outside the registry lock so other models stay available meanwhile,
+        # but only once per model even if several requests ask for it concurrently.
+        if not load_lock.acquire(timeout=-1 if timeout is None else timeout):
+            raise ModelNotReadyError(f"Model '{name}' is still loading, please retry shortly.")
+        try:
+            with self._lock:
+                if name in self._resident:
+                    self._resident.move_to_end(name)
+                    return self._resident[name][0]
+                self._loading.add(name)
+            logger.info(f"Registry: Loading model '{name}'...")
+            try:
+                value = self._loaders[name]()
+            except Exception as e:
+                with self._lock:
+                    self._errors[name] = str(e)
+                raise
+            finally:
+                with self._lock:
+                    self._loading.discard(name)
+            size_bytes = estimate_size_bytes(value)
+            with self._lock:
+                self._resident[name] = (value, size_bytes)
+                self._resident.move_to_end(name)
+                self._errors.pop(name, None)
+                logger.info(f"Registry: Model '{name}' loaded ({size_bytes / (1024 * 1024):.1f} MB).")
+                self._enforce_budget(keep=name)
+            return value
+        finally:
+            load_lock.release()
+
+    def preload(self, names: list[str], max_workers: int = 2) -> list:
+        """
+        Starts loading `names` concurrently on background threads and returns their futures.
+        Names beyond the max_models budget are skipped, since they would evict each other.
+        """
+        names = [name for name in names if self.is_registered(name)]
+        if self.max_models and len(names) > self.max_models:
+            logger.warning(f"Registry: Preloading only {names[:self.max_models]} (MODEL_REGISTRY_MAX_MODELS={self.max_models}).")
+            names = names[:self.max_models]
+        if not names:
+            return []
+        executor = ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(names))), thread_name_prefix="model-preload")
+        futures = [executor.submit(self._preload_one, name) for name in names]
+        executor.shutdown(wait=False)
+        return futures
+
+    def _preload_one(self, name: str) -> bool:
+        try:
+            self.get(name)
+            return True
+        except Exception as e:
+            logger.error(f"Registry: Background loading of '{name}' failed: {e}")
+            return False
+
+    def status(self) -> dict:
+        """Maps each registered model to "loaded", "loading", "failed" or "not_loaded"."""
+        with self._lock:
+            states = {}
+            for name in self._loaders:
+                if name in self._resident:
+                    states[name] = "loaded"
+                elif name in self._loading:
+                    states[name] = "loading"
+                elif name in self._errors:
+                    states[name] = "failed"
+                else:
+                    states[name] = "not_loaded"
+            return states
+
+    def errors(self) -> dict:
+        with self._lock:
+            return dict(self._errors)
+
+    def add(self, name: str, value):
+        """Makes an already loaded object resident under `name` (its loader is kept for reloads)."""
+        size_bytes = estimate_size_bytes(value)
+        with self._lock:
+            self._loaders.setdefault(name, lambda: value)
+            self._load_locks.setdefault(name, threading.Lock())
+            self._resident[name] = (value, size_bytes)
+            self._resident.move_to_end(name)
+            self._enforce_budget(keep=name)
+
+    def evict(self, name: str) -> bool:
+        """Drops `name` from memory. Returns True if it was resident."""
+        with self._lock:
+            entry = self._resident.pop(name, None)
+        if entry is None:
+            return False
+        logger.info(f"Registry: Evicted model '{name}' ({entry[1] / (1024 * 1024):.1f} MB).")
+        return True
+
+    def clear(self):
+        with self._lock:
+            names = list(self._resident)
+        for name in names:
+            self.evict(name)
+
+    def resident(self) -> list[dict]:
+        """Lists resident models, least recently used first, with their estimated size."""
+        with self._lock:
+            return [
+                {"name": name, "size_mb": round(size_bytes / (1024 * 1024), 1)}
+                for name, (_, size_bytes) in self._resident.items()
+            ]
+
+    def total_size_mb(self) -> float:
+        with self._lock:
+            return round(sum(size for _, size in self._resident.values()) / (1024 * 1024), 1)
+
+    def _over_budget(self) -> bool:
+        if self.max_models and len(self._resident) > self.max_models:
+            return True
+        if self.max_memory_bytes:
+            total = sum(size for _, size in self._resident.values())
+            if total > self.max_memory_bytes:
+                return True
+        return False
+
+    def _enforce_budget(self, keep: str):
+        # Called with self._lock held. Never evicts the model that was just requested.
+        while self._over_budget():
+            victim = next((name for name in self._resident if name != keep), None)
+            if victim is None:
+                break
+            _, size_bytes = self._resident.pop(victim)
+            logger.info(f"Registry: Budget exceeded, evicted '{victim}' ({size_bytes / (1024 * 1024):.1f} MB).")
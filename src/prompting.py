@@ -0,0 +1,181 @@
+# src/prompting.py
+"""
+Token-budgeted assembly of the RAG and few-shot prompts.
+
+The seq2seq models truncate their input at PROMPT_TOKEN_BUDGET tokens, and the text to
+translate comes last, so too many examples used to cut the source itself. Examples are
+now selected before the prompt is built:
+- near-duplicates (same normalized French side, or almost the same words) are dropped;
+- RAG examples below PROMPT_MIN_SIMILARITY are dropped;
+- the remaining ones are added best first while they fit in the budget, after room has
+  been reserved for the header and the source text.
+Example token counts come from the model's tokenizer and are cached per example.
+"""
+import math
+import re
+import threading
+from collections import OrderedDict
+
+from .segmentation import normalize_text
+
+RAG_HEADER = "Traduire en breton en utilisant ces exemples :\n\n"
+RAG_HEADER_NO_EXAMPLE = "Traduire en breton (aucun exemple similaire trouvé):\n\n"
+RAG_FOOTER = "Texte à traduire en breton:\n"
+FEW_SHOT_HEADER = "Voici quelques paires français-breton aléatoires de la base de données:\n\n"
+FEW_SHOT_FOOTER = "Traduire le texte suivant en breton:\n"
+
+# Special tokens added by the tokenizer around the prompt (language code, </s>).
+_SPECIAL_TOKENS_MARGIN = 2
+_WORD = re.compile(r"\w+")
+
+
+def format_example(example: dict) -> str:
+    return f"Français : {example['french']}\nBreton : {example['breton']}\n\n"
+
+
+def format_rag_prompt(text: str, examples: list[dict]) -> str:
+    header = RAG_HEADER if examples else RAG_HEADER_NO_EXAMPLE
+    return header + "".join(format_example(example) for example in examples) + RAG_FOOTER + text
+
+
+def format_few_shot_prompt(text: str, examples: list[dict]) -> str:
+    return FEW_SHOT_HEADER + "".join(format_example(example) for example in examples) + FEW_SHOT_FOOTER + text
+
+
+def approximate_token_count(text: str) -> int:
+    """Rough token count for models without a local tokenizer (llama through Ollama)."""
+    return math.ceil(len(text) / 3.5)
+
+
+class TokenCounter:
+    """Counts tokens with a model's tokenizer, caching the counts of example texts."""
+
+    def __init__(self, count_fn, cache_size: int = 20000):
+        self._count_fn = count_fn
+        self.cache_size = cache_size
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def for_tokenizer(cls, tokenizer, cache_size: int = 20000):
+        return cls(lambda text: len(tokenizer(text, add_special_tokens=False)["input_ids"]), cache_size)
+
+    def count(self, text: str) -> int:
+        """Token count of a text that will be seen again (examples): cached."""
+        with self._lock:
+            if text in self._cache:
+                self._cache.move_to_end(text)
+                return self._cache[text]
+        tokens = self._count_fn(text)
+        with self._lock:
+            self._cache[text] = tokens
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return tokens
+
+    def count_uncached(self, text: str) -> int:
+        return self._count_fn(text)
+
+
+def _word_set(text: str) -> frozenset:
+    return frozenset(_WORD.findall(normalize_text(text, casefold=True)))
+
+
+def _near_duplicate(words: frozenset, kept: list[frozenset], threshold: float) -> bool:
+    for other in kept:
+        union = len(words | other)
+        if union and len(words & other) / union >= threshold:
+            return True
+    return False
+
+
+def select_examples(examples: list[dict], fixed_tokens: int, counter: TokenCounter = None, token_budget: int = 0,
+                    min_similarity: float = 0.0, dedup_threshold: float = 1.0) -> tuple[list[dict], dict]:
+    """
+    Picks the examples to put in a prompt, in the given order (best first).
+    `fixed_tokens` is the cost of everything else (header, footer, source text).
+    A token_budget of 0 (or no counter) disables the budget; min_similarity only applies
+    to examples carrying a 'distance' (cosine similarity of a RAG hit).
+    Returns (selected examples, stats).
+    """
+    stats = {"examples_retrieved": len(examples), "dropped_duplicate": 0, "dropped_low_similarity": 0,
+             "dropped_budget": 0}
+    selected, kept_words, seen = [], [], set()
+    used_tokens = fixed_tokens + _SPECIAL_TOKENS_MARGIN
+    for example in examples:
+        if "distance" in example and example["distance"] < min_similarity:
+            stats["dropped_low_similarity"] += 1
+            continue
+        words = _word_set(example["french"])
+        key = " ".join(sorted(words))
+        if key in seen or (dedup_threshold < 1.0 and _near_duplicate(words, kept_words, dedup_threshold)):
+            stats["dropped_duplicate"] += 1
+            continue
+        if counter is not None and token_budget:
+            cost = counter.count(format_example(example))
+            if used_tokens + cost > token_budget:
+                stats["dropped_budget"] += 1
+                continue  # A shorter example further down may still fit.
+            used_tokens += cost
+        seen.add(key)
+        kept_words.append(words)
+        selected.append(example)
+    stats["examples_used"] = len(selected)
+    return selected, stats
+
+
+def build_rag_prompt(text: str, examples: list[dict], counter: TokenCounter = None, token_budget: int = 0,
+                     min_similarity: float = 0.0, dedup_threshold: float = 1.0) -> tuple[str, dict]:
+    """RAG prompt within the token budget. Returns (prompt, info)."""
+    fixed = counter.count_uncached(RAG_HEADER + RAG_FOOTER + text) if counter is not None and token_budget else 0
+    selected, info = select_examples(examples, fixed, counter, token_budget, min_similarity, dedup_threshold)
+    prompt = format_rag_prompt(text, selected)
+    return prompt, _finish_info(info, prompt, counter, token_budget)
+
+
+def build_few_shot_prompt(text: str, examples: list[dict], counter: TokenCounter = None, token_budget: int = 0,
+                          dedup_threshold: float = 1.0) -> tuple[str, dict]:
+    """Few-shot prompt within the token budget. Returns (prompt, info)."""
+    fixed = counter.count_uncached(FEW_SHOT_HEADER + FEW_SHOT_FOOTER + text) if counter is not None and token_budget else 0
+    selected, info = select_examples(examples, fixed, counter, token_budget, dedup_threshold=dedup_threshold)
+    prompt = format_few_shot_prompt(text, selected)
+    return prompt, _finish_info(info, prompt, counter, token_budget)
+
+
+def _finish_info(info: dict, prompt: str, counter: TokenCounter, token_budget: int) -> dict:
+    if counter is not None:
+        info["prompt_tokens"] = counter.count_uncached(prompt) + _SPECIAL_TOKENS_MARGIN
+    info["token_budget"] = token_budget
+    return info
+
+
+def describe(info: dict) -> str:
+    """One-line summary shown under the prompt in the UI."""
+    route = (info or {}).get("route")
+    if route is not None:
+        served = f"Chemin auto : {route['model']} / {route['mode']} ({route['seconds']:.2f} s sur {route['budget_seconds']:g} s)"
+        if route["fallback"]:
+            reason = "délai dépassé" if route["reason"] == "deadline" else "échec"
+            served += f", repli après {route['planned']} ({reason})"
+        details = describe({key: value for key, value in info.items() if key != "route"})
+        return f"{served} — {details}" if details else served
+    match = (info or {}).get("translation_memory")
+    if match is not None:
+        if match["kind"] == "exact":
+            return "Mémoire de traduction : correspondance exacte — génération évitée"
+        return f"Mémoire de traduction : similarité {match['similarity']:.3f} — génération évitée"
+    if not info or "examples_used" not in info:
+        return ""
+    parts = [f"{info['examples_used']}/{info['examples_retrieved']} exemples utilisés"]
+    if "prompt_tokens" in info:
+        budget = f"/{info['token_budget']}" if info.get("token_budget") else ""
+        parts.append(f"{info['prompt_tokens']}{budget} tokens")
+    dropped = [
+        f"{info[key]} {label}"
+        for key, label in (("dropped_duplicate", "doublons"), ("dropped_low_similarity", "peu similaires"),
+                           ("dropped_budget", "hors budget"))
+        if info.get(key)
+    ]
+    if dropped:
+        parts.append("écartés : " + ", ".join(dropped))
+    return " — ".join(parts)
@@ -0,0 +1,213 @@
+# src/quantization.py
+"""
+Per-model precision / backend for CPU inference of the seq2seq models.
+
+Supported values (MODEL_PRECISION_* in config.py):
+- "fp32": original weights (reference)
+- "bf16": weights cast to bfloat16 (halves memory; fast on CPUs with AVX512-BF16/AMX)
+- "int8": dynamic int8 quantization of the nn.Linear layers (torch.ao.quantization.quantize_dynamic)
+- "onnx": exported graph run by ONNX Runtime through `optimum` (optional dependency)
+
+Measure the speed / memory / quality delta of each option against fp32 with:
+    python -m src.quantization compare --model nllb --sentences sentences.txt
+"""
+import argparse
+import contextlib
+import logging
+import os
+import shutil
+import statistics
+import sys
+import time
+from collections import Counter
+
+import torch
+
+logger = logging.getLogger(__name__)
+
+PRECISIONS = ("fp32", "bf16", "int8", "onnx")
+
+
+def load_seq2seq_model(full_model_name: str, cache_dir: str, revision: str = "main", precision: str = "fp32"):
+    """Loads a seq2seq model and applies the requested precision / backend."""
+    from transformers import AutoModelForSeq2SeqLM
+
+    if precision not in PRECISIONS:
+        logger.warning(f"Unknown precision '{precision}' for {full_model_name}, using fp32.")
+        precision = "fp32"
+
+    if precision == "onnx":
+        try:
+            from optimum.onnxruntime import ORTModelForSeq2SeqLM
+        except ImportError:
+            logger.warning(f"'optimum[onnxruntime]' is not installed, loading {full_model_name} in fp32 instead.")
+        else:
+            return _load_onnx_model(ORTModelForSeq2SeqLM, full_model_name, cache_dir, revision)
+        precision = "fp32"
+
+    # low_cpu_mem_usage skips the random initialisation of the weights: safetensors checkpoints
+    # are memory-mapped from the HF cache and copied straight into the model (bf16 directly).
+    model = AutoModelForSeq2SeqLM.from_pretrained(
+        full_model_name, cache_dir=cache_dir, revision=revision, low_cpu_mem_usage=True,
+        torch_dtype=torch.bfloat16 if precision == "bf16" else None,
+    )
+    model.eval()
+    return apply_precision(model, precision)
+
+
+def onnx_export_dir(full_model_name: str, cache_dir: str, revision: str = "main") -> str:
+    """Where the ONNX export of a model revision is saved (delete it to export again)."""
+    return os.path.join(cache_dir, "onnx", full_model_name.replace("/", "--"), revision)
+
+
+def _load_onnx_model(ort_class, full_model_name: str, cache_dir: str, revision: str):
+    """
+    Exports the model to ONNX on its first load only, then loads the saved graph: process
+    starts and reloads after an LRU eviction do not export it again.
+    """
+    export_dir = onnx_export_dir(full_model_name, cache_dir, revision)
+    if not os.path.isdir(export_dir):
+        logger.info(f"Exporting {full_model_name} to ONNX in {export_dir} (first load only)...")
+        model = ort_class.from_pretrained(full_model_name, cache_dir=cache_dir, revision=revision, export=True)
+        tmp_dir = f"{export_dir}.tmp-{os.getpid()}"
+        model.save_pretrained(tmp_dir)
+        del model
+        try:
+            os.rename(tmp_dir, export_dir)  # Atomic: readers never see a partial export.
+        except OSError:
+            shutil.rmtree(tmp_dir, ignore_errors=True)  # Another process saved it first.
+    return ort_class.from_pretrained(export_dir)
+
+
+def apply_precision(model, precision: str):
+    """Converts an eager torch model to bf16 or dynamic int8 (fp32 is returned unchanged)."""
+    if precision == "bf16":
+        return model.to(torch.bfloat16)
+    if precision == "int8":
+        return torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+    return model
+
+
+def inference_context(model):
+    """torch.inference_mode() for eager models; ONNX Runtime models do not need it."""
+    if isinstance(model, torch.nn.Module):
+        return torch.inference_mode()
+    return contextlib.nullcontext()
+
+
+def generate(model, **kwargs):
+    """model.generate() under inference mode (thread-local, so it must wrap the call itself)."""
+    with inference_context(model):
+        return model.generate(**kwargs)
+
+
+# --- Measurement ---
+
+def chrf(hypothesis: str, reference: str, max_n: int = 6, beta: float = 2.0) -> float:
+    """Character n-gram F-score (chrF, 0-100) of a hypothesis against a reference."""
+    hypothesis, reference = hypothesis.replace(" ", ""), reference.replace(" ", "")
+    scores = []
+    for n in range(1, max_n + 1):
+        hyp = Counter(hypothesis[i:i + n] for i in range(len(hypothesis) - n + 1))
+        ref = Counter(reference[i:i + n] for i in range(len(reference) - n + 1))
+        if not hyp or not ref:
+            continue
+        overlap = sum((hyp & ref).values())
+        precision, recall = overlap / sum(hyp.values()), overlap / sum(ref.values())
+        if precision + recall == 0:
+            scores.append(0.0)
+        else:
+            scores.append((1 + beta ** 2) * precision * recall / (beta ** 2 * precision + recall))
+    return 100 * statistics.mean(scores) if scores else 0.0
+
+
+def _model_size_mb(model) -> float:
+    from .model_registry import estimate_size_bytes
+
+    return estimate_size_bytes(model) / (1024 * 1024)
+
+
+def compare_precisions(model_name: str, sentences: list[str], precisions=PRECISIONS, repeats: int = 1,
+                       profile: str = None) -> list[dict]:
+    """
+    Translates `sentences` with each precision of one model and reports, relative to fp32:
+    mean latency per sentence, model size, and output agreement (exact match rate and chrF).
+    Each sentence is decoded like in serving: its own max_new_tokens budget and the
+    decoding profile (GENERATION_PROFILE by default, see src/generation.py).
+    """
+    from transformers import AutoTokenizer
+    from . import config
+    from .generation import check_profile, hf_generation_args, max_new_tokens
+    from .translator import SEQ2SEQ_MODELS, MODEL_REVISIONS
+
+    full_model_name, target_lang_code = SEQ2SEQ_MODELS[model_name]
+    revision = MODEL_REVISIONS[model_name]
+    profile = check_profile(profile or config.GENERATION_PROFILE)
+    tokenizer = AutoTokenizer.from_pretrained(full_model_name, cache_dir=config.TRANSFORMERS_CACHE_PATH, revision=revision)
+    forced_args = {}
+    if model_name == "nllb" and target_lang_code:
+        forced_args["forced_bos_token_id"] = tokenizer.convert_tokens_to_ids(target_lang_code)
+    generation_args = []
+    for sentence in sentences:
+        source_tokens = len(tokenizer(sentence, add_special_tokens=False)["input_ids"])
+        budget = max_new_tokens(
+            source_tokens, config.GENERATION_LENGTH_RATIOS.get(model_name, 1.5), margin=config.GENERATION_LENGTH_MARGIN,
+            minimum=config.GENERATION_MIN_NEW_TOKENS, maximum=config.GENERATION_MAX_NEW_TOKENS,
+        )
+        generation_args.append({**hf_generation_args(profile, budget, config.GENERATION_QUALITY_BEAMS), **forced_args})
+
+    rows, reference = [], None
+    for precision in ("fp32",) + tuple(p for p in precisions if p != "fp32"):
+        model = load_seq2seq_model(full_model_name, config.TRANSFORMERS_CACHE_PATH, revision, precision)
+        outputs, timings = [], []
+        for sentence, sentence_args in zip(sentences, generation_args):
+            inputs = tokenizer(sentence, return_tensors="pt", truncation=True, max_length=512)
+            for _ in range(repeats):
+                start = time.perf_counter()
+                generated_ids = generate(model, **inputs, **sentence_args)
+                timings.append(time.perf_counter() - start)
+            outputs.append(tokenizer.decode(generated_ids[0], skip_special_tokens=True))
+        if reference is None:
+            reference = outputs
+        rows.append({
+            "model": model_name,
+            "precision": precision,
+            "profile": profile,
+            "mean_latency_ms": round(1000 * statistics.mean(timings), 1),
+            "size_mb": round(_model_size_mb(model), 1),
+            "exact_match_vs_fp32": round(sum(o == r for o, r in zip(outputs, reference)) / len(outputs), 3),
+            "chrf_vs_fp32": round(statistics.mean(chrf(o, r) for o, r in zip(outputs, reference)), 1),
+        })
+        del model
+    base = rows[0]
+    for row in rows:
+        row["speedup_vs_fp32"] = round(base["mean_latency_ms"] / row["mean_latency_ms"], 2) if row["mean_latency_ms"] else None
+        row["size_ratio_vs_fp32"] = round(row["size_mb"] / base["size_mb"], 2) if base["size_mb"] else None
+    return rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare CPU precision options of a seq2seq model.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    compare = subparsers.add_parser("compare")
+    compare.add_argument("--model", default="nllb", choices=["nllb", "helsinki", "nllb finetuned"])
+    compare.add_argument("--sentences", required=True, help="Text file with one French sentence per line.")
+    compare.add_argument("--precisions", nargs="+", default=list(PRECISIONS), choices=PRECISIONS)
+    compare.add_argument("--repeats", type=int, default=1)
+    compare.add_argument("--profile", default=None, choices=["fast", "quality"],
+                         help="Decoding profile (GENERATION_PROFILE by default).")
+    args = parser.parse_args(argv)
+
+    with open(args.sentences, encoding="utf-8") as f:
+        sentences = [line.strip() for line in f if line.strip()]
+    rows = compare_precisions(args.model, sentences, args.precisions, args.repeats, args.profile)
+    columns = list(rows[0])
+    print("| " + " | ".join(columns) + " |")
+    print("|" + "---|" * len(columns))
+    for row in rows:
+        print("| " + " | ".join(str(row[c]) for c in columns) + " |")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
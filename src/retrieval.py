@@ -0,0 +1,201 @@
+# src/retrieval.py
+"""
+Resilient access to the RAG collection (Zilliz, or anything with the same `search()`,
+such as the local index and the benchmark fakes).
+
+- Deadline: every search is bounded by `timeout` seconds (also passed to the backend
+  call), so a degraded endpoint delays a request by at most that much.
+- Hedging: if the first search has not answered after `hedge_after` seconds, an
+  identical one is sent and the first answer wins, which cuts tail latency.
+- Circuit breaker: after `failure_threshold` consecutive failures (errors or timeouts)
+  searches fail immediately with CircuitOpenError for `reset_timeout` seconds, then a
+  single probe decides whether to close it again. Callers fall back to the no-RAG prompt.
+- Reconnection: with no collection, or when errors open the circuit, `connect()` is retried on a
+  background thread every `reconnect_interval` seconds until it returns a collection.
+"""
+import functools
+import logging
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+logger = logging.getLogger(__name__)
+
+
+class CircuitOpenError(RuntimeError):
+    """Raised without calling the backend while the circuit breaker is open."""
+
+
+class CircuitBreaker:
+    CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            return self._state
+
+    def allow(self) -> bool:
+        """Whether a call may go through. Once open, one probe is let through per reset_timeout."""
+        with self._lock:
+            if self._state == self.CLOSED:
+                return True
+            if self._state == self.OPEN and time.monotonic() - self._opened_at >= self.reset_timeout:
+                self._state = self.HALF_OPEN
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self._state = self.CLOSED
+            self._failures = 0
+
+    def record_failure(self) -> bool:
+        """Returns True if this failure opened the circuit."""
+        with self._lock:
+            self._failures += 1
+            if self._state == self.HALF_OPEN or (self._state == self.CLOSED and self._failures >= self.failure_threshold):
+                self._state = self.OPEN
+                self._opened_at = time.monotonic()
+                return True
+            return False
+
+    def reset(self):
+        self.record_success()
+
+
+class RetrievalClient:
+    """Deadline-bounded, hedged and circuit-broken searches on a collection (see module docstring)."""
+
+    def __init__(self, connect, collection=None, timeout: float = 1.0, hedge_after: float = 0.0,
+                 search_params: dict = None, breaker: CircuitBreaker = None, reconnect_interval: float = 15.0,
+                 on_connect=None, max_workers: int = 8):
+        self._connect = connect
+        self.collection = collection
+        self.timeout = timeout
+        self.hedge_after = hedge_after
+        self.search_params = search_params or {"metric_type": "COSINE", "params": {}}
+        self.breaker = breaker or CircuitBreaker()
+        self.reconnect_interval = reconnect_interval
+        self._on_connect = on_connect
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="rag-search")
+        self._reconnect_thread = None
+        self._reconnect_lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._stats_lock = threading.Lock()
+        self._stats = {"searches": 0, "timeouts": 0, "errors": 0, "rejected": 0, "hedges": 0, "hedge_wins": 0,
+                       "reconnects": 0}
+
+    def search(self, data: list, limit: int, output_fields: list[str] = None, hedge: bool = True,
+               timeout: float = None):
+        """
+        collection.search() with the configured params, bounded by `timeout` (default self.timeout).
+        Raises CircuitOpenError (fail fast), TimeoutError or the backend's error.
+        """
+        collection = self.collection
+        if collection is None:
+            self.start_reconnect()
+            self._count("rejected")
+            raise CircuitOpenError("No RAG collection: reconnecting in the background.")
+        if not self.breaker.allow():
+            self._count("rejected")
+            raise CircuitOpenError("RAG search circuit is open after repeated failures.")
+        timeout = timeout or self.timeout
+        self._count("searches")
+        call = functools.partial(
+            collection.search, data=data, anns_field="embedding", param=self.search_params, limit=limit,
+            output_fields=output_fields, timeout=timeout,
+        )
+        try:
+            result = self._first_result(call, timeout, hedge and bool(self.hedge_after))
+        except Exception as e:
+            self._record_failure(e)
+            raise
+        self.breaker.record_success()
+        return result
+
+    def _first_result(self, call, timeout: float, hedge: bool):
+        deadline = time.monotonic() + timeout
+        first = self._executor.submit(call)
+        futures = [first]
+        if hedge:
+            done, _ = wait(futures, timeout=max(0.0, min(self.hedge_after, deadline - time.monotonic())))
+            if not done and time.monotonic() < deadline:
+                self._count("hedges")
+                futures.append(self._executor.submit(call))
+        pending, error = set(futures), None
+        while pending:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            done, pending = wait(pending, timeout=remaining, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    if future is not first:
+                        self._count("hedge_wins")
+                    for other in pending:
+                        other.cancel()
+                    return future.result()
+                error = future.exception()
+        for future in pending:
+            future.cancel()
+        if error is not None and not pending:
+            raise error
+        raise TimeoutError(f"RAG search took more than {timeout:g}s.")
+
+    def _record_failure(self, error: Exception):
+        timed_out = isinstance(error, TimeoutError)
+        self._count("timeouts" if timed_out else "errors")
+        if self.breaker.record_failure():
+            logger.warning(f"RAG search circuit opened ({type(error).__name__}: {error}); "
+                           f"RAG requests use the no-example prompt for {self.breaker.reset_timeout:g}s.")
+            if not timed_out:
+                # Repeated errors (unlike slowness) often mean a broken connection: open a fresh one.
+                # The half-open probe, not the reconnection, closes the circuit again.
+                self.start_reconnect()
+
+    def start_reconnect(self):
+        """Starts the background reconnection loop unless it is already running."""
+        with self._reconnect_lock:
+            if self._stopped.is_set() or (self._reconnect_thread is not None and self._reconnect_thread.is_alive()):
+                return
+            self._reconnect_thread = threading.Thread(target=self._reconnect_loop, name="rag-reconnect", daemon=True)
+            self._reconnect_thread.start()
+
+    def _reconnect_loop(self):
+        while not self._stopped.is_set():
+            try:
+                collection = self._connect()
+            except Exception as e:
+                logger.warning(f"RAG reconnection failed: {e}")
+                collection = None
+            if collection is not None:
+                self.collection = collection
+                self._count("reconnects")
+                logger.info("RAG collection (re)connected.")
+                if self._on_connect is not None:
+                    self._on_connect(collection)
+                return
+            self._stopped.wait(self.reconnect_interval)
+
+    def stop(self):
+        self._stopped.set()
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def stats(self) -> dict:
+        with self._stats_lock:
+            stats = dict(self._stats)
+        stats["circuit"] = self.breaker.state
+        stats["connected"] = self.collection is not None
+        return stats
+
+    def _count(self, key: str):
+        with self._stats_lock:
+            self._stats[key] += 1
@@ -0,0 +1,169 @@
+# src/routing.py
+"""
+Latency-budgeted routing for the "auto" model.
+
+Each path (model, assistance mode) keeps an exponentially weighted moving average of its
+latency, fed by every successful translation. An "auto" request takes the first path of
+the cascade (best quality first) whose average fits in the latency budget, after time has
+been set aside for the fallback path (by default nllb finetuned without examples). If the
+chosen path has not answered when only that reserved time is left, it is cancelled and
+the fallback serves the request.
+
+Paths with no recent sample (never used, or last seen more than `explore_after` seconds
+ago) are assumed to fit, so a path that was slow or failing once is probed again later.
+"""
+import contextvars
+import threading
+import time
+from contextlib import contextmanager
+
+MODES = ("default", "few-shot", "rag")
+
+_CANCELLATION = contextvars.ContextVar("translation_cancellation", default=None)
+
+
+def parse_routes(spec: str) -> list[tuple[str, str]]:
+    """'llama:rag,nllb finetuned:default' -> [('llama', 'rag'), ('nllb finetuned', 'default')]."""
+    routes = []
+    for item in spec.split(","):
+        if not item.strip():
+            continue
+        model_name, _, mode = item.strip().rpartition(":")
+        if not model_name or mode not in MODES:
+            raise ValueError(f"Invalid route '{item.strip()}': expected '<model>:<{'|'.join(MODES)}>'.")
+        routes.append((model_name.strip(), mode))
+    return routes
+
+
+def route_params(mode: str, k: int) -> tuple[int, int]:
+    """Maps a route mode and k to translate()'s (use_rag, use_prompt) arguments."""
+    if mode == "rag":
+        return k, 0
+    if mode == "few-shot":
+        return 0, k
+    return 0, 0
+
+
+class LatencyTracker:
+    """Exponentially weighted moving average of the latency of each path."""
+
+    def __init__(self, alpha: float = 0.2):
+        self.alpha = alpha
+        self._stats = {}  # path -> [ewma seconds, samples, last sample (monotonic)]
+        self._lock = threading.Lock()
+
+    def observe(self, path: tuple, seconds: float, lower_bound: bool = False):
+        """
+        Adds a latency sample. A `lower_bound` sample (a request cut at its deadline, or
+        failed) only says the path takes at least that long: the average is raised to it.
+        """
+        now = time.monotonic()
+        with self._lock:
+            stats = self._stats.get(path)
+            if stats is None:
+                self._stats[path] = [seconds, 1, now]
+                return
+            stats[0] += self.alpha * (seconds - stats[0])
+            if lower_bound:
+                stats[0] = max(stats[0], seconds)
+            stats[1] += 1
+            stats[2] = now
+
+    def estimate(self, path: tuple, max_age: float = 0):
+        """Average latency of a path in seconds, or None if unknown (or older than max_age seconds)."""
+        with self._lock:
+            stats = self._stats.get(path)
+            if stats is None or (max_age and time.monotonic() - stats[2] > max_age):
+                return None
+            return stats[0]
+
+    def snapshot(self) -> dict:
+        now = time.monotonic()
+        with self._lock:
+            return {
+                f"{model_name}:{mode}": {"ewma_seconds": round(ewma, 4), "samples": samples, "age_seconds": round(now - last, 1)}
+                for (model_name, mode), (ewma, samples, last) in self._stats.items()
+            }
+
+
+class Cancellation:
+    """
+    Cancels the work of one request: queued futures are cancelled and the generation
+    loops that poll `cancelled` (stopping criteria, Ollama streams) stop early.
+    """
+
+    def __init__(self):
+        self._event = threading.Event()
+        self._futures = []
+        self._lock = threading.Lock()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._event.is_set()
+
+    def cancel(self):
+        with self._lock:
+            self._event.set()
+            futures, self._futures = self._futures, []
+        for future in futures:
+            future.cancel()
+
+    def watch(self, future):
+        """Registers a future to cancel along with the request. Returns the future."""
+        with self._lock:
+            if not self._event.is_set():
+                self._futures.append(future)
+                return future
+        future.cancel()
+        return future
+
+
+def current_cancellation():
+    """Cancellation of the request running in this context, or None."""
+    return _CANCELLATION.get()
+
+
+@contextmanager
+def cancellation_scope(cancellation: Cancellation):
+    token = _CANCELLATION.set(cancellation)
+    try:
+        yield cancellation
+    finally:
+        _CANCELLATION.reset(token)
+
+
+class AutoRouter:
+    """Picks the path of an "auto" request from the live latency averages."""
+
+    def __init__(self, cascade: list[tuple[str, str]], fallback: tuple[str, str], tracker: LatencyTracker = None,
+                 explore_after: float = 60.0, fallback_margin: float = 1.5, default_reserve: float = 0.5):
+        self.cascade = list(cascade)
+        self.fallback = fallback
+        self.tracker = tracker or LatencyTracker()
+        self.explore_after = explore_after
+        # Time reserved for the fallback: its average times this margin (it can queue too).
+        # (default_reserve until the fallback has been measured).
+        self.fallback_margin = fallback_margin
+        self.default_reserve = default_reserve
+
+    def fallback_reserve(self) -> float:
+        estimate = self.tracker.estimate(self.fallback)
+        return self.default_reserve if estimate is None else estimate * self.fallback_margin
+
+    def choose(self, budget: float, available=lambda model_name: True) -> tuple[tuple[str, str], float]:
+        """
+        Returns (path, seconds the path may run before the fallback takes over).
+        The fallback itself is returned, with the whole budget, when nothing else fits.
+        """
+        primary_budget = budget - self.fallback_reserve()
+        if primary_budget <= 0:
+            return self.fallback, budget
+        for path in self.cascade:
+            if path == self.fallback:
+                break
+            if not available(path[0]):
+                continue
+            estimate = self.tracker.estimate(path, max_age=self.explore_after)
+            if estimate is None or estimate < primary_budget:
+                return path, primary_budget
+        return self.fallback, budget
@@ -0,0 +1,103 @@
+# src/segmentation.py
+import re
+import unicodedata
+
+# Abbreviations whose trailing period does not end a sentence.
+FRENCH_ABBREVIATIONS = {
+    "m", "mm", "mme", "mmes", "mlle", "mlles", "dr", "pr", "me", "st", "ste",
+    "etc", "cf", "ex", "p", "pp", "av", "bd", "no", "n°", "vol", "chap", "env", "min", "max",
+}
+
+# End of sentence: . ! ? … (optionally followed by closing quotes/brackets, with the space
+# French typography puts before »), then whitespace.
+_SENTENCE_END = re.compile(r'([.!?…]+(?:[ \u00a0\u202f]?»|[")\]])*)(\s+)')
+# Clause boundaries used to cut sentences that are still too long.
+_CLAUSE_END = re.compile(r'([;:,])(\s+)')
+
+
+def _is_abbreviation(text_before: str) -> bool:
+    words = text_before.split()
+    if not words:
+        return False
+    last = words[-1].rstrip(".").lower()
+    # Single letters are initials ("J. Dupont").
+    return last in FRENCH_ABBREVIATIONS or (len(last) == 1 and last.isalpha())
+
+
+def _split_on(pattern, text: str, skip_abbreviations: bool) -> list[tuple[str, str]]:
+    pieces = []
+    start = 0
+    for match in pattern.finditer(text):
+        end_of_piece = match.end(1)
+        if skip_abbreviations and match.group(1) == "." and _is_abbreviation(text[start:match.start(1)]):
+            continue
+        pieces.append((text[start:end_of_piece], match.group(2)))
+        start = match.end(2)
+    if start < len(text):
+        pieces.append((text[start:], ""))
+    return pieces
+
+
+def _split_long(sentence: str, separator: str, max_chars: int) -> list[tuple[str, str]]:
+    """Cuts a sentence longer than max_chars at clause boundaries, merging clauses back up to max_chars."""
+    if len(sentence) <= max_chars:
+        return [(sentence, separator)]
+    clauses = _split_on(_CLAUSE_END, sentence, skip_abbreviations=False)
+    chunks = []
+    current, current_sep = "", ""
+    for clause, clause_sep in clauses:
+        if current and len(current) + len(current_sep) + len(clause) > max_chars:
+            chunks.append((current, current_sep))
+            current, current_sep = clause, clause_sep
+        else:
+            current = f"{current}{current_sep}{clause}" if current else clause
+            current_sep = clause_sep
+    if current:
+        chunks.append((current, current_sep))
+    # The last chunk keeps the separator that followed the whole sentence.
+    last_chunk, _ = chunks[-1]
+    chunks[-1] = (last_chunk, separator)
+    return chunks
+
+
+def split_sentences(text: str, max_chars: int = 0) -> list[tuple[str, str]]:
+    """
+    Splits French text into sentences, keeping the whitespace that followed each one
+    so the translated chunks can be reassembled with the same layout (line breaks included).
+    Sentences longer than max_chars (if > 0) are further cut at clause boundaries.
+
+    Returns a list of (chunk, separator) tuples; "".join(c + s) gives back the input
+    without its leading whitespace.
+    """
+    text = text.lstrip()
+    if not text:
+        return []
+    chunks = []
+    for paragraph_piece in re.split(r'(\n\s*)', text):
+        if not paragraph_piece:
+            continue
+        if not paragraph_piece.strip():
+            # Line break between paragraphs: attach it to the previous chunk.
+            if chunks:
+                last_chunk, last_sep = chunks[-1]
+                chunks[-1] = (last_chunk, last_sep + paragraph_piece)
+            continue
+        for sentence, separator in _split_on(_SENTENCE_END, paragraph_piece, skip_abbreviations=True):
+            if not sentence.strip():
+                continue
+            if max_chars > 0:
+                chunks.extend(_split_long(sentence, separator, max_chars))
+            else:
+                chunks.append((sentence, separator))
+    return chunks
+
+
+def normalize_text(text: str, casefold: bool = False) -> str:
+    """
+    Normalizes text for use as a lookup key: Unicode NFC, typographic apostrophes
+    unified and whitespace collapsed. casefold=True also ignores case.
+    """
+    text = unicodedata.normalize("NFC", text or "")
+    text = text.replace("\u2019", "'").replace("\u00a0", " ")
+    text = " ".join(text.split())
+    return text.casefold() if casefold else text
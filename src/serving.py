@@ -0,0 +1,256 @@
+# src/serving.py
+"""
+Multi-process serving of the seq2seq models.
+
+The app process keeps the Gradio server, the cache, RAG retrieval and prompt building.
+Seq2seq generation (tokenization, generate(), decoding) runs in SERVING_WORKERS worker
+processes, each pinned to its own slice of cores with a matching torch thread count,
+so workers neither share the GIL nor fight over the same cores.
+
+Weights are loaded once in the app process and the workers are forked afterwards: the
+tensors are shared copy-on-write, so N workers do not cost N copies of NLLB (models
+that were not preloaded are loaded by each worker on first use). Forking requires
+Linux. Each request goes to the live worker with the fewest requests in flight.
+
+A forked child inherits every lock in the state it had at fork time, but only the thread
+that forked. WorkerPool.start() therefore runs first at startup, on the main thread,
+before the process starts any other thread (RAG initialization, micro-batcher, executors,
+Gradio), and loads the shared models with a single torch thread so that no OpenMP / MKL
+thread pool exists yet either. Each worker creates its own pool after the fork.
+"""
+import gc
+import itertools
+import logging
+import multiprocessing
+import os
+import queue
+import threading
+from concurrent.futures import Future
+
+from .model_registry import ModelNotReadyError, ModelRegistry
+
+logger = logging.getLogger(__name__)
+
+
+def core_slices(num_workers: int, cores: list[int] = None) -> list[list[int]]:
+    """Splits the usable cores into num_workers contiguous slices (wrapping if there are fewer cores than workers)."""
+    if cores is None:
+        cores = sorted(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else list(range(os.cpu_count() or 1))
+    if len(cores) < num_workers:
+        return [[cores[index % len(cores)]] for index in range(num_workers)]
+    # The first len(cores) % num_workers slices get one extra core.
+    per_worker, extra = divmod(len(cores), num_workers)
+    slices, start = [], 0
+    for index in range(num_workers):
+        end = start + per_worker + (1 if index < extra else 0)
+        slices.append(cores[start:end])
+        start = end
+    return slices
+
+
+def _worker_main(index: int, cores: list[int], threads: int, shared_models: dict, inbox, outbox):
+    import torch
+    from .translator import BretonTraducteur
+
+    if hasattr(os, "sched_setaffinity"):
+        os.sched_setaffinity(0, cores)
+    torch.set_num_threads(threads or len(cores))
+    try:
+        torch.set_num_interop_threads(1)
+    except RuntimeError:
+        pass  # Already initialised in the parent before the fork.
+
+    registry = ModelRegistry()
+    translator = BretonTraducteur(registry=registry, cache_enabled=False)
+    for name, value in shared_models.items():
+        registry.add(name, value)
+    logger.info(f"Serving: worker {index} ready (pid {os.getpid()}, cores {cores}, models {list(shared_models)}).")
+
+    def reply(request_id, future):
+        try:
+            outbox.put((request_id, True, future.result()))
+        except Exception as e:
+            outbox.put((request_id, False, f"{type(e).__name__}: {e}"))
+
+    while True:
+        message = inbox.get()
+        if message is None:
+            break
+        request_id, batch_key, item = message
+        if translator.batcher is not None:
+            # Requests queued on this worker are still grouped into padded batches.
+            translator.batcher.submit(batch_key, item).add_done_callback(
+                lambda future, request_id=request_id: reply(request_id, future)
+            )
+        else:
+            try:
+                outbox.put((request_id, True, translator._generate_seq2seq(batch_key, [item])[0]))
+            except Exception as e:
+                outbox.put((request_id, False, f"{type(e).__name__}: {e}"))
+    if translator.batcher is not None:
+        translator.batcher.stop()
+
+
+class WorkerPool:
+    """
+    Pool of worker processes exposing the MicroBatcher interface: submit(key, item) -> Future.
+    `registry` holds the model loaders (see translator.register_models). Start it before
+    any other thread (see the module docstring), then attach it with `translator.workers = pool`.
+    """
+
+    def __init__(self, registry: ModelRegistry, num_workers: int, model_names: list[str], threads_per_worker: int = 0):
+        self.registry = registry
+        self.num_workers = num_workers
+        self.model_names = list(model_names)
+        self.threads_per_worker = threads_per_worker
+        self._context = multiprocessing.get_context("fork")
+        self._outbox = self._context.Queue()
+        self._workers = []  # [(process, inbox)]
+        self._inflight = []  # per worker: {request_id: future}
+        self._lock = threading.Lock()
+        self._request_ids = itertools.count()
+        self._started = threading.Event()
+        self._stopped = False
+        self._collector = None
+        self.preload_failures = {}  # model name -> error: those models are loaded by each worker on first use
+
+    @property
+    def ready(self) -> bool:
+        return self._started.is_set()
+
+    def start(self):
+        """
+        Loads the shared models on this thread, then forks the workers. Blocking.
+        A model that fails to load is not shared: each worker loads it on first use.
+        """
+        import torch
+
+        others = [thread.name for thread in threading.enumerate() if thread is not threading.current_thread()]
+        if others:
+            logger.warning(f"Serving: forking while other threads run ({others}); start the pool before them.")
+        parent_threads = torch.get_num_threads()
+        torch.set_num_threads(1)
+        try:
+            for name in self.model_names:
+                try:
+                    self.registry.get(name)
+                except Exception as e:
+                    self.preload_failures[name] = str(e)
+                    logger.error(f"Serving: '{name}' could not be preloaded, each worker will load it on first use: {e}")
+            shared_models = {name: self.registry.get(name) for name in self.model_names if self.registry.is_loaded(name)}
+            # The workers never use tokenizer parallelism across the fork, and freezing the
+            # objects created so far keeps the children's GC from touching (and copying) their pages.
+            os.environ.setdefault("TOKENIZERS_PARALLELISM", "false")
+            gc.freeze()
+            for index, cores in enumerate(core_slices(self.num_workers)):
+                inbox = self._context.Queue()
+                process = self._context.Process(
+                    target=_worker_main,
+                    args=(index, cores, self.threads_per_worker, shared_models, inbox, self._outbox),
+                    name=f"translator-worker-{index}",
+                    daemon=True,
+                )
+                process.start()
+                self._workers.append((process, inbox))
+                self._inflight.append({})
+        finally:
+            torch.set_num_threads(parent_threads)
+        self._collector = threading.Thread(target=self._collect, name="worker-pool-collector", daemon=True)
+        self._collector.start()
+        self._started.set()
+        logger.info(f"Serving: {self.num_workers} worker processes started (shared models: {list(shared_models)}).")
+        return self
+
+    def submit(self, key, item) -> Future:
+        """
+        Sends a prompt to the least loaded live worker and returns a Future of its translation.
+        Never blocks (it is called from the event loop): raises ModelNotReadyError while the workers are starting.
+        """
+        if not self._started.is_set():
+            raise ModelNotReadyError("Translation workers are still starting, please retry shortly.")
+        future = Future()
+        with self._lock:
+            if self._stopped:
+                raise RuntimeError("WorkerPool is stopped.")
+            alive = [index for index, (process, _) in enumerate(self._workers) if process.is_alive()]
+            if not alive:
+                raise RuntimeError("No translation worker is alive.")
+            index = min(alive, key=lambda i: len(self._inflight[i]))
+            request_id = next(self._request_ids)
+            self._inflight[index][request_id] = future
+        self._workers[index][1].put((request_id, key, item))
+        return future
+
+    def pending(self) -> int:
+        with self._lock:
+            return sum(len(inflight) for inflight in self._inflight)
+
+    def status(self) -> list[dict]:
+        """Per worker: pid, liveness and number of requests in flight (see also preload_failures)."""
+        with self._lock:
+            return [
+                {"pid": process.pid, "alive": process.is_alive(), "inflight": len(self._inflight[index])}
+                for index, (process, _) in enumerate(self._workers)
+            ]
+
+    def stop(self):
+        with self._lock:
+            self._stopped = True
+        for process, inbox in self._workers:
+            inbox.put(None)
+        for process, _ in self._workers:
+            process.join(timeout=10)
+
+    def _collect(self):
+        while True:
+            try:
+                message = self._outbox.get(timeout=1.0)
+            except queue.Empty:
+                message = None
+            if message is not None:
+                self._resolve(*message)
+            # Checked on every iteration: under steady traffic the queue is never empty for long.
+            if self._dead_workers_have_requests():
+                self._drain()  # The last replies of a dead worker may still be queued.
+                self._fail_dead_workers()
+            if message is None and self._stopped:
+                return
+
+    def _resolve(self, request_id, ok, payload):
+        with self._lock:
+            future = None
+            for inflight in self._inflight:
+                future = inflight.pop(request_id, None)
+                if future is not None:
+                    break
+        if future is None or not future.set_running_or_notify_cancel():
+            return
+        if ok:
+            future.set_result(payload)
+        else:
+            future.set_exception(RuntimeError(payload))
+
+    def _drain(self):
+        while True:
+            try:
+                message = self._outbox.get_nowait()
+            except queue.Empty:
+                return
+            self._resolve(*message)
+
+    def _dead_workers_have_requests(self) -> bool:
+        with self._lock:
+            return any(self._inflight[index] and not process.is_alive()
+                       for index, (process, _) in enumerate(self._workers))
+
+    def _fail_dead_workers(self):
+        with self._lock:
+            failed = []
+            for index, (process, _) in enumerate(self._workers):
+                if not process.is_alive() and self._inflight[index]:
+                    logger.error(f"Serving: worker {index} (pid {process.pid}) died with exit code {process.exitcode}.")
+                    failed.extend(self._inflight[index].values())
+                    self._inflight[index].clear()
+        for future in failed:
+            if future.set_running_or_notify_cancel():
+                future.set_exception(RuntimeError("Translation worker died."))
@@ -0,0 +1,187 @@
+# src/translation_cache.py
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from .segmentation import normalize_text
+
+logger = logging.getLogger(__name__)
+
+
+class TranslationCache:
+    """
+    Two-tier cache for translation results.
+
+    - Tier 1: in-process LRU dict (max_memory_entries).
+    - Tier 2: SQLite file that survives restarts (max_disk_entries, pruned by last access).
+
+    Keys combine the normalized text, the model, its version, the assistance mode and k.
+    Entries older than ttl_seconds are ignored (0 disables the TTL). When a model version
+    in `model_versions` differs from the one stored with an entry, the entry is dropped at
+    startup, so bumping a model revision in config.py invalidates its cached translations.
+    """
+
+    _PRUNE_EVERY = 256  # Inserts between two size checks of the SQLite store.
+
+    def __init__(self, db_path: str, model_versions: dict, max_memory_entries: int = 2048,
+                 max_disk_entries: int = 200000, ttl_seconds: float = 0):
+        self.db_path = db_path
+        self.model_versions = dict(model_versions)
+        self.max_memory_entries = max_memory_entries
+        self.max_disk_entries = max_disk_entries
+        self.ttl_seconds = ttl_seconds
+        self._memory = OrderedDict()  # key -> (created_at, prompt, translation)
+        self._lock = threading.RLock()
+        self._inserts_since_prune = 0
+        self.hits_memory = 0
+        self.hits_disk = 0
+        self.misses = 0
+
+        self._db = None
+        if db_path:
+            try:
+                os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+                self._db = sqlite3.connect(db_path, check_same_thread=False)
+                self._db.execute("PRAGMA journal_mode=WAL")
+                self._db.execute(
+                    "CREATE TABLE IF NOT EXISTS translations ("
+                    " key TEXT PRIMARY KEY, model TEXT, model_version TEXT,"
+                    " prompt TEXT, translation TEXT, created_at REAL, last_access REAL)"
+                )
+                self._db.execute("CREATE INDEX IF NOT EXISTS idx_translations_access ON translations(last_access)")
+                self._db.commit()
+                self._drop_stale_versions()
+            except sqlite3.Error as e:
+                logger.warning(f"Translation cache: could not open SQLite store '{db_path}': {e}. Using memory only.")
+                self._db = None
+
+    def make_key(self, text: str, model_name: str, mode: str, k: int) -> str:
+        payload = json.dumps(
+            [normalize_text(text), model_name, self.model_versions.get(model_name, ""), mode, k],
+            ensure_ascii=False,
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, key: str):
+        """Returns (prompt, translation) or None."""
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                if self._expired(entry[0], now):
+                    del self._memory[key]
+                else:
+                    self._memory.move_to_end(key)
+                    self.hits_memory += 1
+                    return entry[1], entry[2]
+
+            if self._db is not None:
+                try:
+                    row = self._db.execute(
+                        "SELECT prompt, translation, created_at FROM translations WHERE key = ?", (key,)
+                    ).fetchone()
+                    if row is not None and not self._expired(row[2], now):
+                        self._db.execute("UPDATE translations SET last_access = ? WHERE key = ?", (now, key))
+                        self._db.commit()
+                        self._remember(key, (row[2], row[0], row[1]))
+                        self.hits_disk += 1
+                        return row[0], row[1]
+                except sqlite3.Error as e:
+                    logger.warning(f"Translation cache read failed: {e}")
+
+            self.misses += 1
+            return None
+
+    def set(self, key: str, model_name: str, prompt: str, translation: str):
+        now = time.time()
+        with self._lock:
+            self._remember(key, (now, prompt, translation))
+            if self._db is None:
+                return
+            try:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO translations VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (key, model_name, self.model_versions.get(model_name, ""), prompt, translation, now, now),
+                )
+                self._db.commit()
+                self._inserts_since_prune += 1
+                if self._inserts_since_prune >= self._PRUNE_EVERY:
+                    self._prune()
+            except sqlite3.Error as e:
+                logger.warning(f"Translation cache write failed: {e}")
+
+    def invalidate_model(self, model_name: str) -> int:
+        """Drops every cached translation produced by `model_name`. Returns the number of disk rows removed."""
+        with self._lock:
+            # Memory keys are hashes: the memory tier is cheap to rebuild, so it is simply cleared.
+            self._memory.clear()
+            if self._db is None:
+                return 0
+            cursor = self._db.execute("DELETE FROM translations WHERE model = ?", (model_name,))
+            self._db.commit()
+            return cursor.rowcount
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+            if self._db is not None:
+                self._db.execute("DELETE FROM translations")
+                self._db.commit()
+
+    def stats(self) -> dict:
+        with self._lock:
+            disk_entries = 0
+            if self._db is not None:
+                try:
+                    disk_entries = self._db.execute("SELECT COUNT(*) FROM translations").fetchone()[0]
+                except sqlite3.Error:
+                    pass
+            lookups = self.hits_memory + self.hits_disk + self.misses
+            return {
+                "hits_memory": self.hits_memory,
+                "hits_disk": self.hits_disk,
+                "misses": self.misses,
+                "hit_rate": round((self.hits_memory + self.hits_disk) / lookups, 3) if lookups else 0.0,
+                "memory_entries": len(self._memory),
+                "disk_entries": disk_entries,
+            }
+
+    def _expired(self, created_at: float, now: float) -> bool:
+        return bool(self.ttl_seconds) and now - created_at > self.ttl_seconds
+
+    def _remember(self, key, entry):
+        self._memory[key] = entry
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_memory_entries:
+            self._memory.popitem(last=False)
+
+    def _prune(self):
+        self._inserts_since_prune = 0
+        if self.ttl_seconds:
+            self._db.execute("DELETE FROM translations WHERE created_at < ?", (time.time() - self.ttl_seconds,))
+        if self.max_disk_entries:
+            count = self._db.execute("SELECT COUNT(*) FROM translations").fetchone()[0]
+            excess = count - self.max_disk_entries
+            if excess > 0:
+                self._db.execute(
+                    "DELETE FROM translations WHERE key IN "
+                    "(SELECT key FROM translations ORDER BY last_access ASC LIMIT ?)",
+                    (excess,),
+                )
+        self._db.commit()
+
+    def _drop_stale_versions(self):
+        removed = 0
+        for model_name, version in self.model_versions.items():
+            cursor = self._db.execute(
+                "DELETE FROM translations WHERE model = ? AND model_version != ?", (model_name, version)
+            )
+            removed += cursor.rowcount
+        self._db.commit()
+        if removed:
+            logger.info(f"Translation cache: dropped {removed} entries produced by outdated model versions.")
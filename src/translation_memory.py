@@ -0,0 +1,92 @@
+# src/translation_memory.py
+import hashlib
+import logging
+import re
+import threading
+
+from .segmentation import normalize_text
+
+logger = logging.getLogger(__name__)
+
+_NUMBER = re.compile(r"\d+(?:[.,]\d+)*")
+
+
+def _digest(text: str) -> bytes:
+    return hashlib.blake2b(normalize_text(text, casefold=True).encode("utf-8"), digest_size=8).digest()
+
+
+def _numbers(text: str) -> list[str]:
+    return _NUMBER.findall(text)
+
+
+class TranslationMemory:
+    """
+    French -> Breton translation memory built from the RAG corpus.
+
+    - Exact matches: a hash index of the normalized (NFC, case-folded, whitespace
+      collapsed) French side, loaded in the background from `row_source`.
+    - Near-exact matches: the best RAG hit of the request, if its cosine similarity is at
+      least `threshold` and it contains the same numbers as the source (dates, amounts
+      and article numbers are where near-identical administrative sentences differ).
+
+    lookup() returns {'kind': 'exact' | 'similar', 'french', 'breton', 'similarity'} or None.
+    """
+
+    def __init__(self, row_source, threshold: float = 0.97):
+        self._row_source = row_source
+        self.threshold = threshold
+        self._index = {}  # 8-byte digest of the normalized French -> Breton
+        self._ready = threading.Event()
+        self._thread = None
+        self.hits_exact = 0
+        self.hits_similar = 0
+
+    @property
+    def ready(self) -> bool:
+        return self._ready.is_set()
+
+    def start(self):
+        """Loads the hash index in the background. Returns immediately."""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="translation-memory", daemon=True)
+            self._thread.start()
+        return self
+
+    def load(self):
+        """Builds the hash index from the row source (blocking)."""
+        index = {}
+        for row in self._row_source():
+            french, breton = row.get("francais"), row.get("breton")
+            if french and breton:
+                index.setdefault(_digest(french), breton)  # The first translation of a sentence wins.
+        self._index = index
+        self._ready.set()
+        logger.info(f"Translation memory: {len(index)} distinct French sentences indexed.")
+
+    def add(self, french: str, breton: str):
+        self._index[_digest(french)] = breton
+
+    def lookup(self, text: str, top_hit: dict = None):
+        breton = self._index.get(_digest(text))
+        if breton is not None:
+            self.hits_exact += 1
+            return {"kind": "exact", "french": text, "breton": breton, "similarity": 1.0}
+        if top_hit is None or top_hit.get("distance") is None:
+            return None
+        if normalize_text(top_hit["french"], casefold=True) == normalize_text(text, casefold=True):
+            self.hits_exact += 1
+            return {"kind": "exact", "french": top_hit["french"], "breton": top_hit["breton"], "similarity": 1.0}
+        if top_hit["distance"] >= self.threshold and _numbers(top_hit["french"]) == _numbers(text):
+            self.hits_similar += 1
+            return {"kind": "similar", "french": top_hit["french"], "breton": top_hit["breton"],
+                    "similarity": float(top_hit["distance"])}
+        return None
+
+    def stats(self) -> dict:
+        return {"entries": len(self._index), "hits_exact": self.hits_exact, "hits_similar": self.hits_similar}
+
+    def _run(self):
+        try:
+            self.load()
+        except Exception as e:
+            logger.error(f"Translation memory loading failed: {e}")
@@ -1,164 +1,1135 @@
 # src/translator.py
+import logging
 import os
+import asyncio
+import contextvars
+import functools
+import threading
+import time
+import httpx
 import ollama
+from concurrent.futures import CancelledError, ThreadPoolExecutor, TimeoutError as FuturesTimeoutError
 from sentence_transformers import SentenceTransformer
-from transformers import AutoTokenizer, AutoModelForSeq2SeqLM
+from transformers import AutoTokenizer, StoppingCriteria, StoppingCriteriaList, TextIteratorStreamer
 
 from .config import (
     MODEL_NAME_NLLB, MODEL_NAME_HELSINKI,
     MODEL_NAME_LLAMA, MODEL_NAME_NLLB_FT,
     MODEL_NAME_TRANSLATOR_SENTENCE_TRANSFORMER,
-    TRANSFORMERS_CACHE_PATH, CACHE_DIR
+    TRANSFORMERS_CACHE_PATH, CACHE_DIR,
+    MODEL_REGISTRY_MAX_MODELS, MODEL_REGISTRY_MAX_MEMORY_MB,
+    BATCHING_ENABLED, BATCH_MAX_SIZE, BATCH_MAX_WAIT_MS,
+    DOCUMENT_MAX_CHUNK_CHARS, DOCUMENT_MAX_WORKERS,
+    MODEL_REVISION_NLLB, MODEL_REVISION_HELSINKI, MODEL_REVISION_NLLB_FT, MODEL_VERSIONS,
+    TRANSLATION_CACHE_ENABLED, TRANSLATION_CACHE_DB_PATH, TRANSLATION_CACHE_MEMORY_ENTRIES,
+    TRANSLATION_CACHE_DISK_ENTRIES, TRANSLATION_CACHE_TTL_SECONDS, TRANSLATION_CACHE_FEW_SHOT,
+    ASYNC_IO_WORKERS, ASYNC_INFERENCE_WORKERS,
+    MODEL_PRECISION_NLLB, MODEL_PRECISION_HELSINKI, MODEL_PRECISION_NLLB_FT,
+    STARTUP_WAIT_SECONDS,
+    PROMPT_TOKEN_BUDGET, PROMPT_TOKEN_BUDGET_LLAMA, PROMPT_MIN_SIMILARITY, PROMPT_DEDUP_THRESHOLD,
+    AUTO_ROUTE_CASCADE, AUTO_FALLBACK, AUTO_LATENCY_BUDGET_SECONDS, AUTO_K, AUTO_EWMA_ALPHA,
+    AUTO_EXPLORE_SECONDS, AUTO_FALLBACK_RESERVE_SECONDS,
+    GENERATION_PROFILE, GENERATION_LENGTH_RATIOS, GENERATION_LENGTH_MARGIN, GENERATION_MIN_NEW_TOKENS,
+    GENERATION_MAX_NEW_TOKENS, GENERATION_QUALITY_BEAMS,
+    OLLAMA_HOST, OLLAMA_MAX_CONNECTIONS, OLLAMA_TIMEOUT_SECONDS, OLLAMA_KEEP_ALIVE, OLLAMA_NUM_CTX, OLLAMA_NUM_THREAD,
+    OLLAMA_SYSTEM_PROMPT
 )
+from .batcher import MicroBatcher
+from .generation import (
+    CACHE_VERSION as GENERATION_CACHE_VERSION, check_profile, hf_generation_args, is_deterministic, max_new_tokens,
+    ollama_options
+)
+from .metrics import span, request_context, mode_label, REQUESTS_TOTAL, AUTO_ROUTES_TOTAL
+from .model_registry import ModelRegistry
+from .prompting import TokenCounter, approximate_token_count, build_few_shot_prompt, build_rag_prompt
+from .quantization import load_seq2seq_model, generate
+from .routing import (
+    AutoRouter, Cancellation, LatencyTracker, cancellation_scope, current_cancellation, parse_routes, route_params
+)
+from .segmentation import split_sentences
+from .translation_cache import TranslationCache
 # Import the specific functions needed from utils
-from .utils import find_similar_examples_zilliz, get_random_examples_zilliz # <-- Updated import
+from .utils import ( # <-- Updated import
+    find_similar_examples_zilliz, find_similar_examples_batch, get_random_examples_zilliz, translation_memory_lookup
+)
 
-class BretonTraducteur:
-    def __init__(self):
-        # ... (init remains the same) ...
-        print("--- Initialising Translator Class ---")
-        st_model_name = MODEL_NAME_TRANSLATOR_SENTENCE_TRANSFORMER
-        print(f"Loading Translator's SentenceTransformer model: {st_model_name}...")
-        try:
-            self.translator_encoder = SentenceTransformer(st_model_name, cache_folder=CACHE_DIR)
-            print("Translator's SentenceTransformer loaded.")
-        except Exception as e:
-            print(f"WARN: Failed loading Translator's SentenceTransformer '{st_model_name}': {e}")
-            self.translator_encoder = None
-        print(f"Loading NLLB model: {MODEL_NAME_NLLB}...")
-        try:
-            self.tokenizer_nllb = AutoTokenizer.from_pretrained(MODEL_NAME_NLLB, cache_dir=TRANSFORMERS_CACHE_PATH)
-            self.model_nllb = AutoModelForSeq2SeqLM.from_pretrained(MODEL_NAME_NLLB, cache_dir=TRANSFORMERS_CACHE_PATH)
-            print("NLLB model loaded.")
-        except Exception as e:
-            print(f"ERROR loading NLLB model {MODEL_NAME_NLLB}: {e}")
-            raise
-        print(f"Loading Helsinki model: {MODEL_NAME_HELSINKI}...")
+logger = logging.getLogger(__name__)
+
+# Short model name -> (Hugging Face model id, target language code)
+SEQ2SEQ_MODELS = {
+    "nllb": (MODEL_NAME_NLLB, "bre_Latn"),
+    "helsinki": (MODEL_NAME_HELSINKI, None),
+    "nllb finetuned": (MODEL_NAME_NLLB_FT, "br_Latn"),
+}
+MODEL_REVISIONS = {
+    "nllb": MODEL_REVISION_NLLB,
+    "helsinki": MODEL_REVISION_HELSINKI,
+    "nllb finetuned": MODEL_REVISION_NLLB_FT,
+}
+MODEL_PRECISIONS = {
+    "nllb": MODEL_PRECISION_NLLB,
+    "helsinki": MODEL_PRECISION_HELSINKI,
+    "nllb finetuned": MODEL_PRECISION_NLLB_FT,
+}
+# Models translating into Breton: the only ones the translation memory can answer for.
+BRETON_TARGET_MODELS = ("nllb", "llama", "nllb finetuned")
+SENTENCE_TRANSFORMER_KEY = "sentence transformer"
+# Pseudo-model: picks a Breton model and assistance mode within a latency budget (src/routing.py).
+AUTO_MODEL = "auto"
+ASSISTANCE_MODES = ("Défaut", "Few-shot learning", "RAG")
+
+
+def _request_labels(model_name: str, use_rag: int, use_prompt: int) -> dict:
+    """Metric labels of a request: model, assistance mode and k."""
+    return {"model": model_name, "mode": mode_label(use_rag, use_prompt), "k": use_rag or use_prompt}
+
+
+def _memory_prompt(match: dict) -> str:
+    """Text shown in place of the prompt when the translation memory answered."""
+    if match["kind"] == "exact":
+        origin = "correspondance exacte"
+    else:
+        origin = f"similarité {match['similarity']:.3f}"
+    return f"[Mémoire de traduction : {origin}, aucune génération]\nFrançais : {match['french']}"
+
+
+def assistance_params(mode: str, k: int) -> tuple[int, int]:
+    """Maps a UI assistance mode and k to translate()'s (use_rag, use_prompt) arguments."""
+    if mode == "RAG" and k > 0:
+        return k, 0
+    if mode == "Few-shot learning" and k > 0:
+        return 0, k
+    return 0, 0
+
+
+class _CancelledCriteria(StoppingCriteria):
+    """Stops generate() once the request has been cancelled (deadline of an "auto" request)."""
+
+    def __init__(self, cancellation: Cancellation):
+        self.cancellation = cancellation
+
+    def __call__(self, input_ids, scores, **kwargs) -> bool:
+        return self.cancellation.cancelled
+
+
+class OllamaBackend:
+    """
+    Persistent Ollama clients for llama (one sync, one async), each with a pool of
+    keep-alive HTTP connections instead of the module-level client.
+
+    Every request carries the same `keep_alive`, so the model stays loaded between
+    requests, and the same num_ctx / num_thread, since Ollama reloads the model when they
+    change. Prompts start with their static header (and the optional system prompt before
+    it), with the examples and the text after, so Ollama reuses the evaluated prefix
+    instead of processing it again. warm_up() loads the model ahead of the first request.
+    """
+
+    def __init__(self, model: str, host: str = None, keep_alive: str = "30m", num_ctx: int = 4096, num_thread: int = 0,
+                 system_prompt: str = "", max_connections: int = 16, timeout: float = 120.0):
+        self.model = model
+        self.host = host
+        self.keep_alive = keep_alive
+        self.system_prompt = system_prompt
+        self.timeout = timeout
+        self.limits = httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections)
+        self.base_options = {"num_ctx": num_ctx}
+        if num_thread:
+            self.base_options["num_thread"] = num_thread
+        self.client = ollama.Client(host=host, timeout=timeout, limits=self.limits)
+        self._async_client = None
+        self._warm = threading.Event()
+
+    @property
+    def async_client(self):
+        # Created on first use, from the event loop that will use it.
+        if self._async_client is None:
+            self._async_client = ollama.AsyncClient(host=self.host, timeout=self.timeout, limits=self.limits)
+        return self._async_client
+
+    def messages(self, prompt: str) -> list[dict]:
+        messages = [{'role': 'system', 'content': self.system_prompt}] if self.system_prompt else []
+        messages.append({'role': 'user', 'content': prompt})
+        return messages
+
+    def options(self, options: dict = None) -> dict:
+        """Pinned options plus the request's own (num_predict, temperature)."""
+        return {**self.base_options, **(options or {})}
+
+    def chat(self, prompt: str, options: dict = None, stream: bool = False):
+        return self.client.chat(model=self.model, messages=self.messages(prompt), stream=stream,
+                                options=self.options(options), keep_alive=self.keep_alive)
+
+    async def chat_async(self, prompt: str, options: dict = None, stream: bool = False):
+        return await self.async_client.chat(model=self.model, messages=self.messages(prompt), stream=stream,
+                                            options=self.options(options), keep_alive=self.keep_alive)
+
+    @property
+    def warm(self) -> bool:
+        return self._warm.is_set()
+
+    def warm_up(self) -> bool:
+        """Loads the model (and evaluates the system prompt, if any) with a one-token request. Returns success."""
+        started = time.perf_counter()
         try:
-            self.tokenizer_helsinki = AutoTokenizer.from_pretrained(MODEL_NAME_HELSINKI, cache_dir=TRANSFORMERS_CACHE_PATH)
-            self.model_helsinki = AutoModelForSeq2SeqLM.from_pretrained(MODEL_NAME_HELSINKI, cache_dir=TRANSFORMERS_CACHE_PATH)
-            print("Helsinki model loaded.")
+            with span("ollama_warmup", model="llama"):
+                self.chat("Bonjour", {"num_predict": 1})
         except Exception as e:
-            print(f"ERROR loading Helsinki model {MODEL_NAME_HELSINKI}: {e}")
-            raise
-        print(f"Loading NLLB finetuned model: {MODEL_NAME_NLLB_FT}...")
+            logger.warning(f"Ollama warm-up of {self.model} failed (the first llama request will load it): {e}")
+            return False
+        self._warm.set()
+        logger.info(f"Ollama: {self.model} warmed up in {time.perf_counter() - started:.1f}s.")
+        return True
+
+    def start_warm_up(self) -> threading.Thread:
+        thread = threading.Thread(target=self.warm_up, name="ollama-warmup", daemon=True)
+        thread.start()
+        return thread
+
+    def status(self) -> dict:
+        return {"model": self.model, "warm": self.warm, "keep_alive": self.keep_alive, **self.base_options}
+
+
+def _load_seq2seq(full_model_name: str, revision: str = "main", precision: str = "fp32"):
+    """Loads a tokenizer/model pair from the Hugging Face cache, in the configured precision."""
+    try:
+        tokenizer = AutoTokenizer.from_pretrained(full_model_name, cache_dir=TRANSFORMERS_CACHE_PATH, revision=revision)
+        model = load_seq2seq_model(full_model_name, TRANSFORMERS_CACHE_PATH, revision=revision, precision=precision)
+    except Exception as e:
+        logger.error(f"Error loading model {full_model_name}: {e}")
+        raise
+    return tokenizer, model
+
+
+def new_model_registry() -> ModelRegistry:
+    """Registry within the configured budget, with a loader for every model the translator uses."""
+    registry = ModelRegistry(max_models=MODEL_REGISTRY_MAX_MODELS, max_memory_mb=MODEL_REGISTRY_MAX_MEMORY_MB)
+    register_models(registry)
+    return registry
+
+
+def register_models(registry: ModelRegistry):
+    for short_name, (full_model_name, _) in SEQ2SEQ_MODELS.items():
+        registry.register(
+            short_name,
+            lambda name=full_model_name, revision=MODEL_REVISIONS[short_name], precision=MODEL_PRECISIONS[short_name]:
+                _load_seq2seq(name, revision, precision),
+        )
+    registry.register(
+        SENTENCE_TRANSFORMER_KEY,
+        lambda: SentenceTransformer(MODEL_NAME_TRANSLATOR_SENTENCE_TRANSFORMER, cache_folder=CACHE_DIR),
+    )
+
+
+class BretonTraducteur:
+    def __init__(self, registry: ModelRegistry = None, cache_enabled: bool = TRANSLATION_CACHE_ENABLED):
+        logger.info("--- Initialising Translator Class ---")
+        # Models are not loaded here: the registry loads each one the first time it is used.
+        if registry is None:
+            registry = new_model_registry()
+        else:
+            register_models(registry)
+        self.registry = registry
+        # Background micro-batcher grouping concurrent translate() calls per model.
+        self.batcher = None
+        if BATCHING_ENABLED:
+            self.batcher = MicroBatcher(
+                self._generate_seq2seq,
+                max_batch_size=BATCH_MAX_SIZE,
+                max_wait_ms=BATCH_MAX_WAIT_MS,
+            )
+        # Cache of finished translations, keyed on normalized text, model, mode and k.
+        self.cache = None
+        if cache_enabled:
+            self.cache = TranslationCache(
+                TRANSLATION_CACHE_DB_PATH,
+                model_versions={name: f"{version}/{GENERATION_CACHE_VERSION}" for name, version in MODEL_VERSIONS.items()},
+                max_memory_entries=TRANSLATION_CACHE_MEMORY_ENTRIES,
+                max_disk_entries=TRANSLATION_CACHE_DISK_ENTRIES,
+                ttl_seconds=TRANSLATION_CACHE_TTL_SECONDS,
+            )
+        # Executors used by translate_async(): retrieval (network I/O) and torch inference are
+        # kept apart so slow Zilliz searches never hold an inference slot.
+        self._io_executor = ThreadPoolExecutor(max_workers=ASYNC_IO_WORKERS, thread_name_prefix="translator-io")
+        self._inference_executor = ThreadPoolExecutor(max_workers=ASYNC_INFERENCE_WORKERS, thread_name_prefix="translator-inference")
+        # llama: pooled clients, pinned options and keep-alive (see OllamaBackend).
+        self.ollama_backend = OllamaBackend(
+            MODEL_NAME_LLAMA, host=OLLAMA_HOST, keep_alive=OLLAMA_KEEP_ALIVE, num_ctx=OLLAMA_NUM_CTX,
+            num_thread=OLLAMA_NUM_THREAD, system_prompt=OLLAMA_SYSTEM_PROMPT, max_connections=OLLAMA_MAX_CONNECTIONS,
+            timeout=OLLAMA_TIMEOUT_SECONDS,
+        )
+        # Multi-process mode (see src/serving.py): seq2seq generation is sent to worker processes.
+        self.workers = None
+        # "auto" model: moving-average latency of every (model, mode) path, fed by all requests.
+        self.router = AutoRouter(
+            parse_routes(AUTO_ROUTE_CASCADE), parse_routes(AUTO_FALLBACK)[0], LatencyTracker(AUTO_EWMA_ALPHA),
+            explore_after=AUTO_EXPLORE_SECONDS, default_reserve=AUTO_FALLBACK_RESERVE_SECONDS,
+        )
+        # Runs the first path of an "auto" request while the caller watches its deadline.
+        self._route_executor = ThreadPoolExecutor(max_workers=ASYNC_IO_WORKERS, thread_name_prefix="translator-route")
+        # Per-model token counters used to fit the examples in the prompt budget.
+        self._token_counters = {}
+        logger.info("--- Translator Class Initialisation Complete (models load on demand) ---")
+
+    @property
+    def translator_encoder(self):
+        """Translator's SentenceTransformer, loaded on first access (None if it cannot be loaded)."""
         try:
-            self.tokenizer_nllb_ft = AutoTokenizer.from_pretrained(MODEL_NAME_NLLB_FT, cache_dir=TRANSFORMERS_CACHE_PATH)
-            self.model_nllb_ft = AutoModelForSeq2SeqLM.from_pretrained(MODEL_NAME_NLLB_FT, cache_dir=TRANSFORMERS_CACHE_PATH)
-            print("NLLB finetuned model loaded.")
+            return self.registry.get(SENTENCE_TRANSFORMER_KEY)
         except Exception as e:
-            print(f"ERROR loading NLLB finetuned model {MODEL_NAME_NLLB_FT}: {e}")
-            raise
-        print("--- Translator Class Initialisation Complete ---")
+            logger.warning(f"Failed loading Translator's SentenceTransformer '{MODEL_NAME_TRANSLATOR_SENTENCE_TRANSFORMER}': {e}")
+            return None
 
+    def get_model(self, model_name: str):
+        """
+        Returns the (tokenizer, model) pair for a seq2seq short model name, loading it if needed.
+        Raises ModelNotReadyError if it is still being loaded in the background after STARTUP_WAIT_SECONDS.
+        """
+        return self.registry.get(model_name, timeout=STARTUP_WAIT_SECONDS)
 
-    def translate(self, text: str, model_name: str, use_rag: int = 0, use_prompt: int = 0) -> tuple[int, int, str, str]:
+    def preload_models(self, model_names: list[str], max_workers: int = 2) -> list:
+        """Starts loading models on background threads (see ModelRegistry.preload)."""
+        return self.registry.preload(model_names, max_workers=max_workers)
+
+    def model_status(self) -> dict:
+        """Load state of every model: "loaded", "loading", "failed" or "not_loaded"."""
+        return self.registry.status()
+
+    def resident_models(self) -> list[dict]:
+        """Lists the models currently held in memory with their estimated size in MB."""
+        return self.registry.resident()
+
+
+    def build_prompt(self, text: str, model_name: str, use_rag: int = 0, use_prompt: int = 0,
+                     prompt_info: dict = None) -> str:
         """
-        Translate text using the selected model.
+        Builds the prompt sent to the model.
         - use_rag > 0: Adds SIMILAR examples found via Zilliz vector search.
         - use_prompt > 0: Adds RANDOM examples retrieved from Zilliz.
+        Examples are filtered and fitted in the model's token budget (see src/prompting.py);
+        `prompt_info`, if given, is filled with the examples and tokens actually used.
+        The "prompt_build" span includes the nested embedding / vector_search spans.
+        """
+        with span("prompt_build"):
+            return self._assemble_prompt(text, model_name, use_rag, use_prompt, prompt_info)
+
+    def token_budget(self, model_name: str) -> int:
+        return PROMPT_TOKEN_BUDGET_LLAMA if model_name == "llama" else PROMPT_TOKEN_BUDGET
+
+    def _token_counter(self, model_name: str) -> TokenCounter:
+        counter = self._token_counters.get(model_name)
+        if counter is None:
+            if model_name not in SEQ2SEQ_MODELS:
+                # No local tokenizer (llama through Ollama): approximate counts.
+                counter = TokenCounter(approximate_token_count)
+            else:
+                # A model still loading raises ModelNotReadyError: the request fails fast instead of
+                # waiting for it again when building the prompt, sizing the decode and generating.
+                counter = TokenCounter.for_tokenizer(self.get_model(model_name)[0])
+            counter = self._token_counters.setdefault(model_name, counter)
+        return counter
+
+    def _budgeted_rag_prompt(self, text: str, model_name: str, examples: list[dict], prompt_info: dict = None) -> str:
+        prompt, info = build_rag_prompt(
+            text, examples, self._token_counter(model_name), self.token_budget(model_name),
+            min_similarity=PROMPT_MIN_SIMILARITY, dedup_threshold=PROMPT_DEDUP_THRESHOLD,
+        )
+        if prompt_info is not None:
+            prompt_info.update(info)
+        return prompt
+
+    def build_prompts(self, texts: list[str], model_name: str, use_rag: int = 0, use_prompt: int = 0,
+                      prompt_infos: list[dict] = None) -> list[str]:
         """
+        build_prompt() for several texts. With RAG, all texts are embedded and searched in one
+        batched retrieval; few-shot retrievals run concurrently on the I/O executor.
+        `prompt_infos`, if given, holds one dict per text to fill (see build_prompt).
+        """
+        infos = prompt_infos if prompt_infos is not None else [None] * len(texts)
+        if (use_rag <= 0 and use_prompt <= 0) or len(texts) <= 1:
+            return [self.build_prompt(text, model_name, use_rag, use_prompt, info) for text, info in zip(texts, infos)]
+        if use_rag > 0:
+            with span("prompt_build") as prompt_span:
+                prompt_span.set(batch_size=len(texts))
+                prompts = []
+                for text, info, (fallback_prompt, examples) in zip(texts, infos, find_similar_examples_batch(texts, k=use_rag)):
+                    if not examples:
+                        prompts.append(fallback_prompt)
+                        continue
+                    if info is not None:
+                        info["top_hit"] = examples[0]
+                    prompts.append(self._budgeted_rag_prompt(text, model_name, examples, info))
+                return prompts
+        return list(self._io_executor.map(
+            lambda text, info: self.build_prompt(text, model_name, use_rag, use_prompt, info), texts, infos
+        ))
+
+    def _memory_match(self, text: str, model_name: str, top_hit: dict = None):
+        if model_name not in BRETON_TARGET_MODELS:
+            return None
+        return translation_memory_lookup(text, top_hit)
+
+    def _prompt_or_memory(self, text: str, model_name: str, use_rag: int, use_prompt: int,
+                          prompt_info: dict = None) -> tuple[str, str]:
+        """
+        Builds the prompt, unless the translation memory already holds the translation:
+        exact match before any retrieval, or a near-exact RAG hit once the examples are known.
+        Returns (prompt, None), or (description of the match, stored Breton translation).
+        """
+        info = prompt_info if prompt_info is not None else {}
+        match = self._memory_match(text, model_name)
+        if match is None:
+            question_to_ask = self.build_prompt(text, model_name, use_rag, use_prompt, info)
+            if info.get("top_hit") is not None:
+                match = self._memory_match(text, model_name, info["top_hit"])
+            if match is None:
+                return question_to_ask, None
+        info["translation_memory"] = match
+        return _memory_prompt(match), match["breton"]
+
+    def _prompt_or_memory_with_labels(self, labels: dict, text: str, model_name: str, use_rag: int, use_prompt: int,
+                                      prompt_info: dict = None) -> tuple[str, str]:
+        # For callers that cannot hold request_context() themselves (generators).
+        with request_context(**labels):
+            return self._prompt_or_memory(text, model_name, use_rag, use_prompt, prompt_info)
+
+    def _assemble_prompt(self, text: str, model_name: str, use_rag: int, use_prompt: int, prompt_info: dict = None) -> str:
         question_to_ask = None # Initialize
         prompt_generated = False # Flag to see if RAG/Prompt logic ran
 
         # --- RAG/Prompt Logic ---
         if use_rag > 0:
             prompt_generated = True
-            # print(f"RAG Similarity requested (k={use_rag}). Calling utils.find_similar_examples_zilliz...")
-            # find_similar_examples_zilliz now returns (prompt_string, examples_list)
-            question_to_ask, _ = find_similar_examples_zilliz(text, k=use_rag)
-            # Use the fully formatted prompt returned by the function
+            # find_similar_examples_zilliz returns (prompt_string, examples_list)
+            question_to_ask, similar_examples = find_similar_examples_zilliz(text, k=use_rag)
+            # Without examples, keep the fallback prompt returned by the function
+            if similar_examples:
+                if prompt_info is not None:
+                    prompt_info["top_hit"] = similar_examples[0]
+                question_to_ask = self._budgeted_rag_prompt(text, model_name, similar_examples, prompt_info)
 
         elif use_prompt > 0:
             prompt_generated = True
-            # print(f"Random Examples requested (k={use_prompt}). Calling utils.get_random_examples_zilliz...")
             random_examples = get_random_examples_zilliz(k=use_prompt)
 
             if not random_examples:
-                print("WARN: Failed to retrieve random examples from Zilliz.")
+                logger.warning("Failed to retrieve random examples from Zilliz.")
                 # Fallback prompt if random retrieval fails
                 question_to_ask = "Traduire en breton (exemples aléatoires indisponibles):\n\n" + text
             else:
-                # print(f"Constructing prompt with {len(random_examples)} random examples.")
-                prompt_header = "Voici quelques paires français-breton aléatoires de la base de données:\n\n"
-                example_string = ""
-                for ex in random_examples:
-                    example_string += f"Français : {ex['french']}\n"
-                    example_string += f"Breton : {ex['breton']}\n\n"
-                # Combine header, examples, and the text to translate
-                question_to_ask = f"{prompt_header}{example_string}Traduire le texte suivant en breton:\n{text}"
+                question_to_ask, info = build_few_shot_prompt(
+                    text, random_examples, self._token_counter(model_name), self.token_budget(model_name),
+                    dedup_threshold=PROMPT_DEDUP_THRESHOLD,
+                )
+                if prompt_info is not None:
+                    prompt_info.update(info)
 
         # Default prompt if no RAG/Prompt mode was selected
         if not prompt_generated:
-            # print("Using default prompt generation logic (no RAG/Prompt requested)...")
             if model_name == "nllb finetuned":
                  question_to_ask = text
             else:
                  question_to_ask = "Traduire en breton:\n\n" + text
-            # print("Default prompt set.")
         # If RAG/Prompt ran but failed, question_to_ask already holds the fallback.
 
-        # --- Model Selection and Translation ---
-        # ... (rest of the translate method remains the same) ...
-        selected_tokenizer = None
-        selected_model = None
-        full_model_name = "Unknown"
-        target_lang_code = None
-
-        if model_name == "nllb":
-            selected_tokenizer = self.tokenizer_nllb
-            selected_model = self.model_nllb
-            full_model_name = MODEL_NAME_NLLB
-            target_lang_code = "bre_Latn"
-            prompt_already_specifies_breton = "Traduire en breton" in question_to_ask # Simple check
-        elif model_name == "helsinki":
-            selected_tokenizer = self.tokenizer_helsinki
-            selected_model = self.model_helsinki
-            full_model_name = MODEL_NAME_HELSINKI
-        elif model_name == "nllb finetuned":
-            selected_tokenizer = self.tokenizer_nllb_ft
-            selected_model = self.model_nllb_ft
-            full_model_name = MODEL_NAME_NLLB_FT
-            target_lang_code = "br_Latn"
-        elif model_name == "llama":
-            full_model_name = MODEL_NAME_LLAMA
-        else:
-            error_msg = f"Error: Model '{model_name}' unknown."
-            print(error_msg)
-            return use_prompt, use_rag, question_to_ask or text, error_msg
-
-        # print(f"Using translator model: {full_model_name}")
         if not isinstance(question_to_ask, str):
-             print(f"ERROR: Generated prompt is not a string ({type(question_to_ask)}). Using raw text.")
+             logger.error(f"Generated prompt is not a string ({type(question_to_ask)}). Using raw text.")
              question_to_ask = text # Fallback
+        return question_to_ask
+
+    def _batch_key(self, model_name: str, prompt: str, profile: str) -> tuple[str, bool, str]:
+        """
+        Prompts can only share a generate() call if they use the same generation args.
+        For NLLB the target language is forced unless the prompt already asks for Breton.
+        """
+        _, target_lang_code = SEQ2SEQ_MODELS[model_name]
+        force_target_lang = model_name == "nllb" and bool(target_lang_code) and "Traduire en breton" not in prompt
+        return model_name, force_target_lang, profile
+
+    def _generation_budget(self, model_name: str, text: str) -> int:
+        """max_new_tokens for translating `text`: its token count times the model's length ratio."""
+        source_tokens = self._token_counter(model_name).count_uncached(text)
+        return max_new_tokens(
+            source_tokens, GENERATION_LENGTH_RATIOS.get(model_name, 1.5), margin=GENERATION_LENGTH_MARGIN,
+            minimum=GENERATION_MIN_NEW_TOKENS, maximum=GENERATION_MAX_NEW_TOKENS,
+        )
+
+    def _prepare_seq2seq(self, batch_key: tuple[str, bool, str], items: list[tuple[str, int]]):
+        """
+        Tokenizes the (prompt, max_new_tokens) items and builds the generate() args.
+        The batch decodes up to its largest budget. Returns (tokenizer, model, inputs, generation_args).
+        """
+        model_name, force_target_lang, profile = batch_key
+        _, target_lang_code = SEQ2SEQ_MODELS[model_name]
+        selected_tokenizer, selected_model = self.get_model(model_name)
+        prompts = [prompt for prompt, _ in items]
+
+        with span("tokenization", model=model_name) as tokenization_span:
+            inputs = selected_tokenizer(prompts, return_tensors="pt", padding=True, truncation=True, max_length=512)
+            tokenization_span.set(tokens_in=int(inputs["attention_mask"].sum()), batch_size=len(prompts))
+        generation_args = hf_generation_args(profile, max(budget for _, budget in items), GENERATION_QUALITY_BEAMS)
+        if force_target_lang:
+            forced_token_id = selected_tokenizer.lang_code_to_id.get(target_lang_code)
+            if forced_token_id:
+                generation_args["forced_bos_token_id"] = forced_token_id
+            else:
+                logger.warning(f"Language code '{target_lang_code}' not found. Using default NLLB generation.")
+        cancellation = current_cancellation()
+        if cancellation is not None:
+            generation_args["stopping_criteria"] = StoppingCriteriaList([_CancelledCriteria(cancellation)])
+        return selected_tokenizer, selected_model, inputs, generation_args
+
+    def _generate_seq2seq(self, batch_key: tuple[str, bool, str], items: list[tuple[str, int]]) -> list[str]:
+        """Runs one padded generate() over a batch of (prompt, max_new_tokens) items sharing the same batch key."""
+        model_name = batch_key[0]
+        selected_tokenizer, selected_model, inputs, generation_args = self._prepare_seq2seq(batch_key, items)
+        with span("generate", model=model_name) as generate_span:
+            generated_ids = generate(selected_model, **inputs, **generation_args)
+            generate_span.set(tokens_out=int(generated_ids.numel()), batch_size=len(items))
+        with span("decode", model=model_name):
+            return selected_tokenizer.batch_decode(generated_ids, skip_special_tokens=True)
+
+    def _stream_seq2seq(self, batch_key: tuple[str, bool, str], item: tuple[str, int]):
+        """Yields decoded text pieces as generate() produces tokens (generation runs on the inference executor)."""
+        if batch_key[2] != "fast":
+            # TextIteratorStreamer does not support beam search: the translation comes in one piece.
+            generation = self._inference_executor.submit(
+                contextvars.copy_context().run, self._generate_seq2seq, batch_key, [item]
+            )
+            yield generation.result()[0]
+            return
+        selected_tokenizer, selected_model, inputs, generation_args = self._prepare_seq2seq(batch_key, [item])
+        streamer = TextIteratorStreamer(selected_tokenizer, skip_prompt=True, skip_special_tokens=True)
+        with span("generate", model=batch_key[0]) as generate_span:
+            generation = self._inference_executor.submit(generate, selected_model, **inputs, **generation_args, streamer=streamer)
+            pieces = 0
+            for piece in streamer:
+                pieces += 1
+                yield piece
+            generation.result()  # Re-raises generation errors.
+            generate_span.set(pieces=pieces)
+
+    def _stream_llama(self, prompt: str, options: dict):
+        with span("ollama", model="llama") as ollama_span:
+            for chunk in self.ollama_backend.chat(prompt, options, stream=True):
+                if chunk.get('done'):
+                    ollama_span.set(tokens_in=chunk.get('prompt_eval_count') or 0, tokens_out=chunk.get('eval_count') or 0)
+                yield chunk['message']['content']
+
+    def _llama_options(self, text: str, profile: str) -> dict:
+        return ollama_options(profile, self._generation_budget("llama", text))
+
+    def _generate_llama(self, prompt: str, options: dict) -> str:
+        cancellation = current_cancellation()
+        if cancellation is not None:
+            # Streamed, so that a cancelled request stops reading and Ollama stops generating.
+            stream = self._stream_llama(prompt, options)
+            try:
+                pieces = []
+                for piece in stream:
+                    if cancellation.cancelled:
+                        raise CancelledError("Request cancelled.")
+                    pieces.append(piece)
+                return "".join(pieces)
+            finally:
+                stream.close()
+        with span("ollama", model="llama") as ollama_span:
+            response = self.ollama_backend.chat(prompt, options)
+            ollama_span.set(tokens_in=response.get('prompt_eval_count') or 0, tokens_out=response.get('eval_count') or 0)
+        return response['message']['content']
+
+    @property
+    def _seq2seq_queue(self):
+        """Where single seq2seq prompts are submitted: the worker pool if any, else the micro-batcher."""
+        return self.workers if self.workers is not None else self.batcher
+
+    def _submit_seq2seq(self, batch_key: tuple[str, bool, str], item: tuple[str, int]):
+        """Queues one (prompt, max_new_tokens) item on the worker pool / micro-batcher; a cancelled request withdraws it."""
+        future = self._seq2seq_queue.submit(batch_key, item)
+        cancellation = current_cancellation()
+        return future if cancellation is None else cancellation.watch(future)
+
+    def _run_in_executor(self, executor, fn, *args):
+        """loop.run_in_executor() that keeps the request's metric labels (contextvars) in the worker thread."""
+        context = contextvars.copy_context()
+        return asyncio.get_running_loop().run_in_executor(executor, functools.partial(context.run, fn, *args))
+
+    def _full_model_name(self, model_name: str) -> str:
+        if model_name in SEQ2SEQ_MODELS:
+            return SEQ2SEQ_MODELS[model_name][0]
+        if model_name == "llama":
+            return MODEL_NAME_LLAMA
+        return "Unknown"
+
+    def _cache_key(self, text: str, model_name: str, use_rag: int, use_prompt: int, profile: str = "fast"):
+        """Returns the cache key for a request, or None if it must not be cached."""
+        if self.cache is None or model_name not in MODEL_VERSIONS or not is_deterministic(model_name, profile):
+            return None
+        suffix = f"/{profile}"
+        if use_rag > 0:
+            return self.cache.make_key(text, model_name, "rag" + suffix, use_rag)
+        if use_prompt > 0:
+            if not TRANSLATION_CACHE_FEW_SHOT:
+                return None
+            return self.cache.make_key(text, model_name, "few-shot" + suffix, use_prompt)
+        return self.cache.make_key(text, model_name, "default" + suffix, 0)
+
+    def _cache_store(self, cache_key, model_name: str, prompt: str, translation: str, use_rag: int = 0,
+                     use_prompt: int = 0, prompt_info: dict = None):
+        # Errors are returned as text: never cache them.
+        if cache_key is None or translation.startswith("Error"):
+            return
+        # A RAG / few-shot request served with the fallback prompt (RAG down, circuit open, no example
+        # retrieved or kept) must not be cached under its mode: it would outlive the outage.
+        if (use_rag > 0 or use_prompt > 0) and not (prompt_info or {}).get("examples_used"):
+            return
+        self.cache.set(cache_key, model_name, prompt, translation)
+
+    def _prompt_failed(self, labels: dict, model_name: str, text: str, error: Exception) -> tuple[str, str]:
+        """
+        Result of a request whose prompt could not be built: the token budget needs the model's
+        tokenizer, so a model still loading (ModelNotReadyError) or failing to load ends up here.
+        """
+        logger.error(f"Error during generation with model {self._full_model_name(model_name)}: {error}")
+        REQUESTS_TOTAL.inc(outcome="error", **labels)
+        return text, f"Error during generation: {error}"
+
+    def _record_outcome(self, labels: dict, started: float, translation: str, profile: str = "fast"):
+        """Counts a generated translation and feeds its latency to the "auto" router's averages."""
+        if translation.startswith("Error"):
+            REQUESTS_TOTAL.inc(outcome="error", **labels)
+            return
+        REQUESTS_TOTAL.inc(outcome="ok", **labels)
+        if profile == "fast":  # "auto" requests always decode with the fast profile.
+            self.router.tracker.observe((labels["model"], labels["mode"]), time.perf_counter() - started)
+
+    def _route_available(self, model_name: str) -> bool:
+        # A seq2seq model that is not resident would spend the budget loading: only the fallback may wait for it.
+        return model_name not in SEQ2SEQ_MODELS or self.registry.is_loaded(model_name)
+
+    def _report_route(self, info: dict, planned: tuple, served: tuple, reason: str, k: int, budget: float, started: float):
+        route = {
+            "model": served[0], "mode": served[1], "k": k if served[1] != "default" else 0,
+            "planned": f"{planned[0]}:{planned[1]}", "fallback": served != planned, "reason": reason,
+            "budget_seconds": budget, "seconds": round(time.perf_counter() - started, 3),
+        }
+        info["route"] = route
+        AUTO_ROUTES_TOTAL.inc(model=served[0], mode=served[1], fallback=str(route["fallback"]).lower())
+        if route["fallback"]:
+            logger.info(f"Auto: {route['planned']} {reason}, served by {served[0]}:{served[1]} in {route['seconds']}s.")
+
+    def _translate_path(self, path: tuple, text: str, k: int, info: dict, cancellation: Cancellation = None):
+        use_rag, use_prompt = route_params(path[1], k)
+        if cancellation is None:
+            return self.translate(text, path[0], use_rag, use_prompt, info, profile="fast")
+        with cancellation_scope(cancellation):
+            return self.translate(text, path[0], use_rag, use_prompt, info, profile="fast")
+
+    def translate_auto(self, text: str, use_rag: int = 0, use_prompt: int = 0, prompt_info: dict = None,
+                       latency_budget: float = None) -> tuple[str, str]:
+        """
+        translate() with model "auto": the router picks the preferred Breton path
+        (AUTO_ROUTE_CASCADE) whose average latency fits in `latency_budget` seconds
+        (AUTO_LATENCY_BUDGET_SECONDS by default). If that path has not answered when only
+        the time needed by the fallback (AUTO_FALLBACK) is left, or if it fails, it is
+        cancelled and the fallback serves the request.
+        k is the caller's use_rag / use_prompt, or AUTO_K. prompt_info["route"] tells which path served.
+        """
+        budget = latency_budget or AUTO_LATENCY_BUDGET_SECONDS
+        k = use_rag or use_prompt or AUTO_K
+        info = prompt_info if prompt_info is not None else {}
+        started = time.perf_counter()
+        path, primary_budget = self.router.choose(budget, self._route_available)
+        result, reason = None, None
+        if path != self.router.fallback:
+            cancellation = Cancellation()
+            primary_info = {}  # Not shared with the caller: an abandoned path may still write to it.
+            future = self._route_executor.submit(
+                contextvars.copy_context().run, self._translate_path, path, text, k, primary_info, cancellation
+            )
+            try:
+                result = future.result(timeout=primary_budget)
+            except Exception as e:
+                # ModelNotReadyError is a TimeoutError too: only a path still running has missed the deadline.
+                reason = "deadline" if isinstance(e, FuturesTimeoutError) and not future.done() else "error"
+                self._primary_failed(path, reason, e, cancellation, started)
+            result, reason = self._check_primary(path, budget, result, reason)
+            if result is not None:
+                info.update(primary_info)
+        served = path
+        if result is None:
+            served = self.router.fallback
+            result = self._translate_path(served, text, k, info)
+        self._report_route(info, path, served, reason, k, budget, started)
+        return result
+
+    async def translate_auto_async(self, text: str, use_rag: int = 0, use_prompt: int = 0, prompt_info: dict = None,
+                                   latency_budget: float = None) -> tuple[str, str]:
+        """Async version of translate_auto(): the late path's task is cancelled at the deadline."""
+        budget = latency_budget or AUTO_LATENCY_BUDGET_SECONDS
+        k = use_rag or use_prompt or AUTO_K
+        info = prompt_info if prompt_info is not None else {}
+        started = time.perf_counter()
+        path, primary_budget = self.router.choose(budget, self._route_available)
+        result, reason = None, None
+        if path != self.router.fallback:
+            cancellation = Cancellation()
+            primary_info = {}
+            use_rag_path, use_prompt_path = route_params(path[1], k)
+            # The task copies the current context, cancellation scope included.
+            with cancellation_scope(cancellation):
+                task = asyncio.ensure_future(
+                    self.translate_async(text, path[0], use_rag_path, use_prompt_path, primary_info, profile="fast")
+                )
+            try:
+                result = await asyncio.wait_for(task, primary_budget)
+            except Exception as e:
+                # At the deadline wait_for() cancels the task; the cancellation also stops generation
+                # running on executor threads.
+                reason = "deadline" if isinstance(e, asyncio.TimeoutError) and task.cancelled() else "error"
+                self._primary_failed(path, reason, e, cancellation, started)
+            result, reason = self._check_primary(path, budget, result, reason)
+            if result is not None:
+                info.update(primary_info)
+        served = path
+        if result is None:
+            served = self.router.fallback
+            use_rag_path, use_prompt_path = route_params(served[1], k)
+            result = await self.translate_async(text, served[0], use_rag_path, use_prompt_path, info, profile="fast")
+        self._report_route(info, path, served, reason, k, budget, started)
+        return result
+
+    def _primary_failed(self, path: tuple, reason: str, error: Exception, cancellation: Cancellation, started: float):
+        """A first path that missed its deadline ("deadline") or raised ("error"): the fallback serves the request."""
+        cancellation.cancel()
+        if reason == "error":
+            logger.error(f"Auto: {path[0]}:{path[1]} failed: {error}")
+        # It needs at least this long: until it is probed again, it is skipped at this budget.
+        self.router.tracker.observe(path, time.perf_counter() - started, lower_bound=True)
+
+    def _check_primary(self, path: tuple, budget: float, result, reason: str):
+        """Turns a failed first path into a fallback; the failure counts as a full budget in its average."""
+        if result is not None and result[1].startswith("Error"):
+            self.router.tracker.observe(path, budget, lower_bound=True)
+            return None, "error"
+        return result, reason
+
+    def translate(self, text: str, model_name: str, use_rag: int = 0, use_prompt: int = 0,
+                  prompt_info: dict = None, latency_budget: float = None, profile: str = None) -> tuple[str, str]:
+        """
+        Translate text using the selected model.
+        - use_rag > 0: Adds SIMILAR examples found via Zilliz vector search.
+        - use_prompt > 0: Adds RANDOM examples retrieved from Zilliz.
+
+        Concurrent calls for the same seq2seq model are grouped by the micro-batcher
+        into a single padded generate() (see translate_batch for explicit batches).
+        Results are served from the translation cache when possible.
+        `prompt_info`, if given, receives the prompt statistics (see build_prompt).
+        `profile` is the decoding profile, "fast" or "quality" (GENERATION_PROFILE by default);
+        the decode budget follows the length of `text` (see src/generation.py).
+        model_name "auto" chooses the model and mode itself (see translate_auto).
+        """
+        if model_name == AUTO_MODEL:
+            return self.translate_auto(text, use_rag, use_prompt, prompt_info, latency_budget)
+        profile = check_profile(profile or GENERATION_PROFILE)
+        labels = _request_labels(model_name, use_rag, use_prompt)
+        with request_context(**labels), span("request"):
+            return self._translate(text, model_name, use_rag, use_prompt, labels, prompt_info, profile)
+
+    def _translate(self, text: str, model_name: str, use_rag: int, use_prompt: int, labels: dict,
+                   prompt_info: dict = None, profile: str = "fast") -> tuple[str, str]:
+        started = time.perf_counter()
+        cache_key = self._cache_key(text, model_name, use_rag, use_prompt, profile)
+        if cache_key is not None:
+            cached = self.cache.get(cache_key)
+            if cached is not None:
+                REQUESTS_TOTAL.inc(outcome="cache_hit", **labels)
+                return cached
+
+        prompt_info = prompt_info if prompt_info is not None else {}
+        try:
+            question_to_ask, memory_translation = self._prompt_or_memory(text, model_name, use_rag, use_prompt, prompt_info)
+        except Exception as e:
+            return self._prompt_failed(labels, model_name, text, e)
+        if memory_translation is not None:
+            REQUESTS_TOTAL.inc(outcome="tm_hit", **labels)
+            return question_to_ask, memory_translation
+
+        if model_name not in SEQ2SEQ_MODELS and model_name != "llama":
+            error_msg = f"Error: Model '{model_name}' unknown."
+            logger.error(error_msg)
+            REQUESTS_TOTAL.inc(outcome="error", **labels)
+            return question_to_ask or text, error_msg
+
+        try:
+            if model_name == "llama":
+                translation = self._generate_llama(question_to_ask, self._llama_options(text, profile))
+            elif self.workers is not None or self.batcher is not None:
+                if self.workers is None:
+                    # Wait for a model still loading here rather than on the shared batcher thread.
+                    self.get_model(model_name)
+                batch_key = self._batch_key(model_name, question_to_ask, profile)
+                item = (question_to_ask, self._generation_budget(model_name, text))
+                # Per-request view of the batched generation (queueing included).
+                with span("batched_generate"):
+                    translation = self._submit_seq2seq(batch_key, item).result()
+            else:
+                batch_key = self._batch_key(model_name, question_to_ask, profile)
+                item = (question_to_ask, self._generation_budget(model_name, text))
+                translation = self._generate_seq2seq(batch_key, [item])[0]
+        except Exception as e:
+            logger.error(f"Error during generation with model {self._full_model_name(model_name)}: {e}")
+            translation = f"Error during generation: {e}"
+
+        self._record_outcome(labels, started, translation, profile)
+        self._cache_store(cache_key, model_name, question_to_ask, translation, use_rag, use_prompt, prompt_info)
+        return question_to_ask, translation
+
+    async def _generate_llama_async(self, prompt: str, options: dict) -> str:
+        with span("ollama", model="llama") as ollama_span:
+            response = await self.ollama_backend.chat_async(prompt, options)
+            ollama_span.set(tokens_in=response.get('prompt_eval_count') or 0, tokens_out=response.get('eval_count') or 0)
+        return response['message']['content']
+
+    async def translate_async(self, text: str, model_name: str, use_rag: int = 0, use_prompt: int = 0,
+                              prompt_info: dict = None, latency_budget: float = None,
+                              profile: str = None) -> tuple[str, str]:
+        """
+        Async version of translate() for the Gradio handler.
+        Retrieval runs on the I/O executor, llama goes through Ollama's AsyncClient and
+        seq2seq generation is awaited on the micro-batcher (or the inference executor),
+        so the event loop never blocks and waiting on Zilliz/Ollama does not take up
+        inference capacity.
+        """
+        if model_name == AUTO_MODEL:
+            return await self.translate_auto_async(text, use_rag, use_prompt, prompt_info, latency_budget)
+        profile = check_profile(profile or GENERATION_PROFILE)
+        labels = _request_labels(model_name, use_rag, use_prompt)
+        with request_context(**labels), span("request"):
+            return await self._translate_async(text, model_name, use_rag, use_prompt, labels, prompt_info, profile)
+
+    async def _translate_async(self, text: str, model_name: str, use_rag: int, use_prompt: int, labels: dict,
+                               prompt_info: dict = None, profile: str = "fast") -> tuple[str, str]:
+        started = time.perf_counter()
+        cache_key = self._cache_key(text, model_name, use_rag, use_prompt, profile)
+        if cache_key is not None:
+            cached = self.cache.get(cache_key)
+            if cached is not None:
+                REQUESTS_TOTAL.inc(outcome="cache_hit", **labels)
+                return cached
+
+        prompt_info = prompt_info if prompt_info is not None else {}
+        try:
+            if use_rag > 0 or use_prompt > 0:
+                question_to_ask, memory_translation = await self._run_in_executor(
+                    self._io_executor, self._prompt_or_memory, text, model_name, use_rag, use_prompt, prompt_info
+                )
+            else:
+                question_to_ask, memory_translation = self._prompt_or_memory(text, model_name, 0, 0, prompt_info)
+        except Exception as e:
+            return self._prompt_failed(labels, model_name, text, e)
+        if memory_translation is not None:
+            REQUESTS_TOTAL.inc(outcome="tm_hit", **labels)
+            return question_to_ask, memory_translation
+
+        if model_name not in SEQ2SEQ_MODELS and model_name != "llama":
+            error_msg = f"Error: Model '{model_name}' unknown."
+            logger.error(error_msg)
+            REQUESTS_TOTAL.inc(outcome="error", **labels)
+            return question_to_ask or text, error_msg
 
-        # print(f"Final prompt sent to model:\n------\n{question_to_ask}\n------")
         try:
             if model_name == "llama":
-                response = ollama.chat(model=full_model_name, messages=[
-                {
-                    'role': 'user',
-                    'content': question_to_ask,
-                },
-                ])
-                translation = response['message']['content']
+                translation = await self._generate_llama_async(question_to_ask, self._llama_options(text, profile))
             else:
-                inputs = selected_tokenizer(question_to_ask, return_tensors="pt", truncation=True, max_length=512)
-                generated_ids = None
-                generation_args = {"max_length": 150}
-                if model_name == "nllb" and target_lang_code and not prompt_already_specifies_breton:
-                    forced_token_id = selected_tokenizer.lang_code_to_id.get(target_lang_code)
-                    if forced_token_id:
-                        # print(f"Forcing NLLB target language to: {target_lang_code}")
-                        generation_args["forced_bos_token_id"] = forced_token_id
-                    else:
-                        print(f"Warning: Language code '{target_lang_code}' not found. Using default NLLB generation.")
-                # print(f"Generating translation with args: {generation_args}")
-                generated_ids = selected_model.generate(**inputs, **generation_args)
-                translation = selected_tokenizer.decode(generated_ids[0], skip_special_tokens=True)
-                # print(f"Raw translation received: {translation}")
+                batch_key = self._batch_key(model_name, question_to_ask, profile)
+                if self.workers is None and self.batcher is not None:
+                    # Load the model here rather than on the shared batcher thread (off the event loop).
+                    await self._run_in_executor(self._io_executor, self.get_model, model_name)
+                # Counting the source tokens may wait for the tokenizer to load: off the event loop.
+                item = (question_to_ask, await self._run_in_executor(
+                    self._io_executor, self._generation_budget, model_name, text
+                ))
+                if self.workers is not None or self.batcher is not None:
+                    with span("batched_generate"):
+                        translation = await asyncio.wrap_future(self._submit_seq2seq(batch_key, item))
+                else:
+                    outputs = await self._run_in_executor(
+                        self._inference_executor, self._generate_seq2seq, batch_key, [item]
+                    )
+                    translation = outputs[0]
         except Exception as e:
-            print(f"Error during generation with model {full_model_name}: {e}")
+            logger.error(f"Error during generation with model {self._full_model_name(model_name)}: {e}")
             translation = f"Error during generation: {e}"
 
-        return question_to_ask, translation # use_prompt, use_rag, 
\ No newline at end of file
+        self._record_outcome(labels, started, translation, profile)
+        self._cache_store(cache_key, model_name, question_to_ask, translation, use_rag, use_prompt, prompt_info)
+        return question_to_ask, translation
+
+    def translate_stream(self, text: str, model_name: str, use_rag: int = 0, use_prompt: int = 0,
+                         prompt_info: dict = None, profile: str = None):
+        """
+        Streaming version of translate(): yields (prompt, partial_translation) tuples as
+        tokens are produced (HF generation streamer, or Ollama with stream=True).
+        The last tuple holds the full translation. Token streams bypass the micro-batcher, but
+        their generate() runs on the inference executor, within ASYNC_INFERENCE_WORKERS.
+        The "quality" profile (beam search) cannot stream tokens: it goes through the micro-batcher
+        (or the worker pool) like translate(), and its translation comes in one piece.
+        """
+        if model_name == AUTO_MODEL:
+            # The path is only known once the deadline has been met: no token streaming.
+            yield self.translate_auto(text, use_rag, use_prompt, prompt_info)
+            return
+        profile = check_profile(profile or GENERATION_PROFILE)
+        # A generator may be resumed from different threads: labels are passed explicitly
+        # and request_context() is only held around code that does not yield.
+        started = time.perf_counter()
+        labels = _request_labels(model_name, use_rag, use_prompt)
+        cache_key = self._cache_key(text, model_name, use_rag, use_prompt, profile)
+        if cache_key is not None:
+            cached = self.cache.get(cache_key)
+            if cached is not None:
+                REQUESTS_TOTAL.inc(outcome="cache_hit", **labels)
+                yield cached
+                return
+
+        prompt_info = prompt_info if prompt_info is not None else {}
+        try:
+            question_to_ask, memory_translation = self._prompt_or_memory_with_labels(
+                labels, text, model_name, use_rag, use_prompt, prompt_info
+            )
+        except Exception as e:
+            yield self._prompt_failed(labels, model_name, text, e)
+            return
+        if memory_translation is not None:
+            REQUESTS_TOTAL.inc(outcome="tm_hit", **labels)
+            yield question_to_ask, memory_translation
+            return
+        if model_name not in SEQ2SEQ_MODELS and model_name != "llama":
+            error_msg = f"Error: Model '{model_name}' unknown."
+            logger.error(error_msg)
+            REQUESTS_TOTAL.inc(outcome="error", **labels)
+            yield question_to_ask or text, error_msg
+            return
+
+        translation = ""
+        try:
+            if model_name == "llama":
+                pieces = self._stream_llama(question_to_ask, self._llama_options(text, profile))
+            else:
+                batch_key = self._batch_key(model_name, question_to_ask, profile)
+                item = (question_to_ask, self._generation_budget(model_name, text))
+                if self.workers is not None or (profile != "fast" and self.batcher is not None):
+                    # Worker processes and beam search return whole translations: the request is
+                    # batched with the others and the result arrives as a single piece.
+                    if self.workers is None:
+                        self.get_model(model_name)  # Wait for a model still loading here, not on the batcher thread.
+                    pieces = [self._submit_seq2seq(batch_key, item).result()]
+                else:
+                    pieces = self._stream_seq2seq(batch_key, item)
+            for piece in pieces:
+                translation += piece
+                yield question_to_ask, translation
+        except Exception as e:
+            logger.error(f"Error during generation with model {self._full_model_name(model_name)}: {e}")
+            translation = f"Error during generation: {e}"
+            REQUESTS_TOTAL.inc(outcome="error", **labels)
+            yield question_to_ask, translation
+            return
+
+        translation = translation.strip()
+        self._record_outcome(labels, started, translation, profile)
+        self._cache_store(cache_key, model_name, question_to_ask, translation, use_rag, use_prompt, prompt_info)
+        yield question_to_ask, translation
+
+    async def translate_stream_async(self, text: str, model_name: str, use_rag: int = 0, use_prompt: int = 0,
+                                     prompt_info: dict = None, profile: str = None):
+        """
+        Async streaming version for the Gradio handler: yields (prompt, partial_translation).
+        llama streams through Ollama's AsyncClient. Seq2seq requests follow translate_stream():
+        generation runs on the inference executor (token streams) or the micro-batcher ("quality"
+        profile), and its pieces are awaited on the I/O executor so the event loop stays free.
+        """
+        if model_name == AUTO_MODEL:
+            yield await self.translate_auto_async(text, use_rag, use_prompt, prompt_info)
+            return
+        profile = check_profile(profile or GENERATION_PROFILE)
+        started = time.perf_counter()
+        labels = _request_labels(model_name, use_rag, use_prompt)
+        cache_key = self._cache_key(text, model_name, use_rag, use_prompt, profile)
+        if cache_key is not None:
+            cached = self.cache.get(cache_key)
+            if cached is not None:
+                REQUESTS_TOTAL.inc(outcome="cache_hit", **labels)
+                yield cached
+                return
+
+        loop = asyncio.get_running_loop()
+        if model_name != "llama":
+            # Seq2seq (and unknown models): reuse the sync generator, pulling each item off-loop.
+            stream = self.translate_stream(text, model_name, use_rag, use_prompt, prompt_info, profile)
+            done = object()
+            while True:
+                item = await loop.run_in_executor(self._io_executor, next, stream, done)
+                if item is done:
+                    return
+                yield item
+
+        prompt_info = prompt_info if prompt_info is not None else {}
+        try:
+            question_to_ask, memory_translation = await loop.run_in_executor(
+                self._io_executor, self._prompt_or_memory_with_labels, labels, text, model_name, use_rag, use_prompt,
+                prompt_info,
+            )
+        except Exception as e:
+            yield self._prompt_failed(labels, model_name, text, e)
+            return
+        if memory_translation is not None:
+            REQUESTS_TOTAL.inc(outcome="tm_hit", **labels)
+            yield question_to_ask, memory_translation
+            return
+
+        translation = ""
+        try:
+            with span("ollama", **labels) as ollama_span:
+                stream = await self.ollama_backend.chat_async(question_to_ask, self._llama_options(text, profile), stream=True)
+                async for chunk in stream:
+                    if chunk.get('done'):
+                        ollama_span.set(tokens_in=chunk.get('prompt_eval_count') or 0, tokens_out=chunk.get('eval_count') or 0)
+                    translation += chunk['message']['content']
+                    yield question_to_ask, translation
+        except Exception as e:
+            logger.error(f"Error during generation with model {MODEL_NAME_LLAMA}: {e}")
+            REQUESTS_TOTAL.inc(outcome="error", **labels)
+            yield question_to_ask, f"Error during generation: {e}"
+            return
+
+        translation = translation.strip()
+        self._record_outcome(labels, started, translation, profile)
+        self._cache_store(cache_key, model_name, question_to_ask, translation, use_rag, use_prompt, prompt_info)
+        yield question_to_ask, translation
+
+    async def translate_document_async(self, text: str, model_name: str, use_rag: int = 0, use_prompt: int = 0,
+                                       profile: str = None) -> tuple[str, str]:
+        """Async wrapper around translate_document(), run on the inference executor."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self._inference_executor, self.translate_document, text, model_name, use_rag, use_prompt, profile
+        )
+
+    def translate_batch(self, texts: list[str], model_name: str, use_rag: int = 0, use_prompt: int = 0,
+                        profile: str = None) -> list[tuple[str, str]]:
+        """
+        Translates several texts with the same model and assistance settings.
+        Seq2seq prompts are grouped by generation args and run as padded batches
+        of at most BATCH_MAX_SIZE, each decoding up to the budget of its longest text;
+        llama prompts are sent to Ollama one by one.
+        Cached results and translation-memory matches are reused; only the rest is generated.
+        Returns one (prompt, translation) tuple per input text, in order.
+        With model "auto", each text is routed on its own within the default latency budget.
+        """
+        if model_name == AUTO_MODEL:
+            return [self.translate_auto(text, use_rag, use_prompt) for text in texts]
+        if model_name not in SEQ2SEQ_MODELS and model_name != "llama":
+            error_msg = f"Error: Model '{model_name}' unknown."
+            logger.error(error_msg)
+            return [(self.build_prompt(text, model_name, use_rag, use_prompt), error_msg) for text in texts]
+
+        profile = check_profile(profile or GENERATION_PROFILE)
+        results = [None] * len(texts)
+        cache_keys = [self._cache_key(text, model_name, use_rag, use_prompt, profile) for text in texts]
+        for i, cache_key in enumerate(cache_keys):
+            if cache_key is not None:
+                results[i] = self.cache.get(cache_key)
+        todo = [i for i, result in enumerate(results) if result is None]
+
+        # Translation memory: exact matches first, then near-exact RAG hits once retrieved.
+        memory = {}
+        for i in todo:
+            match = self._memory_match(texts[i], model_name)
+            if match is not None:
+                memory[i] = match
+        todo = [i for i in todo if i not in memory]
+        infos = [{} for _ in todo]
+        info_by_text = dict(zip(todo, infos))
+        prompt_error = None
+        try:
+            prompts = dict(zip(todo, self.build_prompts([texts[i] for i in todo], model_name, use_rag, use_prompt, infos)))
+        except Exception as e:
+            # The token budgets need the model's tokenizer: a model still loading or failing to load fails the texts.
+            logger.error(f"Error during generation with model {self._full_model_name(model_name)}: {e}")
+            prompt_error = f"Error during generation: {e}"
+            prompts = {i: texts[i] for i in todo}
+        for i, info in zip(todo, infos):
+            if info.get("top_hit") is not None:
+                match = self._memory_match(texts[i], model_name, info["top_hit"])
+                if match is not None:
+                    memory[i] = match
+        for i, match in memory.items():
+            results[i] = (_memory_prompt(match), match["breton"])
+        todo = [i for i in todo if i not in memory]
+
+        translations = {}
+        if prompt_error is not None:
+            translations = {i: prompt_error for i in todo}
+        elif model_name == "llama":
+            for i in todo:
+                try:
+                    translations[i] = self._generate_llama(prompts[i], self._llama_options(texts[i], profile))
+                except Exception as e:
+                    logger.error(f"Error during generation with model {MODEL_NAME_LLAMA}: {e}")
+                    translations[i] = f"Error during generation: {e}"
+        else:
+            groups = {}
+            for i in todo:
+                groups.setdefault(self._batch_key(model_name, prompts[i], profile), []).append(i)
+            for batch_key, indices in groups.items():
+                for start in range(0, len(indices), BATCH_MAX_SIZE):
+                    chunk = indices[start:start + BATCH_MAX_SIZE]
+                    try:
+                        items = [(prompts[i], self._generation_budget(model_name, texts[i])) for i in chunk]
+                        if self.workers is not None:
+                            futures = [self.workers.submit(batch_key, item) for item in items]
+                            outputs = [future.result() for future in futures]
+                        else:
+                            outputs = self._generate_seq2seq(batch_key, items)
+                    except Exception as e:
+                        logger.error(f"Error during generation with model {self._full_model_name(model_name)}: {e}")
+                        outputs = [f"Error during generation: {e}"] * len(chunk)
+                    for i, output in zip(chunk, outputs):
+                        translations[i] = output
+
+        for i in todo:
+            results[i] = (prompts[i], translations[i])
+            self._cache_store(cache_keys[i], model_name, prompts[i], translations[i], use_rag, use_prompt, info_by_text[i])
+        return results
+
+    def translate_document(self, text: str, model_name: str, use_rag: int = 0, use_prompt: int = 0,
+                           profile: str = None) -> tuple[str, str]:
+        """
+        Translates a long text sentence by sentence instead of as one truncated sequence.
+        The text is split into sentences (long ones at clause boundaries), the chunks are
+        translated as padded batches (seq2seq) or in parallel (llama), and the output is
+        reassembled in the original order with the original line breaks.
+        Returns the per-chunk prompts joined together and the reassembled translation.
+        """
+        chunks = split_sentences(text, max_chars=DOCUMENT_MAX_CHUNK_CHARS)
+        if len(chunks) <= 1:
+            return self.translate(text, model_name, use_rag=use_rag, use_prompt=use_prompt, profile=profile)
+
+        sentences = [chunk for chunk, _ in chunks]
+        if model_name in ("llama", AUTO_MODEL):
+            # Ollama calls are I/O bound, and "auto" requests each wait on their own deadline: run them concurrently.
+            with ThreadPoolExecutor(max_workers=DOCUMENT_MAX_WORKERS) as executor:
+                results = list(executor.map(
+                    lambda sentence: self.translate(sentence, model_name, use_rag=use_rag, use_prompt=use_prompt,
+                                                    profile=profile),
+                    sentences,
+                ))
+        else:
+            results = self.translate_batch(sentences, model_name, use_rag=use_rag, use_prompt=use_prompt, profile=profile)
+
+        prompts = "\n---\n".join(prompt for prompt, _ in results)
+        translation = "".join(
+            f"{translated.strip()}{separator}" for (_, translated), (_, separator) in zip(results, chunks)
+        )
+        return prompts, translation.rstrip()
@@ -1,85 +1,364 @@
 # src/utils.py
+import logging
 import os
+import threading
 import numpy as np
 import random # Keep for potential future use, though not directly needed for random vector
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
 from sentence_transformers import SentenceTransformer
 from pymilvus import connections, Collection, utility, MilvusException
 
 # Import config values from the config module
 from . import config
+from .batcher import MicroBatcher
+from .fewshot import FewShotSampler
+from .metrics import span
+from .prompting import format_rag_prompt
+from .retrieval import CircuitBreaker, CircuitOpenError, RetrievalClient
+from .segmentation import normalize_text
+from .translation_memory import TranslationMemory
+from .vector_index import LocalCollection
+
+logger = logging.getLogger(__name__)
 
 # --- Global Variables (Initialized by initialize_utils) ---
 RAG_ENCODER = None
 ZILLIZ_COLLECTION = None
 UTILS_INITIALIZED = False
 RAG_ENCODER_DIMENSION = None # Store dimension after loading model
+QUERY_EMBEDDER = None # Cached / coalescing wrapper around RAG_ENCODER
+FEW_SHOT_SAMPLER = None # In-memory pool of example pairs for the few-shot mode
+TRANSLATION_MEMORY = None # Exact / near-exact corpus matches served without generation
+RETRIEVAL_CLIENT = None # Deadlines, hedging, circuit breaker and reconnection around ZILLIZ_COLLECTION searches
+_RETRIEVAL_CLIENT_LOCK = threading.Lock()
+UTILS_READY = threading.Event() # Set when a background initialization has finished (successfully or not)
+UTILS_INIT_THREAD = None # Thread running start_background_initialization(), if any
 
-# --- Initialization Function ---
-def initialize_utils():
+# Query vectors sent per search call by find_similar_examples_batch() (Milvus caps nq per request).
+_MAX_SEARCH_QUERIES = 1024
+
+
+class QueryEmbedder:
     """
-    Connects to Zilliz Cloud and loads the Sentence Transformer model for RAG.
-    Should be called once at application startup AFTER config is loaded.
+    Embedding layer in front of the RAG encoder.
+
+    - Embeddings are cached in an LRU keyed on the normalized text.
+    - Cache misses from concurrent callers are coalesced by a MicroBatcher into a
+      single batched encode() call, and identical in-flight texts are encoded once.
+    - A call with several new texts encodes them directly in one encode() call.
     """
-    global RAG_ENCODER, ZILLIZ_COLLECTION, UTILS_INITIALIZED, RAG_ENCODER_DIMENSION
-    if UTILS_INITIALIZED:
-        print("Utils: Already initialized.")
-        return True
 
-    print("--- Initializing Utilities (Zilliz Connection & RAG Encoder) ---")
+    def __init__(self, encoder, cache_size: int = 4096, max_batch_size: int = 32, max_wait_ms: float = 5.0):
+        self.encoder = encoder
+        self.cache_size = cache_size
+        self._cache = OrderedDict()  # normalized text -> np.ndarray
+        self._inflight = {}  # normalized text -> Future
+        # Reentrant: a done-callback may run in the submitting thread while it holds the lock.
+        self._lock = threading.RLock()
+        self._batcher = MicroBatcher(self._encode_batch, max_batch_size=max_batch_size,
+                                     max_wait_ms=max_wait_ms, name="rag-encoder-batcher")
+        self.hits = 0
+        self.misses = 0
 
-    if not config.check_config(): # check_config needs update to remove file check
-         print("ERROR: Utils initialization failed due to missing configuration.")
-         return False
+    def _encode_batch(self, _key, texts: list[str]):
+        return list(self.encoder.encode(texts, convert_to_numpy=True))
+
+    def _store(self, key: str, future):
+        with self._lock:
+            self._inflight.pop(key, None)
+            if future.exception() is None:
+                self._cache[key] = future.result()
+                self._cache.move_to_end(key)
+                while len(self._cache) > self.cache_size:
+                    self._cache.popitem(last=False)
 
+    def encode(self, texts: list[str]) -> list[np.ndarray]:
+        """Returns one embedding per text, in order."""
+        keys = [normalize_text(text) for text in texts]
+        results = [None] * len(keys)
+        pending = {}
+        new_keys = {}  # key -> Future, for misses nobody is encoding yet
+        with self._lock:
+            for i, key in enumerate(keys):
+                if key in self._cache:
+                    self._cache.move_to_end(key)
+                    results[i] = self._cache[key]
+                    self.hits += 1
+                    continue
+                self.misses += 1
+                future = self._inflight.get(key) or new_keys.get(key)
+                if future is None:
+                    future = new_keys[key] = Future()
+                pending[i] = future
+            if len(new_keys) == 1:
+                # A single text: let the batcher coalesce it with other callers' texts.
+                key, placeholder = new_keys.popitem()
+                future = self._batcher.submit("rag", key)
+                pending = {i: future if f is placeholder else f for i, f in pending.items()}
+                new_keys = {}
+                self._inflight[key] = future
+                future.add_done_callback(lambda f, key=key: self._store(key, f))
+            for key, future in new_keys.items():
+                self._inflight[key] = future
+                future.add_done_callback(lambda f, key=key: self._store(key, f))
+
+        if new_keys:
+            try:
+                vectors = self._encode_batch(None, list(new_keys))
+            except Exception as e:
+                for future in new_keys.values():
+                    future.set_exception(e)
+            else:
+                for future, vector in zip(new_keys.values(), vectors):
+                    future.set_result(vector)
+        for i, future in pending.items():
+            results[i] = future.result()
+        return results
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "cached": len(self._cache)}
+
+
+def encode_queries(texts: list[str]) -> list[np.ndarray]:
+    """Embeds texts with the RAG encoder, through the query embedding cache when available."""
+    if QUERY_EMBEDDER is not None:
+        return QUERY_EMBEDDER.encode(texts)
+    return list(RAG_ENCODER.encode(texts))
+
+# --- Initialization Function ---
+def _load_rag_encoder():
+    global RAG_ENCODER, RAG_ENCODER_DIMENSION, QUERY_EMBEDDER
     try:
-        print(f"Utils: Loading RAG encoder model: {config.MODEL_NAME_RAG_ENCODER}...")
+        logger.info(f"Utils: Loading RAG encoder model: {config.MODEL_NAME_RAG_ENCODER}...")
         RAG_ENCODER = SentenceTransformer(config.MODEL_NAME_RAG_ENCODER, cache_folder=config.TRANSFORMERS_CACHE_PATH)
         # Get and store the model's embedding dimension
         RAG_ENCODER_DIMENSION = RAG_ENCODER.get_sentence_embedding_dimension()
-        print(f"Utils: RAG encoder model loaded (Dimension: {RAG_ENCODER_DIMENSION}).")
+        logger.info(f"Utils: RAG encoder model loaded (Dimension: {RAG_ENCODER_DIMENSION}).")
+        QUERY_EMBEDDER = QueryEmbedder(
+            RAG_ENCODER,
+            cache_size=config.EMBEDDING_CACHE_SIZE,
+            max_batch_size=config.EMBEDDING_BATCH_MAX_SIZE,
+            max_wait_ms=config.EMBEDDING_BATCH_MAX_WAIT_MS,
+        )
     except Exception as e:
-        print(f"ERROR: Failed to load RAG encoder model '{config.MODEL_NAME_RAG_ENCODER}': {e}")
+        logger.error(f"Failed to load RAG encoder model '{config.MODEL_NAME_RAG_ENCODER}': {e}")
         RAG_ENCODER = None
         RAG_ENCODER_DIMENSION = None
+        QUERY_EMBEDDER = None
+
+
+def _open_collection():
+    """Returns the RAG collection (local index or Zilliz), or None if it cannot be opened."""
+    if config.RAG_BACKEND == "local":
+        try:
+            logger.info(f"Utils: Opening local RAG index: {config.LOCAL_INDEX_DIR}")
+            collection = LocalCollection(config.LOCAL_INDEX_DIR, default_nprobe=config.LOCAL_INDEX_NPROBE)
+            logger.info(f"Utils: Local index ready ({collection.num_entities} examples).")
+            return collection
+        except Exception as e:
+            logger.error(f"Failed to open local RAG index '{config.LOCAL_INDEX_DIR}': {e}")
+            return None
 
     try:
         if not connections.has_connection("default"):
-            print(f"Utils: Connecting to Zilliz Cloud: {config.ZILLIZ_URI}")
+            logger.info(f"Utils: Connecting to Zilliz Cloud: {config.ZILLIZ_URI}")
             connections.connect("default", uri=config.ZILLIZ_URI, token=config.ZILLIZ_TOKEN)
-            print("Utils: Connected to Zilliz.")
+            logger.info("Utils: Connected to Zilliz.")
         else:
-             print("Utils: Already have a Zilliz connection.")
+             logger.info("Utils: Already have a Zilliz connection.")
 
         if utility.has_collection(config.RAG_COLLECTION_NAME):
-            print(f"Utils: Accessing Zilliz collection '{config.RAG_COLLECTION_NAME}'...")
+            logger.info(f"Utils: Accessing Zilliz collection '{config.RAG_COLLECTION_NAME}'...")
             collection = Collection(config.RAG_COLLECTION_NAME)
-            ZILLIZ_COLLECTION = collection
-            print(f"Utils: Loading collection '{config.RAG_COLLECTION_NAME}' for search...")
+            logger.info(f"Utils: Loading collection '{config.RAG_COLLECTION_NAME}' for search...")
             # load_state = utility.get_loading_progress(config.RAG_COLLECTION_NAME)
             # if load_state.get('loading_progress', 0) < 100:
             # print("Utils: Collection not fully loaded, attempting load...")
             collection.load()
             utility.wait_for_loading_complete(config.RAG_COLLECTION_NAME, timeout=60)
-            print(f"Utils: Collection '{config.RAG_COLLECTION_NAME}' loading complete.")
+            logger.info(f"Utils: Collection '{config.RAG_COLLECTION_NAME}' loading complete.")
             # else:
             #      print(f"Utils: Collection '{config.RAG_COLLECTION_NAME}' is already loaded.")
-        else:
-            print(f"ERROR: Zilliz collection '{config.RAG_COLLECTION_NAME}' not found.")
-            ZILLIZ_COLLECTION = None
-
+            return collection
+        logger.error(f"Zilliz collection '{config.RAG_COLLECTION_NAME}' not found.")
     except MilvusException as me:
-        print(f"ERROR: Milvus/Zilliz specific error during connection/loading: {me}")
-        ZILLIZ_COLLECTION = None
+        logger.error(f"Milvus/Zilliz specific error during connection/loading: {me}")
     except Exception as e:
-        print(f"ERROR: General error during Zilliz connection/loading: {e}")
-        ZILLIZ_COLLECTION = None
+        logger.error(f"General error during Zilliz connection/loading: {e}")
+    return None
+
+
+def _reconnect_collection():
+    """Opens the collection again on a fresh Zilliz connection (the old one may be broken)."""
+    if config.RAG_BACKEND != "local" and connections.has_connection("default"):
+        try:
+            connections.disconnect("default")
+        except Exception as e:
+            logger.warning(f"Utils: Could not close the previous Zilliz connection: {e}")
+    return _open_collection()
+
+
+def _new_retrieval_client(collection, connect=_reconnect_collection) -> RetrievalClient:
+    return RetrievalClient(
+        connect,
+        collection,
+        timeout=config.RAG_SEARCH_TIMEOUT_SECONDS,
+        hedge_after=config.RAG_SEARCH_HEDGE_AFTER_MS / 1000.0,
+        search_params={"metric_type": "COSINE", "params": {"level": config.RAG_SEARCH_LEVEL}},
+        breaker=CircuitBreaker(config.RAG_BREAKER_FAILURES, config.RAG_BREAKER_RESET_SECONDS),
+        reconnect_interval=config.RAG_RECONNECT_SECONDS,
+        on_connect=_on_collection_connected,
+        max_workers=config.RAG_SEARCH_WORKERS,
+    )
+
+
+def retrieval_client() -> RetrievalClient:
+    """The search client of the RAG collection, created around ZILLIZ_COLLECTION if needed."""
+    global RETRIEVAL_CLIENT
+    with _RETRIEVAL_CLIENT_LOCK:
+        if RETRIEVAL_CLIENT is None:
+            RETRIEVAL_CLIENT = _new_retrieval_client(ZILLIZ_COLLECTION)
+        return RETRIEVAL_CLIENT
+
+
+def _start_corpus_loaders():
+    """Starts the background consumers of the whole corpus (few-shot pool, translation memory)."""
+    global FEW_SHOT_SAMPLER, TRANSLATION_MEMORY
+    if FEW_SHOT_SAMPLER is None and config.FEW_SHOT_POOL_SIZE > 0:
+        logger.info(f"Utils: Loading few-shot example pool ({config.FEW_SHOT_POOL_SIZE} pairs) in the background...")
+        FEW_SHOT_SAMPLER = FewShotSampler(
+            _iter_collection_rows,
+            reservoir_size=config.FEW_SHOT_POOL_SIZE,
+            refresh_seconds=config.FEW_SHOT_REFRESH_SECONDS,
+        ).start()
+
+    if TRANSLATION_MEMORY is None and config.TRANSLATION_MEMORY_ENABLED:
+        logger.info("Utils: Loading the translation memory in the background...")
+        TRANSLATION_MEMORY = TranslationMemory(
+            _iter_collection_rows, threshold=config.TRANSLATION_MEMORY_THRESHOLD
+        ).start()
+
+
+def _on_collection_connected(collection):
+    # Called by the retrieval client once a background reconnection has succeeded.
+    global ZILLIZ_COLLECTION
+    ZILLIZ_COLLECTION = collection
+    _start_corpus_loaders()
+
+
+def initialize_utils():
+    """
+    Connects to Zilliz Cloud (or opens the local index when RAG_BACKEND is "local")
+    and loads the Sentence Transformer model for RAG. Both run concurrently.
+    Should be called once at application startup AFTER config is loaded
+    (see start_background_initialization() to run it without blocking startup).
+    """
+    global ZILLIZ_COLLECTION, UTILS_INITIALIZED, RETRIEVAL_CLIENT
+    if UTILS_INITIALIZED:
+        logger.info("Utils: Already initialized.")
+        return True
+
+    logger.info("--- Initializing Utilities (Zilliz Connection & RAG Encoder) ---")
+
+    if not config.check_config(): # check_config needs update to remove file check
+         logger.error("Utils initialization failed due to missing configuration.")
+         return False
+
+    # The encoder load is CPU bound and the Zilliz connection waits on the network: overlap them.
+    with ThreadPoolExecutor(max_workers=2, thread_name_prefix="utils-init") as executor:
+        encoder_loading = executor.submit(_load_rag_encoder)
+        collection = executor.submit(_open_collection).result()
+        encoder_loading.result()
 
-    print("-" * 30)
+    if isinstance(collection, LocalCollection) and RAG_ENCODER_DIMENSION is not None \
+            and collection.index.dimension != RAG_ENCODER_DIMENSION:
+        logger.error(f"Local index dimension {collection.index.dimension} does not match the RAG encoder ({RAG_ENCODER_DIMENSION}).")
+        collection = None
+    ZILLIZ_COLLECTION = collection
+    with _RETRIEVAL_CLIENT_LOCK:
+        RETRIEVAL_CLIENT = _new_retrieval_client(collection)
+
+    if ZILLIZ_COLLECTION is not None:
+        _start_corpus_loaders()
+    elif RAG_ENCODER is not None and config.RAG_BACKEND != "local":
+        # Keep trying in the background: RAG requests use the no-example prompt meanwhile.
+        logger.warning(f"Utils: RAG collection unavailable, reconnecting every {config.RAG_RECONNECT_SECONDS:g}s in the background.")
+        RETRIEVAL_CLIENT.start_reconnect()
+
+    logger.info("-" * 30)
     UTILS_INITIALIZED = True
     # Initialization considered successful if Zilliz collection and encoder are ready
     return (RAG_ENCODER is not None) and (ZILLIZ_COLLECTION is not None)
 
 
+def start_background_initialization() -> threading.Thread:
+    """Runs initialize_utils() on a background thread; UTILS_READY is set when it finishes."""
+    global UTILS_INIT_THREAD
+
+    def run():
+        try:
+            if not initialize_utils():
+                logger.warning("Utils initialization failed. RAG/Prompt features might be unavailable.")
+        except Exception as e:
+            logger.error(f"Error during utils initialization: {e}")
+        finally:
+            UTILS_READY.set()
+
+    UTILS_INIT_THREAD = threading.Thread(target=run, name="utils-init", daemon=True)
+    UTILS_INIT_THREAD.start()
+    return UTILS_INIT_THREAD
+
+
+def wait_until_initialized(timeout: float = None) -> bool:
+    """Waits for a background initialization in progress. Returns True once utils are initialized."""
+    if not UTILS_INITIALIZED and UTILS_INIT_THREAD is not None:
+        UTILS_READY.wait(timeout)
+    return UTILS_INITIALIZED
+
+
+def readiness() -> dict:
+    """State of the RAG components, for the health endpoints."""
+    return {
+        "initialized": UTILS_INITIALIZED,
+        "rag_encoder": RAG_ENCODER is not None,
+        "collection": ZILLIZ_COLLECTION is not None,
+        "few_shot_pool": FEW_SHOT_SAMPLER is not None and FEW_SHOT_SAMPLER.ready,
+        "translation_memory": TRANSLATION_MEMORY is not None and TRANSLATION_MEMORY.ready,
+        "retrieval": RETRIEVAL_CLIENT.stats() if RETRIEVAL_CLIENT is not None else None,
+    }
+
+
+def _iter_collection_rows():
+    """Streams every {'francais', 'breton'} row of the RAG collection (Zilliz or local)."""
+    collection = ZILLIZ_COLLECTION
+    if isinstance(collection, LocalCollection):
+        yield from collection.index.texts
+        return
+    iterator = collection.query_iterator(batch_size=1000, output_fields=["francais", "breton"])
+    try:
+        while True:
+            rows = iterator.next()
+            if not rows:
+                break
+            yield from rows
+    finally:
+        iterator.close()
+
+
+# --- Translation memory ---
+def translation_memory_lookup(text: str, top_hit: dict = None):
+    """
+    Stored Breton translation of `text` if the corpus holds it (exactly, or as a RAG hit
+    `top_hit` above TRANSLATION_MEMORY_THRESHOLD). Returns the match dict or None.
+    """
+    if TRANSLATION_MEMORY is None:
+        return None
+    with span("translation_memory"):
+        return TRANSLATION_MEMORY.lookup(text, top_hit)
+
+
 # --- RAG Search Function (Similarity) ---
 def find_similar_examples_zilliz(text: str, k: int) -> tuple[str, list[dict]]:
     """
@@ -96,55 +375,100 @@ def find_similar_examples_zilliz(text: str, k: int) -> tuple[str, list[dict]]:
         - A list of the retrieved example dictionaries [{'french':..., 'breton':...}].
     """
     fallback_prompt = "Traduire en breton (RAG indisponible):\n\n" + text
+    wait_until_initialized(config.STARTUP_WAIT_SECONDS)
     if not UTILS_INITIALIZED or ZILLIZ_COLLECTION is None or RAG_ENCODER is None:
-        print("WARN: find_similar_examples_zilliz cannot run: Not initialized, Zilliz disconnected or RAG model not loaded.")
+        logger.warning("find_similar_examples_zilliz cannot run: Not initialized, Zilliz disconnected or RAG model not loaded.")
         return fallback_prompt, []
 
-    print(f"--- RAG Similarity: Finding {k} similar examples for '{text[:50]}...' ---")
+    logger.debug("RAG Similarity: Finding %d similar examples for '%s...'", k, text[:50])
     try:
-        query_embedding = RAG_ENCODER.encode([text])[0]
-        search_params = {"metric_type": "COSINE", "params": {"level": 2}}
-        print(f"Utils: Searching Zilliz collection '{config.RAG_COLLECTION_NAME}' for similar...")
-        results = ZILLIZ_COLLECTION.search(
-            data=[query_embedding.tolist()],
-            anns_field="embedding",
-            param=search_params,
-            limit=k,
-            output_fields=["francais", "breton"]
-        )
-        print(f"Utils: Zilliz similarity search completed.")
+        with span("embedding"):
+            query_embedding = encode_queries([text])[0]
+        with span("vector_search") as search_span:
+            results = retrieval_client().search(
+                data=[query_embedding.tolist()],
+                limit=k,
+                output_fields=["francais", "breton"]
+            )
+            search_span.set(hits=len(results[0]) if results else 0)
+    except CircuitOpenError as e:
+        logger.debug("RAG Similarity: skipped (%s)", e)
+        return fallback_prompt, []
     except (MilvusException, Exception) as e:
-        print(f"ERROR: Error during Zilliz similarity search: {e}")
+        logger.error(f"Error during Zilliz similarity search: {e}")
         return fallback_prompt, []
 
-    similar_examples = []
-    if results and len(results[0]) > 0:
-        print(f"Utils: Found {len(results[0])} similar results.")
-        for hit in results[0]:
-            french_text = hit.entity.get('francais', '[français manquant]') if hit.entity else '[entité manquante]'
-            breton_text = hit.entity.get('breton', '[breton manquant]') if hit.entity else '[entité manquante]'
-            similar_examples.append({'french': french_text, 'breton': breton_text, 'distance': hit.distance})
-    else:
-        print("Utils: No similar examples found in Zilliz.")
+    similar_examples = _hits_to_examples(results[0] if results else [])
+    logger.debug("RAG Similarity: Generated prompt with %d examples.", len(similar_examples))
+    return format_rag_prompt(text, similar_examples), similar_examples
 
-    if not similar_examples:
-        prompt_header = "Traduire en breton (aucun exemple similaire trouvé):\n\n"
-    else:
-        prompt_header = "Traduire en breton en utilisant ces exemples :\n\n"
 
-    example_string = ""
-    for ex in similar_examples:
-        example_string += f"Français : {ex['french']}\n"
-        example_string += f"Breton : {ex['breton']}\n\n"
+def _hits_to_examples(hits) -> list[dict]:
+    examples = []
+    for hit in hits:
+        french_text = hit.entity.get('francais', '[français manquant]') if hit.entity else '[entité manquante]'
+        breton_text = hit.entity.get('breton', '[breton manquant]') if hit.entity else '[entité manquante]'
+        examples.append({'french': french_text, 'breton': breton_text, 'distance': hit.distance})
+    return examples
+
 
-    final_prompt = f"{prompt_header}{example_string}Texte à traduire en breton:\n{text}"
-    print(f"--- RAG Similarity: Generated prompt with {len(similar_examples)} examples. ---")
-    return final_prompt, similar_examples
+def find_similar_examples_batch(texts: list[str], k: int) -> list[tuple[str, list[dict]]]:
+    """
+    Batched version of find_similar_examples_zilliz(): identical queries (after
+    normalization) are deduplicated, the remaining ones are embedded in one encode()
+    call and searched as a single multi-vector search.
+
+    Returns one (prompt, examples) tuple per input text, in order.
+    """
+    if not texts:
+        return []
+    wait_until_initialized(config.STARTUP_WAIT_SECONDS)
+    if not UTILS_INITIALIZED or ZILLIZ_COLLECTION is None or RAG_ENCODER is None:
+        logger.warning("find_similar_examples_batch cannot run: Not initialized, Zilliz disconnected or RAG model not loaded.")
+        return [("Traduire en breton (RAG indisponible):\n\n" + text, []) for text in texts]
+
+    unique_index = {}  # normalized text -> position in `queries`
+    positions = []
+    for text in texts:
+        positions.append(unique_index.setdefault(normalize_text(text), len(unique_index)))
+    queries = list(unique_index)
+    logger.debug("RAG Similarity: Batch of %d texts (%d unique), k=%d", len(texts), len(queries), k)
+
+    try:
+        with span("embedding") as embedding_span:
+            embeddings = encode_queries(queries)
+            embedding_span.set(batch_size=len(queries))
+        hits_per_query = []
+        with span("vector_search") as search_span:
+            for start in range(0, len(embeddings), _MAX_SEARCH_QUERIES):
+                # Hedging would duplicate a whole multi-vector search: only the deadline applies.
+                results = retrieval_client().search(
+                    data=[embedding.tolist() for embedding in embeddings[start:start + _MAX_SEARCH_QUERIES]],
+                    limit=k,
+                    output_fields=["francais", "breton"],
+                    hedge=False,
+                )
+                hits_per_query.extend(_hits_to_examples(hits) for hits in results)
+            search_span.set(batch_size=len(queries), hits=sum(len(examples) for examples in hits_per_query))
+    except CircuitOpenError as e:
+        logger.debug("RAG Similarity: batch skipped (%s)", e)
+        return [("Traduire en breton (RAG indisponible):\n\n" + text, []) for text in texts]
+    except (MilvusException, Exception) as e:
+        logger.error(f"Error during Zilliz batched similarity search: {e}")
+        return [("Traduire en breton (RAG indisponible):\n\n" + text, []) for text in texts]
+
+    return [
+        (format_rag_prompt(text, hits_per_query[position]), [dict(example) for example in hits_per_query[position]])
+        for text, position in zip(texts, positions)
+    ]
 
 # --- Function to get RANDOM examples from Zilliz ---
 def get_random_examples_zilliz(k: int) -> list[dict]:
     """
-    Retrieves k 'random' examples from Zilliz by searching for a random vector.
+    Retrieves k random examples.
+    Served from the in-memory few-shot pool once it is loaded (uniform sampling,
+    optionally stratified by length); until then, falls back to searching Zilliz
+    for a random vector.
 
     Args:
         k: The number of random examples to retrieve.
@@ -153,14 +477,19 @@ def get_random_examples_zilliz(k: int) -> list[dict]:
         A list of example dictionaries [{'french': ..., 'breton': ...}],
         or an empty list if retrieval fails.
     """
+    wait_until_initialized(config.STARTUP_WAIT_SECONDS)
     if not UTILS_INITIALIZED or ZILLIZ_COLLECTION is None or RAG_ENCODER is None or RAG_ENCODER_DIMENSION is None:
-        print("WARN: get_random_examples_zilliz cannot run: Not initialized, Zilliz disconnected or RAG model/dimension not loaded.")
+        logger.warning("get_random_examples_zilliz cannot run: Not initialized, Zilliz disconnected or RAG model/dimension not loaded.")
         return []
 
     if k <= 0:
         return []
 
-    print(f"--- RAG Random: Getting {k} random examples from Zilliz ---")
+    if FEW_SHOT_SAMPLER is not None and FEW_SHOT_SAMPLER.ready:
+        with span("few_shot_sample"):
+            return FEW_SHOT_SAMPLER.sample(k, stratify=config.FEW_SHOT_STRATIFY)
+
+    logger.debug("RAG Random: Getting %d random examples from Zilliz", k)
     try:
         # 1. Generate a random vector
         random_vector = np.random.rand(RAG_ENCODER_DIMENSION).astype(np.float32)
@@ -169,37 +498,32 @@ def get_random_examples_zilliz(k: int) -> list[dict]:
         if norm > 0:
             random_vector /= norm
 
-        # 2. Prepare search parameters
-        search_params = {
-            "metric_type": "COSINE", # Or "L2"
-            "params": {"level": 2}   # Adjust as needed
-        }
-
-        # 3. Perform search with the random vector
-        print(f"Utils: Searching Zilliz collection '{config.RAG_COLLECTION_NAME}' with random vector...")
-        results = ZILLIZ_COLLECTION.search(
-            data=[random_vector.tolist()],
-            anns_field="embedding",
-            param=search_params,
-            limit=k,
-            output_fields=["francais", "breton"]
-        )
-        print(f"Utils: Zilliz random search completed.")
+        # 2. Perform search with the random vector (search params: see _new_retrieval_client)
+        with span("vector_search") as search_span:
+            results = retrieval_client().search(
+                data=[random_vector.tolist()],
+                limit=k,
+                output_fields=["francais", "breton"]
+            )
+            search_span.set(hits=len(results[0]) if results else 0)
 
+    except CircuitOpenError as e:
+        logger.debug("RAG Random: skipped (%s)", e)
+        return []
     except (MilvusException, Exception) as e:
-        print(f"ERROR: Error during Zilliz random search: {e}")
+        logger.error(f"Error during Zilliz random search: {e}")
         return []
 
-    # 4. Extract results
+    # 3. Extract results
     random_examples = []
     if results and len(results[0]) > 0:
-        print(f"Utils: Found {len(results[0])} random results.")
+        logger.debug("Utils: Found %d random results.", len(results[0]))
         for hit in results[0]:
             french_text = hit.entity.get('francais', '[français manquant]') if hit.entity else '[entité manquante]'
             breton_text = hit.entity.get('breton', '[breton manquant]') if hit.entity else '[entité manquante]'
             random_examples.append({'french': french_text, 'breton': breton_text})
             # We don't usually care about the distance for random examples
     else:
-        print("Utils: No random examples found (search returned empty).")
+        logger.debug("Utils: No random examples found (search returned empty).")
 
     return random_examples
\ No newline at end of file
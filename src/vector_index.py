@@ -0,0 +1,285 @@
+# src/vector_index.py
+"""
+Embedded local vector index for the French/Breton examples.
+
+The index lives in a directory:
+- embeddings.npy : float32 matrix (N x dim), L2-normalized, opened memory-mapped
+- texts.jsonl    : one {"francais": ..., "breton": ...} object per row, same order
+- ivf_centroids.npy / ivf_offsets.npy / ivf_ids.npy : optional approximate (IVF) index
+
+LocalCollection exposes the subset of pymilvus' Collection.search() used by utils.py, so it
+can replace the Zilliz collection (RAG_BACKEND = "local" in config.py).
+
+Build a snapshot with:
+    python -m src.vector_index build --from-corpus corpus.tsv --out data/rag_index
+    python -m src.vector_index build --from-zilliz --out data/rag_index --ivf-lists 256
+"""
+import argparse
+import json
+import os
+import sys
+
+import numpy as np
+
+EMBEDDINGS_FILE = "embeddings.npy"
+TEXTS_FILE = "texts.jsonl"
+IVF_CENTROIDS_FILE = "ivf_centroids.npy"
+IVF_OFFSETS_FILE = "ivf_offsets.npy"
+IVF_IDS_FILE = "ivf_ids.npy"
+
+_SEARCH_BLOCK_ROWS = 65536  # Rows scored at once in exact search, bounds temporary memory.
+
+
+def _normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    matrix = np.asarray(matrix, dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+def _top_k(scores: np.ndarray, k: int) -> np.ndarray:
+    """Indices of the k highest scores per row (rows of `scores` are queries), sorted descending."""
+    k = min(k, scores.shape[1])
+    if k <= 0:
+        return np.empty((scores.shape[0], 0), dtype=np.int64)
+    part = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    part_scores = np.take_along_axis(scores, part, axis=1)
+    order = np.argsort(-part_scores, axis=1)
+    return np.take_along_axis(part, order, axis=1)
+
+
+class LocalVectorIndex:
+    """Cosine top-k over a memory-mapped embedding matrix, with an optional IVF index."""
+
+    def __init__(self, index_dir: str, default_nprobe: int = 8):
+        self.index_dir = index_dir
+        self.default_nprobe = default_nprobe
+        self.embeddings = np.load(os.path.join(index_dir, EMBEDDINGS_FILE), mmap_mode="r")
+        with open(os.path.join(index_dir, TEXTS_FILE), encoding="utf-8") as f:
+            self.texts = [json.loads(line) for line in f if line.strip()]
+        if len(self.texts) != self.embeddings.shape[0]:
+            raise ValueError(
+                f"Local index '{index_dir}' is inconsistent: {self.embeddings.shape[0]} vectors "
+                f"but {len(self.texts)} text rows."
+            )
+        self.ivf_centroids = None
+        centroids_path = os.path.join(index_dir, IVF_CENTROIDS_FILE)
+        if os.path.exists(centroids_path):
+            self.ivf_centroids = np.load(centroids_path)
+            self.ivf_offsets = np.load(os.path.join(index_dir, IVF_OFFSETS_FILE))
+            self.ivf_ids = np.load(os.path.join(index_dir, IVF_IDS_FILE), mmap_mode="r")
+
+    @property
+    def dimension(self) -> int:
+        return int(self.embeddings.shape[1])
+
+    def __len__(self):
+        return int(self.embeddings.shape[0])
+
+    def search(self, queries, k: int, nprobe: int = None) -> list[list[tuple[int, float]]]:
+        """
+        Returns, for each query vector, up to k (row id, cosine similarity) pairs, best first.
+        Uses the IVF index when present and nprobe > 0, exact search otherwise.
+        """
+        queries = _normalize_rows(np.atleast_2d(np.asarray(queries, dtype=np.float32)))
+        if len(self) == 0 or k <= 0:
+            return [[] for _ in range(queries.shape[0])]
+        nprobe = self.default_nprobe if nprobe is None else nprobe
+        if self.ivf_centroids is not None and nprobe > 0:
+            return [self._search_ivf(query, k, nprobe) for query in queries]
+        return self._search_exact(queries, k)
+
+    def _search_exact(self, queries: np.ndarray, k: int) -> list[list[tuple[int, float]]]:
+        best_ids = np.empty((queries.shape[0], 0), dtype=np.int64)
+        best_scores = np.empty((queries.shape[0], 0), dtype=np.float32)
+        for start in range(0, len(self), _SEARCH_BLOCK_ROWS):
+            block = np.asarray(self.embeddings[start:start + _SEARCH_BLOCK_ROWS])
+            scores = queries @ block.T  # (n_queries, block_rows)
+            block_top = _top_k(scores, k)
+            candidate_ids = np.concatenate([best_ids, block_top + start], axis=1)
+            candidate_scores = np.concatenate([best_scores, np.take_along_axis(scores, block_top, axis=1)], axis=1)
+            keep = _top_k(candidate_scores, k)
+            best_ids = np.take_along_axis(candidate_ids, keep, axis=1)
+            best_scores = np.take_along_axis(candidate_scores, keep, axis=1)
+        return [
+            [(int(i), float(s)) for i, s in zip(ids, scores)]
+            for ids, scores in zip(best_ids, best_scores)
+        ]
+
+    def _search_ivf(self, query: np.ndarray, k: int, nprobe: int) -> list[tuple[int, float]]:
+        centroid_scores = self.ivf_centroids @ query
+        probe = _top_k(centroid_scores[None, :], min(nprobe, len(centroid_scores)))[0]
+        candidates = np.sort(np.concatenate([
+            np.asarray(self.ivf_ids[self.ivf_offsets[c]:self.ivf_offsets[c + 1]]) for c in probe
+        ]))
+        if candidates.size == 0:
+            return []
+        scores = np.asarray(self.embeddings[candidates]) @ query
+        top = _top_k(scores[None, :], k)[0]
+        return [(int(candidates[i]), float(scores[i])) for i in top]
+
+
+class LocalHit:
+    """Mimics pymilvus' Hit: .id, .distance (cosine similarity) and .entity.get(field)."""
+
+    def __init__(self, hit_id: int, distance: float, entity: dict):
+        self.id = hit_id
+        self.distance = distance
+        self.entity = entity
+
+
+class LocalCollection:
+    """Drop-in for the pymilvus Collection used by utils.py, backed by a LocalVectorIndex."""
+
+    def __init__(self, index_dir: str, default_nprobe: int = 8):
+        self.index = LocalVectorIndex(index_dir, default_nprobe=default_nprobe)
+        self.name = os.path.basename(os.path.normpath(index_dir))
+
+    @property
+    def num_entities(self) -> int:
+        return len(self.index)
+
+    def load(self, *args, **kwargs):
+        pass  # Already memory-mapped.
+
+    def search(self, data, anns_field="embedding", param=None, limit=10, output_fields=None, **kwargs):
+        nprobe = ((param or {}).get("params") or {}).get("nprobe")
+        results = self.index.search(data, k=limit, nprobe=nprobe)
+        output_fields = output_fields or []
+        return [
+            [
+                LocalHit(row_id, score, {field: self.index.texts[row_id].get(field) for field in output_fields})
+                for row_id, score in hits
+            ]
+            for hits in results
+        ]
+
+    def get_rows(self, row_ids) -> list[dict]:
+        return [self.index.texts[int(i)] for i in row_ids]
+
+
+# --- Snapshot building ---
+
+def _kmeans(vectors: np.ndarray, n_lists: int, iterations: int = 10, sample_size: int = 50000, seed: int = 0) -> np.ndarray:
+    """Spherical k-means on a sample of the (normalized) vectors; returns normalized centroids."""
+    rng = np.random.default_rng(seed)
+    n = vectors.shape[0]
+    sample = vectors[rng.choice(n, size=min(n, sample_size), replace=False)]
+    centroids = sample[rng.choice(sample.shape[0], size=n_lists, replace=False)].copy()
+    for _ in range(iterations):
+        assignment = np.argmax(sample @ centroids.T, axis=1)
+        for c in range(n_lists):
+            members = sample[assignment == c]
+            if len(members):
+                centroids[c] = members.sum(axis=0)
+        centroids = _normalize_rows(centroids)
+    return centroids
+
+
+def write_index(out_dir: str, embeddings: np.ndarray, texts: list[dict], ivf_lists: int = 0):
+    """Writes an index directory from normalized-or-not embeddings and their text rows."""
+    if len(texts) != len(embeddings):
+        raise ValueError(f"{len(embeddings)} embeddings but {len(texts)} text rows.")
+    os.makedirs(out_dir, exist_ok=True)
+    embeddings = _normalize_rows(embeddings)
+    np.save(os.path.join(out_dir, EMBEDDINGS_FILE), embeddings)
+    with open(os.path.join(out_dir, TEXTS_FILE), "w", encoding="utf-8") as f:
+        for row in texts:
+            f.write(json.dumps({"francais": row["francais"], "breton": row["breton"]}, ensure_ascii=False) + "\n")
+
+    for stale in (IVF_CENTROIDS_FILE, IVF_OFFSETS_FILE, IVF_IDS_FILE):
+        stale_path = os.path.join(out_dir, stale)
+        if os.path.exists(stale_path):
+            os.remove(stale_path)
+    if ivf_lists and ivf_lists < len(embeddings):
+        print(f"Building IVF index with {ivf_lists} lists...")
+        centroids = _kmeans(embeddings, ivf_lists)
+        assignment = np.concatenate([
+            np.argmax(embeddings[start:start + _SEARCH_BLOCK_ROWS] @ centroids.T, axis=1)
+            for start in range(0, len(embeddings), _SEARCH_BLOCK_ROWS)
+        ])
+        ids = np.argsort(assignment, kind="stable").astype(np.int64)
+        counts = np.bincount(assignment, minlength=ivf_lists)
+        offsets = np.concatenate([[0], np.cumsum(counts)]).astype(np.int64)
+        np.save(os.path.join(out_dir, IVF_CENTROIDS_FILE), centroids)
+        np.save(os.path.join(out_dir, IVF_OFFSETS_FILE), offsets)
+        np.save(os.path.join(out_dir, IVF_IDS_FILE), ids)
+    print(f"Local index written to '{out_dir}' ({len(texts)} rows, dim {embeddings.shape[1]}).")
+
+
+def _read_corpus(path: str, french_col: str, breton_col: str) -> list[dict]:
+    import pandas as pd
+
+    if path.endswith(".jsonl"):
+        frame = pd.read_json(path, lines=True)
+    else:
+        frame = pd.read_csv(path, sep="\t" if path.endswith(".tsv") else ",")
+    frame = frame[[french_col, breton_col]].dropna()
+    return [
+        {"francais": str(fr).strip(), "breton": str(br).strip()}
+        for fr, br in zip(frame[french_col], frame[breton_col])
+        if str(fr).strip() and str(br).strip()
+    ]
+
+
+def build_from_corpus(path: str, out_dir: str, french_col: str = "francais", breton_col: str = "breton",
+                      ivf_lists: int = 0, batch_size: int = 256):
+    """Embeds the French side of a CSV/TSV/JSONL corpus with the RAG encoder and writes an index."""
+    from sentence_transformers import SentenceTransformer
+    from . import config
+
+    texts = _read_corpus(path, french_col, breton_col)
+    print(f"Encoding {len(texts)} French sentences with {config.MODEL_NAME_RAG_ENCODER}...")
+    encoder = SentenceTransformer(config.MODEL_NAME_RAG_ENCODER, cache_folder=config.TRANSFORMERS_CACHE_PATH)
+    embeddings = encoder.encode(
+        [row["francais"] for row in texts], batch_size=batch_size, show_progress_bar=True, convert_to_numpy=True
+    )
+    write_index(out_dir, embeddings, texts, ivf_lists=ivf_lists)
+
+
+def build_from_zilliz(out_dir: str, ivf_lists: int = 0, batch_size: int = 1000):
+    """Exports the vectors and texts of the existing Zilliz collection into a local index."""
+    from pymilvus import connections, Collection
+    from . import config
+
+    if not config.check_config():
+        raise RuntimeError("Zilliz credentials are required to export the collection.")
+    connections.connect("default", uri=config.ZILLIZ_URI, token=config.ZILLIZ_TOKEN)
+    collection = Collection(config.RAG_COLLECTION_NAME)
+    collection.load()
+    iterator = collection.query_iterator(batch_size=batch_size, output_fields=["embedding", "francais", "breton"])
+    embeddings, texts = [], []
+    while True:
+        rows = iterator.next()
+        if not rows:
+            iterator.close()
+            break
+        for row in rows:
+            embeddings.append(row["embedding"])
+            texts.append({"francais": row["francais"], "breton": row["breton"]})
+        print(f"Exported {len(texts)} rows...")
+    write_index(out_dir, np.asarray(embeddings, dtype=np.float32), texts, ivf_lists=ivf_lists)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build the local RAG vector index.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    build = subparsers.add_parser("build", help="Build an index snapshot.")
+    source = build.add_mutually_exclusive_group(required=True)
+    source.add_argument("--from-corpus", metavar="PATH", help="CSV/TSV/JSONL file of French/Breton pairs.")
+    source.add_argument("--from-zilliz", action="store_true", help="Export the configured Zilliz collection.")
+    build.add_argument("--out", required=True, help="Output index directory.")
+    build.add_argument("--french-col", default="francais")
+    build.add_argument("--breton-col", default="breton")
+    build.add_argument("--ivf-lists", type=int, default=0, help="Number of IVF lists (0 = exact search only).")
+    args = parser.parse_args(argv)
+
+    if args.from_zilliz:
+        build_from_zilliz(args.out, ivf_lists=args.ivf_lists)
+    else:
+        build_from_corpus(args.from_corpus, args.out, args.french_col, args.breton_col, ivf_lists=args.ivf_lists)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,28 @@
+import pytest
+
+
+@pytest.fixture
+def translator_module():
+    """src.translator, skipping the test when its dependencies (models, Zilliz, Ollama clients) are missing."""
+    for module in ("dotenv", "httpx", "ollama", "pymilvus", "torch", "transformers", "sentence_transformers"):
+        pytest.importorskip(module)
+    from src import translator
+    return translator
+
+
+@pytest.fixture
+def make_translator(translator_module):
+    """Builds BretonTraducteur instances on an empty registry, without the translation cache."""
+    from src.model_registry import ModelRegistry
+
+    translators = []
+
+    def make():
+        translator = translator_module.BretonTraducteur(registry=ModelRegistry(), cache_enabled=False)
+        translators.append(translator)
+        return translator
+
+    yield make
+    for translator in translators:
+        if translator.batcher is not None:
+            translator.batcher.stop()
@@ -0,0 +1,86 @@
+import threading
+
+import pytest
+
+from src.batcher import MicroBatcher
+
+
+class RecordingBatchFn:
+    """Records each (key, items) batch; blocks the first one until `release` is set."""
+
+    def __init__(self, block_first=False):
+        self.batches = []
+        self.release = threading.Event()
+        self.started = threading.Event()
+        if not block_first:
+            self.release.set()
+
+    def __call__(self, key, items):
+        self.started.set()
+        self.release.wait(timeout=5)
+        self.batches.append((key, list(items)))
+        return [f"{key}:{item}" for item in items]
+
+
+@pytest.fixture
+def make_batcher():
+    batchers = []
+
+    def make(batch_fn, **kwargs):
+        batcher = MicroBatcher(batch_fn, **kwargs)
+        batchers.append(batcher)
+        return batcher
+
+    yield make
+    for batcher in batchers:
+        batcher.stop()
+
+
+def test_groups_items_by_key(make_batcher):
+    batch_fn = RecordingBatchFn(block_first=True)
+    batcher = make_batcher(batch_fn, max_batch_size=8, max_wait_ms=5)
+    blocker = batcher.submit("nllb", "warm")
+    assert batch_fn.started.wait(timeout=5)
+    # Queued while the worker is busy: dispatched as one batch per key.
+    futures = [batcher.submit(key, item) for key, item in [("nllb", "a"), ("helsinki", "b"), ("nllb", "c")]]
+    batch_fn.release.set()
+    assert [future.result(timeout=5) for future in futures] == ["nllb:a", "helsinki:b", "nllb:c"]
+    assert blocker.result(timeout=5) == "nllb:warm"
+    assert batch_fn.batches[1:] == [("nllb", ["a", "c"]), ("helsinki", ["b"])]
+
+
+def test_splits_at_max_batch_size(make_batcher):
+    batch_fn = RecordingBatchFn(block_first=True)
+    batcher = make_batcher(batch_fn, max_batch_size=2, max_wait_ms=5)
+    batcher.submit("nllb", "warm")
+    assert batch_fn.started.wait(timeout=5)
+    futures = [batcher.submit("nllb", item) for item in "abcde"]
+    batch_fn.release.set()
+    assert [future.result(timeout=5) for future in futures] == [f"nllb:{item}" for item in "abcde"]
+    assert [items for _, items in batch_fn.batches[1:]] == [["a", "b"], ["c", "d"], ["e"]]
+
+
+def test_batch_error_fails_every_item(make_batcher):
+    def broken(key, items):
+        raise ValueError("generate failed")
+
+    batcher = make_batcher(broken, max_wait_ms=1)
+    futures = [batcher.submit("nllb", item) for item in "ab"]
+    for future in futures:
+        with pytest.raises(ValueError, match="generate failed"):
+            future.result(timeout=5)
+
+
+def test_wrong_result_count_is_an_error(make_batcher):
+    batcher = make_batcher(lambda key, items: [], max_wait_ms=1)
+    with pytest.raises(RuntimeError, match="0 results for 1 items"):
+        batcher.submit("nllb", "a").result(timeout=5)
+
+
+def test_stop_flushes_queued_items_then_rejects():
+    batcher = MicroBatcher(RecordingBatchFn(), max_wait_ms=10000)
+    future = batcher.submit("nllb", "a")
+    batcher.stop()
+    assert future.result(timeout=0) == "nllb:a"
+    with pytest.raises(RuntimeError, match="stopped"):
+        batcher.submit("nllb", "b")
@@ -0,0 +1,105 @@
+import argparse
+import json
+
+import pytest
+
+pytest.importorskip("pandas")
+
+from src import bulk
+
+
+class FakeTranslator:
+    """translate_batch() stand-in: uppercases the texts, fails the ones containing "boom"."""
+
+    def __init__(self):
+        self.texts = []
+
+    def translate_batch(self, texts, model_name, use_rag=0, use_prompt=0, profile="fast"):
+        self.texts.extend(texts)
+        return [("prompt", "Error: boom" if "boom" in text else text.upper()) for text in texts]
+
+
+def make_args(tmp_path, rows, output="out.jsonl", **overrides):
+    source = tmp_path / "in.jsonl"
+    source.write_text("".join(json.dumps({"francais": text}) + "\n" for text in rows), encoding="utf-8")
+    args = dict(input=str(source), output=str(tmp_path / output), model="helsinki", mode="default", k=5,
+                profile="fast", text_column="francais", id_column=None, chunk_size=2, batch_size=2, workers=1,
+                with_prompt=False, assistance=(0, 0))
+    args.update(overrides)
+    return argparse.Namespace(**args)
+
+
+def test_truncate_partial_line_keeps_complete_lines(tmp_path):
+    path = tmp_path / "out.jsonl"
+    path.write_bytes(b'{"row": 0}\n{"row": 1}\n{"ro')
+    bulk._truncate_partial_line(str(path))
+    assert path.read_bytes() == b'{"row": 0}\n{"row": 1}\n'
+    bulk._truncate_partial_line(str(path))
+    assert path.read_bytes() == b'{"row": 0}\n{"row": 1}\n'
+
+
+def test_truncate_partial_line_without_any_newline(tmp_path):
+    path = tmp_path / "out.jsonl"
+    path.write_bytes(b'{"row": 0')
+    bulk._truncate_partial_line(str(path))
+    assert path.read_bytes() == b""
+
+
+def test_load_done_rows(tmp_path):
+    assert bulk.load_done_rows(str(tmp_path / "missing.jsonl")) == set()
+    jsonl = tmp_path / "out.jsonl"
+    jsonl.write_text('{"row": 0}\n\n{"row": 3}\n{"row": 4, "sou', encoding="utf-8")
+    assert bulk.load_done_rows(str(jsonl)) == {0, 3}
+    csv = tmp_path / "out.csv"
+    csv.write_text("row,source,translation\n2,a,A\n5,b,B\n7,c", encoding="utf-8")
+    assert bulk.load_done_rows(str(csv)) == {2, 5}
+
+
+@pytest.mark.parametrize("output", ["out.jsonl", "out.csv"])
+def test_resume_translates_only_missing_rows(tmp_path, output):
+    rows = ["un", "deux", "boom", "", "cinq"]
+    args = make_args(tmp_path, rows, output=output)
+    first = bulk.translate_corpus(FakeTranslator(), args)
+    assert first == {**first, "rows_read": 5, "translated": 4, "failed": 1, "skipped": 0}
+
+    translator = FakeTranslator()
+    second = bulk.translate_corpus(translator, args)
+    assert translator.texts == ["boom"]
+    assert second == {**second, "translated": 0, "failed": 1, "skipped": 4}
+    assert bulk.load_done_rows(args.output) == {0, 1, 3, 4}
+
+
+def test_resume_refuses_other_settings(tmp_path):
+    bulk.translate_corpus(FakeTranslator(), make_args(tmp_path, ["un"]))
+    with pytest.raises(SystemExit, match="different settings"):
+        bulk.translate_corpus(FakeTranslator(), make_args(tmp_path, ["un"], profile="quality"))
+
+
+def test_checkpoint_counts_progress(tmp_path):
+    checkpoint = bulk.Checkpoint(str(tmp_path / "out.jsonl"), {"model": "nllb"})
+    checkpoint.check_resumable()
+    checkpoint.update(3, 1)
+    checkpoint.update(2, 0)
+    with open(checkpoint.path, encoding="utf-8") as f:
+        state = json.load(f)
+    assert (state["settings"], state["rows_done"], state["rows_failed"]) == ({"model": "nllb"}, 5, 1)
+
+
+class FlakyTranslator(FakeTranslator):
+    """Raises for the batches containing "crash" (e.g. ModelNotReadyError while building prompts)."""
+
+    def translate_batch(self, texts, model_name, use_rag=0, use_prompt=0, profile="fast"):
+        if "crash" in texts:
+            raise TimeoutError("Model 'helsinki' is still loading, please retry shortly.")
+        return super().translate_batch(texts, model_name, use_rag, use_prompt, profile)
+
+
+def test_failed_batch_counts_its_rows_and_the_run_goes_on(tmp_path):
+    args = make_args(tmp_path, ["un", "crash", "trois", "quatre", "cinq"], batch_size=1, workers=2)
+    summary = bulk.translate_corpus(FlakyTranslator(), args)
+    assert summary == {**summary, "rows_read": 5, "translated": 4, "failed": 1}
+    assert bulk.load_done_rows(args.output) == {0, 2, 3, 4}
+
+    translator = FakeTranslator()
+    bulk.translate_corpus(translator, args)
+    assert translator.texts == ["crash"]
@@ -0,0 +1,48 @@
+import pytest
+
+from src import generation
+from src.translation_cache import TranslationCache
+
+
+def test_decode_budget_follows_the_source_and_is_clamped():
+    assert generation.max_new_tokens(20, 1.5) == 40
+    assert generation.max_new_tokens(1, 1.5) == 16
+    assert generation.max_new_tokens(1000, 1.5) == 400
+
+
+def test_profiles():
+    assert generation.check_profile("quality") == "quality"
+    with pytest.raises(ValueError, match="Unknown generation profile"):
+        generation.check_profile("beam")
+    assert generation.hf_generation_args("fast", 40) == {"max_new_tokens": 40, "num_beams": 1, "do_sample": False}
+    assert generation.hf_generation_args("quality", 40, beams=5)["num_beams"] == 5
+    assert generation.ollama_options("fast", 40) == {"num_predict": 40, "temperature": 0}
+    assert generation.ollama_options("quality", 40) == {"num_predict": 40}
+
+
+def test_only_ollama_quality_samples():
+    assert generation.is_deterministic("llama", "fast")
+    assert not generation.is_deterministic("llama", "quality")
+    assert generation.is_deterministic("helsinki", "quality")
+
+
+def make_translator(translator_module):
+    translator = object.__new__(translator_module.BretonTraducteur)
+    translator.cache = TranslationCache("", {name: "v1" for name in translator_module.MODEL_VERSIONS})
+    return translator
+
+
+def test_cache_key_includes_the_profile(translator_module):
+    translator = make_translator(translator_module)
+    fast = translator._cache_key("Bonjour", "helsinki", 0, 0, profile="fast")
+    quality = translator._cache_key("Bonjour", "helsinki", 0, 0, profile="quality")
+    assert None not in (fast, quality) and fast != quality
+    assert translator._cache_key("Bonjour", "helsinki", 3, 0, profile="fast") not in (None, fast)
+
+
+def test_sampled_output_is_not_cached(translator_module):
+    translator = make_translator(translator_module)
+    assert translator._cache_key("Bonjour", "llama", 0, 0, profile="quality") is None
+    assert translator._cache_key("Bonjour", "llama", 3, 0, profile="quality") is None
+    assert translator._cache_key("Bonjour", "llama", 0, 0, profile="fast") is not None
+
@@ -0,0 +1,131 @@
+import threading
+
+import pytest
+
+from src.model_registry import ModelNotReadyError, ModelRegistry, estimate_size_bytes
+
+MB = 1024 * 1024
+
+
+class FakeTensor:
+    def __init__(self, size_bytes, is_quantized=False):
+        self.size_bytes = size_bytes
+        self.is_quantized = is_quantized
+
+    def numel(self):
+        return self.size_bytes
+
+    def element_size(self):
+        return 1
+
+
+class FakeModel:
+    """torch module stand-in: `mb` of parameters, plus optional packed int8 weights."""
+
+    def __init__(self, mb, quantized_mb=0):
+        self.weights = [FakeTensor(mb * MB)]
+        self.packed = {"packed": FakeTensor(quantized_mb * MB, is_quantized=True)} if quantized_mb else {}
+
+    def parameters(self):
+        return iter(self.weights)
+
+    def buffers(self):
+        return iter([])
+
+    def state_dict(self):
+        return self.packed
+
+
+def make_registry(sizes_mb, **budget):
+    registry = ModelRegistry(**budget)
+    loads = []
+    for name, mb in sizes_mb.items():
+        registry.register(name, lambda name=name, mb=mb: loads.append(name) or ("tokenizer", FakeModel(mb)))
+    return registry, loads
+
+
+def test_estimate_counts_parameters_and_quantized_weights():
+    assert estimate_size_bytes(("tokenizer", FakeModel(3, quantized_mb=2))) == 5 * MB
+
+
+def test_loads_once_and_evicts_the_least_recently_used():
+    registry, loads = make_registry({"a": 1, "b": 1, "c": 1}, max_models=2)
+    assert registry.get("a") is registry.get("a")
+    registry.get("b")
+    registry.get("a")  # "b" is now the least recently used.
+    registry.get("c")
+    assert [model["name"] for model in registry.resident()] == ["a", "c"]
+    assert registry.status() == {"a": "loaded", "b": "not_loaded", "c": "loaded"}
+    registry.get("b")
+    assert loads == ["a", "b", "c", "b"]
+
+
+def test_memory_budget_never_evicts_the_requested_model():
+    registry, _ = make_registry({"small": 2, "medium": 3, "big": 8}, max_memory_mb=6)
+    registry.get("small")
+    registry.get("medium")
+    assert registry.total_size_mb() == 5.0
+    registry.get("big")  # Over budget on its own: everything else goes, it stays.
+    assert [model["name"] for model in registry.resident()] == ["big"]
+    assert registry.evict("big") and not registry.evict("big")
+
+
+def test_failed_load_is_reported_and_retried():
+    registry = ModelRegistry()
+    attempts = []
+
+    def flaky():
+        attempts.append(1)
+        if len(attempts) == 1:
+            raise OSError("download failed")
+        return "model"
+
+    registry.register("m", flaky)
+    with pytest.raises(OSError):
+        registry.get("m")
+    assert registry.status() == {"m": "failed"} and registry.errors() == {"m": "download failed"}
+    assert registry.get("m") == "model"
+    assert registry.errors() == {}
+    with pytest.raises(KeyError):
+        registry.get("unknown")
+
+
+def test_waiting_on_a_model_still_loading_times_out():
+    registry = ModelRegistry()
+    started, release = threading.Event(), threading.Event()
+
+    def slow():
+        started.set()
+        release.wait(timeout=5)
+        return "model"
+
+    registry.register("slow", slow)
+    future = registry.preload(["slow", "unregistered"])[0]
+    assert started.wait(timeout=5)
+    assert registry.status() == {"slow": "loading"}
+    with pytest.raises(ModelNotReadyError, match="still loading"):
+        registry.get("slow", timeout=0.05)
+    release.set()
+    assert future.result(timeout=5) is True
+    assert registry.get("slow", timeout=0) == "model"
+
+
+def test_preload_respects_max_models():
+    registry, loads = make_registry({"a": 1, "b": 1, "c": 1}, max_models=2)
+    for future in registry.preload(["a", "b", "c"]):
+        future.result(timeout=5)
+    assert sorted(loads) == ["a", "b"]
+
+
+class FakeOrtModel:
+    """optimum ORTModel stand-in: the weights are the .onnx files of model_save_dir."""
+
+    def __init__(self, model_save_dir):
+        self.model_save_dir = model_save_dir
+
+
+def test_estimate_of_an_onnx_runtime_model_uses_its_files(tmp_path):
+    (tmp_path / "encoder_model.onnx").write_bytes(b"x" * 1000)
+    (tmp_path / "decoder_model.onnx_data").write_bytes(b"x" * 3000)
+    (tmp_path / "config.json").write_text("{}")
+    assert estimate_size_bytes(("tokenizer", FakeOrtModel(tmp_path))) == 4000
@@ -0,0 +1,75 @@
+from src import prompting
+from src.prompting import TokenCounter, build_few_shot_prompt, build_rag_prompt, select_examples
+
+
+def words(text):
+    return len(text.split())
+
+
+def example(french, breton="", distance=None):
+    pair = {"french": french, "breton": breton or french.upper()}
+    if distance is not None:
+        pair["distance"] = distance
+    return pair
+
+
+def test_token_counter_caches_example_counts():
+    calls = []
+    counter = TokenCounter(lambda text: calls.append(text) or words(text), cache_size=2)
+    assert counter.count("a b") == 2
+    assert counter.count("a b") == 2
+    assert calls == ["a b"]
+    counter.count("c")
+    counter.count("d e f")
+    counter.count("a b")  # Evicted by the two texts above.
+    assert calls == ["a b", "c", "d e f", "a b"]
+    assert counter.count_uncached("c") == 1 and calls[-1] == "c"
+
+
+def test_drops_duplicates_and_near_duplicates():
+    examples = [example("Le chat dort."), example("le CHAT dort"), example("Le chat dort bien."), example("Il pleut.")]
+    selected, stats = select_examples(examples, 0)
+    assert [pair["french"] for pair in selected] == ["Le chat dort.", "Le chat dort bien.", "Il pleut."]
+    selected, stats = select_examples(examples, 0, dedup_threshold=0.7)
+    assert [pair["french"] for pair in selected] == ["Le chat dort.", "Il pleut."]
+    assert (stats["dropped_duplicate"], stats["examples_used"], stats["examples_retrieved"]) == (2, 2, 4)
+
+
+def test_min_similarity_only_applies_to_rag_hits():
+    examples = [example("un", distance=0.9), example("deux", distance=0.2), example("trois")]
+    selected, stats = select_examples(examples, 0, min_similarity=0.5)
+    assert [pair["french"] for pair in selected] == ["un", "trois"]
+    assert stats["dropped_low_similarity"] == 1
+
+
+def test_budget_keeps_the_best_examples_that_fit():
+    counter = TokenCounter(words)
+    examples = [
+        example("un deux trois", "unan daou tri"),  # 10 tokens once formatted.
+        example(" ".join(["mot"] * 10), " ".join(["ger"] * 10)),  # 24 tokens: does not fit.
+        example("quatre", "pevar"),  # 6 tokens: a shorter example further down still fits.
+        example("cinq", "pemp"),
+    ]
+    # 10 fixed tokens + 2 special tokens, budget 30.
+    selected, stats = select_examples(examples, 10, counter, token_budget=30)
+    assert [pair["french"] for pair in selected] == ["un deux trois", "quatre"]
+    assert (stats["dropped_budget"], stats["examples_used"]) == (2, 2)
+    selected, _ = select_examples(examples, 10, counter, token_budget=0)
+    assert len(selected) == 4
+
+
+def test_prompts_fit_the_budget_and_end_with_the_source():
+    counter = TokenCounter(words)
+    text = "Le bateau part demain matin."
+    examples = [example(f"phrase numéro {i} assez longue", distance=0.9 - i / 100) for i in range(20)]
+    for build in (build_rag_prompt, build_few_shot_prompt):
+        prompt, info = build(text, examples, counter, token_budget=60)
+        assert prompt.endswith(text)
+        assert 0 < info["examples_used"] < 20
+        assert info["prompt_tokens"] <= info["token_budget"] == 60
+
+
+def test_rag_prompt_without_examples_uses_the_no_example_header():
+    prompt, info = build_rag_prompt("Bonjour", [example("un", distance=0.1)], min_similarity=0.5)
+    assert prompt == prompting.RAG_HEADER_NO_EXAMPLE + prompting.RAG_FOOTER + "Bonjour"
+    assert info["examples_used"] == 0
@@ -0,0 +1,43 @@
+import os
+
+import pytest
+
+pytest.importorskip("torch")
+
+from src import quantization
+
+
+class FakeOrtModel:
+    """ORTModelForSeq2SeqLM stand-in recording exports and loads."""
+
+    calls = []
+
+    def __init__(self, source):
+        self.source = source
+
+    @classmethod
+    def from_pretrained(cls, name_or_path, export=False, **kwargs):
+        cls.calls.append(("export" if export else "load", str(name_or_path)))
+        return cls(name_or_path)
+
+    def save_pretrained(self, path):
+        os.makedirs(path)
+        with open(os.path.join(path, "model.onnx"), "wb") as f:
+            f.write(b"graph")
+
+
+def test_onnx_export_happens_once(tmp_path):
+    FakeOrtModel.calls = []
+    cache_dir = str(tmp_path)
+    first = quantization._load_onnx_model(FakeOrtModel, "org/model", cache_dir, "abc123")
+    second = quantization._load_onnx_model(FakeOrtModel, "org/model", cache_dir, "abc123")
+    export_dir = quantization.onnx_export_dir("org/model", cache_dir, "abc123")
+    assert first.source == second.source == export_dir
+    assert FakeOrtModel.calls == [("export", "org/model"), ("load", export_dir), ("load", export_dir)]
+    assert os.listdir(os.path.dirname(export_dir)) == ["abc123"]
+
+
+def test_chrf():
+    assert quantization.chrf("Demat d'an holl", "Demat d'an holl") == pytest.approx(100)
+    assert quantization.chrf("abc", "xyz") == 0
+    assert 0 < quantization.chrf("Demat d'an holl", "Demat deoc'h") < 100
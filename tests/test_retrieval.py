@@ -0,0 +1,127 @@
+import threading
+import time
+
+import pytest
+
+from src import retrieval
+from src.retrieval import CircuitBreaker, CircuitOpenError, RetrievalClient
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self):
+        return self.now
+
+
+class FakeCollection:
+    """collection.search() stand-in: sleeps `delays` in turn (the last one repeats), or raises `error`."""
+
+    def __init__(self, delays=(0.0,), error=None):
+        self.delays = list(delays)
+        self.error = error
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def search(self, data, anns_field, param, limit, output_fields, timeout):
+        with self._lock:
+            delay = self.delays[min(self.calls, len(self.delays) - 1)]
+            self.calls += 1
+        time.sleep(delay)
+        if self.error is not None:
+            raise self.error
+        return [["hit"] * limit]
+
+
+@pytest.fixture
+def make_client():
+    clients = []
+
+    def make(collection, connect=lambda: None, **kwargs):
+        client = RetrievalClient(connect, collection, **kwargs)
+        clients.append(client)
+        return client
+
+    yield make
+    for client in clients:
+        client.stop()
+
+
+def test_breaker_opens_after_threshold_and_probes_once(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(retrieval.time, "monotonic", clock.monotonic)
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=30)
+    assert not breaker.record_failure()
+    assert breaker.state == CircuitBreaker.CLOSED and breaker.allow()
+    assert breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN and not breaker.allow()
+
+    clock.now += 30
+    assert breaker.allow()
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    assert not breaker.allow()  # One probe at a time.
+
+    assert breaker.record_failure()  # A failed probe reopens the circuit for another reset_timeout.
+    assert not breaker.allow()
+    clock.now += 30
+    assert breaker.allow()
+    breaker.record_success()
+    assert breaker.state == CircuitBreaker.CLOSED and breaker.allow()
+
+
+def test_success_resets_the_failure_count():
+    breaker = CircuitBreaker(failure_threshold=2)
+    breaker.record_failure()
+    breaker.record_success()
+    assert not breaker.record_failure()
+    assert breaker.state == CircuitBreaker.CLOSED
+
+
+def test_search_times_out_at_the_deadline(make_client):
+    client = make_client(FakeCollection(delays=[0.5]), timeout=0.05)
+    started = time.monotonic()
+    with pytest.raises(TimeoutError):
+        client.search([[0.0]], limit=2)
+    assert time.monotonic() - started < 0.4
+    assert client.stats()["timeouts"] == 1
+
+
+def test_hedged_request_wins_over_a_slow_first_call(make_client):
+    collection = FakeCollection(delays=[1.0, 0.0])
+    client = make_client(collection, timeout=0.5, hedge_after=0.02)
+    assert client.search([[0.0]], limit=2) == [["hit", "hit"]]
+    assert collection.calls == 2
+    stats = client.stats()
+    assert (stats["hedges"], stats["hedge_wins"]) == (1, 1)
+
+
+def test_errors_open_the_circuit_and_fail_fast(make_client):
+    collection = FakeCollection(error=ConnectionError("broken"))
+    client = make_client(collection, breaker=CircuitBreaker(failure_threshold=2, reset_timeout=60),
+                         reconnect_interval=60)
+    for _ in range(2):
+        with pytest.raises(ConnectionError):
+            client.search([[0.0]], limit=1, hedge=False)
+    with pytest.raises(CircuitOpenError):
+        client.search([[0.0]], limit=1)
+    assert collection.calls == 2
+    stats = client.stats()
+    assert (stats["errors"], stats["rejected"], stats["circuit"]) == (2, 1, CircuitBreaker.OPEN)
+
+
+def test_reconnects_in_the_background_without_a_collection(make_client):
+    collection = FakeCollection()
+    attempts = []
+    connected = threading.Event()
+
+    def connect():
+        attempts.append(1)
+        return collection if len(attempts) >= 2 else None
+
+    client = make_client(None, connect=connect, reconnect_interval=0.01, on_connect=lambda c: connected.set())
+    with pytest.raises(CircuitOpenError):
+        client.search([[0.0]], limit=1)
+    assert connected.wait(timeout=5)
+    assert client.search([[0.0]], limit=1) == [["hit"]]
+    assert client.stats()["reconnects"] == 1
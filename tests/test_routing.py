@@ -0,0 +1,123 @@
+import asyncio
+import time
+
+import pytest
+
+from src import routing
+from src.routing import AutoRouter, LatencyTracker
+
+PRIMARY, SECOND, FALLBACK = ("llama", "rag"), ("nllb", "few-shot"), ("nllb finetuned", "default")
+
+
+def make_router(**kwargs):
+    return AutoRouter([PRIMARY, SECOND, FALLBACK], FALLBACK, **kwargs)
+
+
+def test_parse_routes():
+    assert routing.parse_routes("llama:rag, nllb finetuned:default,") == [PRIMARY, FALLBACK]
+    with pytest.raises(ValueError, match="Invalid route"):
+        routing.parse_routes("llama:fast")
+
+
+def test_tracker_lower_bound_raises_the_average():
+    tracker = LatencyTracker(alpha=0.5)
+    tracker.observe(PRIMARY, 1.0)
+    tracker.observe(PRIMARY, 3.0)
+    assert tracker.estimate(PRIMARY) == 2.0
+    tracker.observe(PRIMARY, 5.0, lower_bound=True)
+    assert tracker.estimate(PRIMARY) == 5.0
+
+
+def test_choose_takes_the_first_path_that_fits():
+    router = make_router(default_reserve=0.5)
+    assert router.choose(2.0) == (PRIMARY, 1.5)  # Unmeasured paths are assumed to fit.
+    router.tracker.observe(PRIMARY, 1.6)
+    assert router.choose(2.0) == (SECOND, 1.5)
+    assert router.choose(2.0, available=lambda model_name: model_name != "nllb") == (FALLBACK, 2.0)
+
+
+def test_choose_reserves_time_for_the_fallback():
+    router = make_router(fallback_margin=2.0)
+    router.tracker.observe(FALLBACK, 0.4)
+    assert router.choose(1.0) == (PRIMARY, pytest.approx(0.2))
+    assert router.choose(0.5) == (FALLBACK, 0.5)
+
+
+def test_stale_averages_are_explored_again(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(routing.time, "monotonic", lambda: now[0])
+    router = make_router(explore_after=60)
+    router.tracker.observe(PRIMARY, 10.0)
+    assert router.choose(2.0)[0] == SECOND
+    now[0] += 61
+    assert router.choose(2.0)[0] == PRIMARY
+
+
+@pytest.fixture
+def auto_translator(translator_module, make_translator, monkeypatch):
+    """
+    A translator whose translate() / translate_async() are fakes: `behaviour[model]` is "ok",
+    "slow" (runs until cancelled), "error" (returns an Error result) or "raise".
+    """
+    translator = make_translator()
+    translator.router = make_router(default_reserve=0.2)
+    behaviour = {}
+
+    def fake(model_name, text):
+        kind = behaviour.get(model_name, "ok")
+        if kind == "raise":
+            raise RuntimeError("Ollama connection refused")
+        if kind == "error":
+            return text, "Error during generation: boom"
+        if kind == "slow":
+            cancellation = routing.current_cancellation()
+            while not cancellation.cancelled:
+                time.sleep(0.01)
+        return text, f"{model_name}: {text}"
+
+    def translate(text, model_name, use_rag=0, use_prompt=0, prompt_info=None, latency_budget=None, profile=None):
+        return fake(model_name, text)
+
+    async def translate_async(text, model_name, use_rag=0, use_prompt=0, prompt_info=None, latency_budget=None,
+                              profile=None):
+        if behaviour.get(model_name) == "slow":
+            await asyncio.sleep(10)
+        return fake(model_name, text)
+
+    monkeypatch.setattr(translator, "translate", translate)
+    monkeypatch.setattr(translator, "translate_async", translate_async)
+    translator.behaviour = behaviour
+    return translator
+
+
+def auto(translator, run_async):
+    info = {}
+    if run_async:
+        result = asyncio.run(translator.translate_auto_async("Bonjour", prompt_info=info, latency_budget=0.5))
+    else:
+        result = translator.translate_auto("Bonjour", prompt_info=info, latency_budget=0.5)
+    return result, info["route"]
+
+
+@pytest.mark.parametrize("run_async", [False, True])
+def test_primary_path_serves_when_it_answers(auto_translator, run_async):
+    result, route = auto(auto_translator, run_async)
+    assert result == ("Bonjour", "llama: Bonjour")
+    assert (route["model"], route["fallback"]) == ("llama", False)
+
+
+@pytest.mark.parametrize("run_async", [False, True])
+@pytest.mark.parametrize("kind, reason", [("slow", "deadline"), ("raise", "error"), ("error", "error")])
+def test_late_or_failed_primary_falls_back(auto_translator, run_async, kind, reason):
+    auto_translator.behaviour["llama"] = kind
+    started = time.perf_counter()
+    result, route = auto(auto_translator, run_async)
+    assert time.perf_counter() - started < 2
+    assert result == ("Bonjour", "nllb finetuned: Bonjour")
+    assert (route["planned"], route["model"], route["reason"], route["fallback"]) == (
+        "llama:rag", "nllb finetuned", reason, True)
+    # The failure is recorded as a lower bound of the path's latency.
+    estimate = auto_translator.router.tracker.estimate(PRIMARY)
+    assert estimate is not None
+    if reason == "deadline":
+        assert estimate >= 0.3
@@ -0,0 +1,56 @@
+import pytest
+
+from src.segmentation import normalize_text, split_sentences
+
+
+def sentences(text, max_chars=0):
+    return [chunk for chunk, _ in split_sentences(text, max_chars)]
+
+
+def reassemble(chunks):
+    return "".join(chunk + separator for chunk, separator in chunks)
+
+
+def test_splits_on_sentence_ends():
+    assert sentences("Il pleut. Viens-tu ? Oui ! « Bien sûr. » (Vraiment.) Fin…") == [
+        "Il pleut.", "Viens-tu ?", "Oui !", "« Bien sûr. »", "(Vraiment.)", "Fin…",
+    ]
+
+
+@pytest.mark.parametrize("text", [
+    "M. Dupont est arrivé. Il est parti.",
+    "Voir le chap. 3 et la p. 12. Ensuite on continue, etc. et puis voilà.",
+    "J. Dupont et Mme. Martin sont là. Bonjour.",
+])
+def test_abbreviations_and_initials_do_not_end_a_sentence(text):
+    assert len(sentences(text)) == 2
+
+
+def test_keeps_line_breaks_and_reassembles_the_input():
+    text = "  Premier paragraphe. Deuxième phrase.\n\nSecond paragraphe.\nDernière ligne"
+    chunks = split_sentences(text)
+    assert chunks == [
+        ("Premier paragraphe.", " "), ("Deuxième phrase.", "\n\n"), ("Second paragraphe.", "\n"),
+        ("Dernière ligne", ""),
+    ]
+    assert reassemble(chunks) == text.lstrip()
+
+
+def test_long_sentences_are_cut_at_clause_boundaries():
+    sentence = "Le conseil a voté le budget, puis il a examiné les subventions; la séance a ensuite été levée."
+    chunks = split_sentences(sentence + "\nFin.", max_chars=40)
+    assert [chunk for chunk, _ in chunks] == [
+        "Le conseil a voté le budget,", "puis il a examiné les subventions;", "la séance a ensuite été levée.", "Fin.",
+    ]
+    assert all(len(chunk) <= 40 for chunk, _ in chunks)
+    assert chunks[2][1] == "\n"  # The last piece keeps the separator of the whole sentence.
+    assert reassemble(chunks) == sentence + "\nFin."
+
+
+def test_empty_text():
+    assert split_sentences("  \n ") == []
+
+
+def test_normalize_text():
+    assert normalize_text("L’eau  est\n froide") == "L'eau est froide"
+    assert normalize_text("ÉTÉ", casefold=True) == "été"
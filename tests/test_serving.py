@@ -0,0 +1,89 @@
+import os
+import sys
+import time
+import types
+
+import pytest
+
+from src import serving
+from src.model_registry import ModelNotReadyError, ModelRegistry
+
+
+def fake_worker_main(index, cores, threads, shared_models, inbox, outbox):
+    """Stands in for _worker_main: replies with the worker index and the shared model names."""
+    while True:
+        message = inbox.get()
+        if message is None:
+            return
+        request_id, key, item = message
+        if item == "die":
+            os._exit(3)
+        if item == "slow":
+            time.sleep(0.5)
+        outbox.put((request_id, True, (index, sorted(shared_models))))
+
+
+@pytest.fixture
+def pool_factory(monkeypatch):
+    fake_torch = types.ModuleType("torch")
+    fake_torch.get_num_threads = lambda: 4
+    fake_torch.set_num_threads = lambda n: None
+    monkeypatch.setitem(sys.modules, "torch", fake_torch)
+    monkeypatch.setattr(serving, "_worker_main", fake_worker_main)
+    pools = []
+
+    def make(num_workers=2, loaders=None):
+        loaders = loaders or {"helsinki": lambda: "weights"}
+        registry = ModelRegistry()
+        for name, loader in loaders.items():
+            registry.register(name, loader)
+        pool = serving.WorkerPool(registry, num_workers, list(loaders))
+        pools.append(pool)
+        return pool
+
+    yield make
+    for pool in pools:
+        if pool.ready:
+            pool.stop()
+
+
+def test_submit_before_start_fails_fast(pool_factory):
+    pool = pool_factory()
+    with pytest.raises(ModelNotReadyError):
+        pool.submit("key", "text")
+
+
+def test_shares_loaded_models_and_reports_preload_failures(pool_factory):
+    def broken():
+        raise OSError("no weights")
+
+    pool = pool_factory(loaders={"helsinki": lambda: "weights", "nllb": broken}).start()
+    assert list(pool.preload_failures) == ["nllb"]
+    assert pool.submit("key", "text").result(timeout=5) == (0, ["helsinki"])
+
+
+def test_routes_to_least_loaded_worker(pool_factory):
+    pool = pool_factory().start()
+    busy = pool.submit("key", "slow")
+    assert pool.submit("key", "text").result(timeout=5)[0] == 1
+    assert busy.result(timeout=5)[0] == 0
+    assert pool.pending() == 0
+
+
+def test_dead_worker_fails_its_requests_and_is_skipped(pool_factory):
+    pool = pool_factory().start()
+    with pytest.raises(RuntimeError, match="died"):
+        pool.submit("key", "die").result(timeout=5)
+    assert [worker["alive"] for worker in pool.status()] == [False, True]
+    assert [pool.submit("key", "text").result(timeout=5)[0] for _ in range(3)] == [1, 1, 1]
+
+
+def test_dead_worker_is_detected_under_steady_traffic(pool_factory):
+    pool = pool_factory().start()
+    dying = pool.submit("key", "die")
+    # The reply queue is never idle for long here: the collector must still notice the death.
+    deadline = time.monotonic() + 5
+    while not dying.done() and time.monotonic() < deadline:
+        assert pool.submit("key", "text").result(timeout=5)[0] == 1
+    with pytest.raises(RuntimeError, match="died"):
+        dying.result(timeout=0)
@@ -0,0 +1,75 @@
+import pytest
+
+from src.translation_cache import TranslationCache
+
+
+def test_key_depends_on_model_version_mode_and_k():
+    cache = TranslationCache("", {"nllb": "v1"})
+    key = cache.make_key("Bonjour  le monde", "nllb", "default/fast", 0)
+    assert key == cache.make_key("Bonjour le monde", "nllb", "default/fast", 0)
+    assert key != cache.make_key("Bonjour le monde", "nllb", "default/quality", 0)
+    assert key != cache.make_key("Bonjour le monde", "nllb", "rag/fast", 0)
+    assert key != TranslationCache("", {"nllb": "v2"}).make_key("Bonjour le monde", "nllb", "default/fast", 0)
+
+
+def test_memory_tier_is_an_lru():
+    cache = TranslationCache("", {}, max_memory_entries=2)
+    for key in "abc":
+        cache.set(key, "nllb", "prompt", key.upper())
+    assert cache.get("a") is None
+    assert cache.get("c") == ("prompt", "C")
+
+
+def test_disk_tier_survives_a_restart_and_drops_outdated_versions(tmp_path):
+    path = str(tmp_path / "cache.sqlite")
+    cache = TranslationCache(path, {"nllb": "v1", "helsinki": "v1"})
+    cache.set("k1", "nllb", "prompt", "Demat")
+    cache.set("k2", "helsinki", "prompt", "Salud")
+
+    reopened = TranslationCache(path, {"nllb": "v1", "helsinki": "v2"})
+    assert reopened.get("k1") == ("prompt", "Demat")
+    assert reopened.get("k2") is None
+    assert reopened.stats()["hits_disk"] == 1
+
+
+class FakeCache:
+    def __init__(self):
+        self.entries = {}
+
+    def set(self, key, model_name, prompt, translation):
+        self.entries[key] = translation
+
+
+@pytest.mark.parametrize("use_rag, use_prompt, prompt_info, cached", [
+    (0, 0, None, True),
+    (3, 0, {"examples_used": 3}, True),
+    (0, 3, {"examples_used": 2}, True),
+    (0, 3, None, False),
+])
+def test_cache_store_needs_examples_for_rag_and_few_shot(translator_module, use_rag, use_prompt, prompt_info, cached):
+    translator = object.__new__(translator_module.BretonTraducteur)
+    translator.cache = FakeCache()
+    translator._cache_store("key", "nllb", "prompt", "Demat", use_rag=use_rag, use_prompt=use_prompt,
+                            prompt_info=prompt_info)
+    assert ("key" in translator.cache.entries) == cached
+
+
+@pytest.mark.parametrize("use_rag, use_prompt", [(3, 0), (0, 3)])
+def test_fallback_prompt_results_are_not_cached(translator_module, make_translator, monkeypatch, use_rag, use_prompt):
+    # What utils returns when the search fails or the circuit is open: the no-example prompt, no examples.
+    monkeypatch.setattr(translator_module, "find_similar_examples_zilliz",
+                        lambda text, k: ("Traduire en breton (aucun exemple similaire trouvé):\n\n" + text, []))
+    monkeypatch.setattr(translator_module, "get_random_examples_zilliz", lambda k: [])
+    translator = make_translator()
+    translator.cache = FakeCache()
+    prompt_info = {}
+    prompt = translator.build_prompt("Bonjour", "nllb", use_rag, use_prompt, prompt_info)
+    translator._cache_store("key", "nllb", prompt, "Demat", use_rag, use_prompt, prompt_info)
+    assert translator.cache.entries == {}
+
+
+def test_errors_are_not_cached(translator_module):
+    translator = object.__new__(translator_module.BretonTraducteur)
+    translator.cache = FakeCache()
+    translator._cache_store("key", "nllb", "prompt", "Error: model unavailable")
+    assert translator.cache.entries == {}
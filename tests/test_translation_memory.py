@@ -0,0 +1,52 @@
+import time
+
+from src.translation_memory import TranslationMemory
+
+ROWS = [
+    {"francais": "Bonjour  tout le monde.", "breton": "Demat d'an holl."},
+    {"francais": "bonjour tout le monde.", "breton": "Ur c'heñver all."},  # Same normalized text: ignored.
+    {"francais": "Merci.", "breton": ""},
+    {"francais": "La séance est ouverte à 10 h.", "breton": "Digor eo an dalc'h da 10 e."},
+]
+
+
+def make_memory(threshold=0.97):
+    memory = TranslationMemory(lambda: iter(ROWS), threshold=threshold)
+    memory.load()
+    return memory
+
+
+def test_exact_match_ignores_case_and_spacing():
+    memory = make_memory()
+    assert memory.ready
+    match = memory.lookup("BONJOUR tout le   monde.")
+    assert match == {"kind": "exact", "french": "BONJOUR tout le   monde.", "breton": "Demat d'an holl.", "similarity": 1.0}
+    assert memory.lookup("Merci.") is None  # Rows without a translation are not indexed.
+    assert memory.stats() == {"entries": 2, "hits_exact": 1, "hits_similar": 0}
+
+
+def test_near_exact_rag_hit_needs_the_threshold_and_the_same_numbers():
+    memory = make_memory()
+    hit = {"french": "La séance est ouverte à 10 h", "breton": "Digor eo an dalc'h da 10 e.", "distance": 0.98}
+    match = memory.lookup("La séance est ouverte à 10h.", hit)
+    assert (match["kind"], match["breton"], match["similarity"]) == ("similar", hit["breton"], 0.98)
+    assert memory.lookup("La séance est ouverte à 11 h.", hit) is None
+    assert memory.lookup("La séance est ouverte à 10h.", dict(hit, distance=0.9)) is None
+    assert memory.lookup("La séance est ouverte à 10h.", dict(hit, distance=None)) is None
+    assert memory.stats()["hits_similar"] == 1
+
+
+def test_rag_hit_with_the_same_text_is_exact_even_below_the_threshold():
+    memory = make_memory()
+    hit = {"french": "Il pleut.", "breton": "Glav a ra.", "distance": 0.5}
+    assert memory.lookup("il pleut.", hit)["kind"] == "exact"
+
+
+def test_background_load_and_add():
+    memory = TranslationMemory(lambda: iter(ROWS)).start()
+    deadline = time.monotonic() + 5
+    while not memory.ready and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert memory.ready
+    memory.add("Au revoir.", "Kenavo.")
+    assert memory.lookup("au revoir.")["breton"] == "Kenavo."
@@ -0,0 +1,76 @@
+import asyncio
+from concurrent.futures import Future
+
+import pytest
+
+from src.model_registry import ModelNotReadyError
+
+
+@pytest.fixture
+def not_ready_translator(translator_module, make_translator, monkeypatch):
+    """A translator whose seq2seq models are still loading, with few-shot examples available."""
+    monkeypatch.setattr(translator_module, "get_random_examples_zilliz",
+                        lambda k: [{"french": "Bonjour", "breton": "Demat"}] * k)
+    translator = make_translator()
+
+    def get_model(model_name):
+        raise ModelNotReadyError(f"Model '{model_name}' is still loading, please retry shortly.")
+
+    translator.get_model = get_model
+    return translator
+
+
+def assert_error(result):
+    prompt, translation = result
+    assert translation.startswith("Error during generation") and "still loading" in translation
+
+
+def test_translate_returns_an_error_when_the_prompt_needs_a_loading_model(not_ready_translator):
+    assert_error(not_ready_translator.translate("Bonjour", "helsinki", use_prompt=2, profile="fast"))
+    assert_error(asyncio.run(not_ready_translator.translate_async("Bonjour", "helsinki", use_prompt=2, profile="fast")))
+
+
+def test_streams_end_with_an_error(not_ready_translator):
+    assert_error(list(not_ready_translator.translate_stream("Bonjour", "helsinki", use_prompt=2, profile="fast"))[-1])
+
+    async def collect():
+        return [item async for item in not_ready_translator.translate_stream_async(
+            "Bonjour", "helsinki", use_prompt=2, profile="fast")]
+
+    assert_error(asyncio.run(collect())[-1])
+
+
+def test_translate_batch_returns_one_error_per_text(not_ready_translator):
+    results = not_ready_translator.translate_batch(["Bonjour", "Merci"], "helsinki", use_prompt=2, profile="fast")
+    assert [prompt for prompt, _ in results] == ["Bonjour", "Merci"]
+    for result in results:
+        assert_error(result)
+
+
+def test_quality_streams_go_through_the_micro_batcher(make_translator):
+    translator = make_translator()
+    if translator.batcher is None:
+        pytest.skip("BATCHING_ENABLED is off.")
+    submitted = []
+
+    def submit(batch_key, item):
+        submitted.append(batch_key)
+        future = Future()
+        future.set_result("Demat")
+        return future
+
+    def stream(batch_key, item):
+        raise AssertionError("Beam search cannot stream: it must not bypass the micro-batcher.")
+
+    translator._submit_seq2seq = submit
+    translator._stream_seq2seq = stream
+    translator.get_model = lambda model_name: None
+    translator._generation_budget = lambda model_name, text: 16
+
+    assert list(translator.translate_stream("Bonjour", "helsinki", profile="quality"))[-1][1] == "Demat"
+
+    async def collect():
+        return [item async for item in translator.translate_stream_async("Bonjour", "helsinki", profile="quality")]
+
+    assert asyncio.run(collect())[-1][1] == "Demat"
+    assert submitted == [("helsinki", False, "quality")] * 2
@@ -0,0 +1,91 @@
+import numpy as np
+import pytest
+
+from src import vector_index
+from src.vector_index import LocalCollection, LocalVectorIndex
+
+TEXTS = [{"francais": f"phrase {i}", "breton": f"frazenn {i}"} for i in range(200)]
+
+
+@pytest.fixture
+def vectors():
+    return np.random.default_rng(0).normal(size=(len(TEXTS), 16)).astype(np.float32)
+
+
+def build(tmp_path, vectors, ivf_lists=0):
+    out_dir = str(tmp_path / "index")
+    vector_index.write_index(out_dir, vectors, TEXTS, ivf_lists=ivf_lists)
+    return out_dir
+
+
+def test_exact_search_returns_the_nearest_rows_best_first(tmp_path, vectors):
+    index = LocalVectorIndex(build(tmp_path, vectors))
+    assert (len(index), index.dimension) == (200, 16)
+    queries = vectors[[3, 42]] * 2.5  # Norms do not matter: cosine similarity.
+    results = index.search(queries, k=5)
+    assert [hits[0][0] for hits in results] == [3, 42]
+    assert results[0][0][1] == pytest.approx(1.0, abs=1e-5)
+    scores = [score for _, score in results[1]]
+    assert scores == sorted(scores, reverse=True)
+    normalized = vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+    expected = np.argsort(-(normalized @ normalized[42]))[:5]
+    assert [row for row, _ in results[1]] == list(expected)
+
+
+def test_exact_search_across_blocks(tmp_path, vectors, monkeypatch):
+    monkeypatch.setattr(vector_index, "_SEARCH_BLOCK_ROWS", 7)
+    index = LocalVectorIndex(build(tmp_path, vectors))
+    assert [row for row, _ in index.search(vectors[150], k=3)[0]][0] == 150
+    assert index.search(vectors[0], k=0) == [[]]
+
+
+def test_ivf_search_finds_the_query_row(tmp_path, vectors):
+    index = LocalVectorIndex(build(tmp_path, vectors, ivf_lists=8))
+    assert index.ivf_centroids.shape == (8, 16)
+    for row in (0, 77, 199):
+        assert index.search(vectors[row], k=3, nprobe=2)[0][0][0] == row
+    # nprobe 0 falls back to exact search; rebuilding without IVF removes the old lists.
+    assert index.search(vectors[5], k=1, nprobe=0)[0][0][0] == 5
+    assert LocalVectorIndex(build(tmp_path, vectors)).ivf_centroids is None
+
+
+def test_collection_mimics_pymilvus_hits(tmp_path, vectors):
+    collection = LocalCollection(build(tmp_path, vectors))
+    collection.load()
+    assert collection.num_entities == 200
+    hits = collection.search([vectors[9]], anns_field="embedding", param={"params": {"nprobe": 4}}, limit=2,
+                             output_fields=["francais", "breton"])
+    assert hits[0][0].id == 9
+    assert hits[0][0].entity.get("breton") == "frazenn 9"
+    assert collection.get_rows([1, 2]) == TEXTS[1:3]
+
+
+def test_inconsistent_snapshots_are_rejected(tmp_path, vectors):
+    with pytest.raises(ValueError, match="200 embeddings but 199 text rows"):
+        vector_index.write_index(str(tmp_path / "bad"), vectors, TEXTS[:-1])
+    out_dir = build(tmp_path, vectors)
+    with open(f"{out_dir}/{vector_index.TEXTS_FILE}", "a", encoding="utf-8") as f:
+        f.write('{"francais": "en trop", "breton": "re"}\n')
+    with pytest.raises(ValueError, match="200 vectors but 201 text rows"):
+        LocalVectorIndex(out_dir)
+
+
+def test_index_of_another_dimension_than_the_encoder_is_not_used(tmp_path, vectors, monkeypatch):
+    for module in ("dotenv", "pymilvus", "sentence_transformers"):
+        pytest.importorskip(module)
+    from src import config, utils
+
+    collection = LocalCollection(build(tmp_path, vectors))
+    for name, value in (("UTILS_INITIALIZED", False), ("ZILLIZ_COLLECTION", None), ("RETRIEVAL_CLIENT", None),
+                        ("RAG_ENCODER", object()), ("RAG_ENCODER_DIMENSION", 384)):
+        monkeypatch.setattr(utils, name, value)
+    monkeypatch.setattr(utils, "_load_rag_encoder", lambda: None)
+    monkeypatch.setattr(utils, "_open_collection", lambda: collection)
+    monkeypatch.setattr(config, "check_config", lambda: True)
+    monkeypatch.setattr(config, "RAG_BACKEND", "local")
+
+    try:
+        assert utils.initialize_utils() is False
+        assert utils.ZILLIZ_COLLECTION is None
+    finally:
+        utils.RETRIEVAL_CLIENT.stop()